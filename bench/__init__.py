@@ -0,0 +1,4 @@
+"""
+Benchmark untuk Pub-Sub Log Aggregator
+Jalankan modul dengan ``python -m bench.<nama>`` dari root repository
+"""
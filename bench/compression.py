@@ -0,0 +1,141 @@
+"""
+Benchmark kompresi payload: ukuran database vs biaya CPU
+
+Menyimpan event log yang sama ke DedupStore dengan PAYLOAD_COMPRESSION
+off, zlib, dan zlib-dict, lalu mengukur:
+- ukuran database di disk dan rasio terhadap mode off
+- throughput insert (check_and_store_many per batch)
+- throughput baca (get_events_page) dan ekspor (iter_events_ndjson)
+- biaya encode/decode per payload di codec saja
+
+Contoh:
+    python -m bench.compression --events 50000 --level 1
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from src.dedup_store import DedupStore
+from src.models import EventRecord
+
+MODES = ("off", "zlib", "zlib-dict")
+
+_LEVELS = ("DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR")
+_ACTIONS = ("login", "logout", "checkout", "search", "view_item", "add_to_cart")
+
+
+def make_events(count: int, topics: int) -> list:
+    """Event log tipikal: field berulang, nilai bervariasi (~250 byte payload)"""
+    rng = random.Random(42)
+    events = []
+    for i in range(count):
+        payload = {
+            "level": rng.choice(_LEVELS),
+            "service": f"api-{rng.randint(1, 8)}",
+            "host": f"10.0.{rng.randint(0, 3)}.{rng.randint(1, 254)}",
+            "message": f"user {rng.randint(1, 100000)} performed {rng.choice(_ACTIONS)}",
+            "request_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "latency_ms": round(rng.expovariate(1 / 40), 2),
+            "status": rng.choice((200, 200, 200, 201, 404, 500)),
+            "path": f"/v1/{rng.choice(_ACTIONS)}/{rng.randint(1, 500)}"
+        }
+        events.append(EventRecord(
+            f"bench.logs.{i % topics}", str(uuid.uuid4()),
+            datetime.utcnow().isoformat() + "Z", "bench",
+            json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        ))
+    return events
+
+
+def run_mode(mode: str, events: list, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        store = DedupStore(
+            path, dedup_cache_size=0, payload_compression=mode,
+            compression_level=args.level, compression_min_bytes=args.min_bytes
+        )
+        
+        started = time.perf_counter()
+        for i in range(0, len(events), args.batch_size):
+            store.check_and_store_many(events[i:i + args.batch_size])
+        insert = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        cursor, read = None, 0
+        while True:
+            page, cursor = store.get_events_page(limit=1000, cursor=cursor)
+            read += len(page)
+            if cursor is None:
+                break
+        read_time = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        exported = sum(len(chunk) for chunk in store.iter_events_ndjson())
+        export = time.perf_counter() - started
+        
+        codec = store.codec
+        samples = [e.payload_json.decode("utf-8") for e in events[:5000]]
+        topics = [e.topic for e in events[:5000]]
+        started = time.perf_counter()
+        encoded = [codec.encode(t, p) for t, p in zip(topics, samples)]
+        encode_us = (time.perf_counter() - started) / len(samples) * 1e6
+        started = time.perf_counter()
+        for value in encoded:
+            codec.decode(value)
+        decode_us = (time.perf_counter() - started) / len(samples) * 1e6
+        
+        stats = codec.get_stats()
+        store.close()
+        db_size = os.path.getsize(path)
+    
+    assert read == len(events)
+    return {
+        "mode": mode,
+        "db_bytes": db_size,
+        "payload_ratio": stats['ratio'],
+        "dicts": stats['dicts'],
+        "insert_events_per_sec": len(events) / insert,
+        "read_events_per_sec": read / read_time,
+        "export_mb_per_sec": exported / export / 1e6,
+        "encode_us": encode_us,
+        "decode_us": decode_us,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark kompresi payload")
+    parser.add_argument("--events", type=int, default=50000, help="Jumlah event")
+    parser.add_argument("--topics", type=int, default=4, help="Jumlah topic")
+    parser.add_argument("--batch-size", type=int, default=500, help="Event per transaksi")
+    parser.add_argument("--level", type=int, default=1, help="Level kompresi zlib")
+    parser.add_argument("--min-bytes", type=int, default=128, help="PAYLOAD_COMPRESSION_MIN_BYTES")
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON")
+    args = parser.parse_args()
+    
+    events = make_events(args.events, args.topics)
+    avg = sum(len(e.payload_json) for e in events) / len(events)
+    results = [run_mode(mode, events, args) for mode in MODES]
+    baseline = results[0]["db_bytes"]
+    
+    print(f"Events: {args.events} ({args.topics} topics, payload ~{avg:.0f} B, level {args.level})")
+    print(f"{'mode':<10} {'db MB':>8} {'vs off':>7} {'payload':>8} {'insert/s':>10} "
+          f"{'read/s':>10} {'export MB/s':>12} {'enc us':>7} {'dec us':>7}")
+    for r in results:
+        r["db_vs_off"] = r["db_bytes"] / baseline
+        ratio = f"{r['payload_ratio']:.2f}" if r["payload_ratio"] is not None else "-"
+        print(f"{r['mode']:<10} {r['db_bytes'] / 1e6:>8.2f} {r['db_vs_off']:>7.2f} {ratio:>8} "
+              f"{r['insert_events_per_sec']:>10,.0f} {r['read_events_per_sec']:>10,.0f} "
+              f"{r['export_mb_per_sec']:>12.1f} {r['encode_us']:>7.1f} {r['decode_us']:>7.1f}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"events": args.events, "payload_size": avg, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
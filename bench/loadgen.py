@@ -0,0 +1,409 @@
+"""
+Load generator dan benchmark end-to-end aggregator
+
+Mengirim event (dengan rasio duplikat tertentu) ke aggregator, menunggu
+consumer selesai memproses, lalu mengukur:
+- throughput publish (event/detik)
+- latency publish p50/p95/p99 per request
+- latency end-to-end publish -> tersimpan (processed_at - waktu kirim)
+- akurasi dedup (event unik tersimpan tepat sekali, duplikat dibuang)
+
+Mode:
+- in-process (default): app dijalankan lewat ASGI di proses yang sama
+  dengan database sementara, tanpa server HTTP
+- remote: ``--url http://localhost:8080`` (atau AGGREGATOR_URL) untuk
+  server yang sudah berjalan, misalnya service publisher di docker-compose
+
+Hasil dapat disimpan sebagai JSON (``--output``) dan dibandingkan dengan
+run sebelumnya (``--compare``) untuk mendeteksi regresi.
+
+Contoh:
+    python -m bench.loadgen --events 5000 --duplicate-ratio 0.2
+    python -m bench.loadgen --url http://localhost:8080 --batch-size 100 --output run.json
+    python -m bench.loadgen --compare baseline.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+# Metrik yang dibandingkan dengan --compare: (path, True jika lebih besar lebih baik)
+COMPARED_METRICS = [
+    (("throughput", "events_per_sec"), True),
+    (("publish_latency_ms", "p50"), False),
+    (("publish_latency_ms", "p95"), False),
+    (("publish_latency_ms", "p99"), False),
+    (("end_to_end_latency_ms", "p50"), False),
+    (("end_to_end_latency_ms", "p99"), False),
+    (("dedup", "accuracy"), True),
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile dengan interpolasi linear (values tidak perlu terurut)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: List[float]) -> Dict:
+    """Ringkasan latency (milidetik)"""
+    if not values:
+        return {"count": 0, "min": 0.0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "count": len(values),
+        "min": min(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def make_workload(events: int, duplicate_ratio: float, topics: List[str],
+                  payload_size: int, seed: int) -> List[dict]:
+    """
+    Buat urutan event dengan rasio duplikat tertentu
+    
+    Duplikat adalah salinan persis event unik yang sudah dibuat, lalu
+    seluruh urutan diacak sehingga duplikat bisa tiba sebelum aslinya
+    (meniru retry at-least-once yang datang tidak berurutan).
+    
+    Returns:
+        List event (dict); payload berisi "sent_at" yang diisi saat dikirim
+    """
+    rng = random.Random(seed)
+    unique_count = max(1, events - int(events * duplicate_ratio))
+    filler = "x" * payload_size
+    
+    unique = [
+        {
+            "topic": topics[i % len(topics)],
+            "event_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "source": "loadgen",
+            "payload": {"seq": i, "data": filler},
+        }
+        for i in range(unique_count)
+    ]
+    duplicates = [rng.choice(unique) for _ in range(events - unique_count)]
+    workload = unique + duplicates
+    rng.shuffle(workload)
+    return workload
+
+
+@asynccontextmanager
+async def open_client(url: Optional[str], db_dir: Optional[str]):
+    """
+    Buka httpx.AsyncClient ke server remote atau ke app in-process
+    
+    Mode in-process menjalankan lifespan app (consumer, store) secara
+    manual karena ASGITransport tidak mengirim event lifespan.
+    """
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60.0) as client:
+            yield client
+        return
+    
+    with tempfile.TemporaryDirectory(prefix="loadgen-", dir=db_dir) as tmp:
+        os.environ.setdefault("DEDUP_DB_PATH", os.path.join(tmp, "dedup_store.db"))
+        from src.main import app
+        
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadgen",
+                                         timeout=60.0) as client:
+                yield client
+
+
+class LoadGenerator:
+    """Mengirim workload secara concurrent dan mengumpulkan latency"""
+    
+    def __init__(self, client: httpx.AsyncClient, concurrency: int, batch_size: int):
+        self.client = client
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.latencies: List[float] = []
+        self.sent_at: Dict[str, float] = {}
+        self.accepted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.throttled = 0
+        self.errors = 0
+    
+    async def _post(self, events: List[dict]):
+        """Kirim satu request; ulangi bila server membalas 429 (backpressure)"""
+        while True:
+            now = time.time()
+            for event in events:
+                event["payload"]["sent_at"] = now
+                self.sent_at.setdefault(event["event_id"], now)
+            started = time.perf_counter()
+            if self.batch_size == 1:
+                response = await self.client.post("/publish", json=events[0])
+            else:
+                response = await self.client.post("/publish/batch", json=events)
+            elapsed = (time.perf_counter() - started) * 1000.0
+            
+            if response.status_code == 429:
+                self.throttled += 1
+                await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+                continue
+            self.latencies.append(elapsed)
+            if response.status_code != 200:
+                self.errors += 1
+                return
+            data = response.json()
+            if self.batch_size == 1:
+                self.accepted += 1
+            else:
+                self.accepted += data.get("accepted", 0)
+                self.duplicates += data.get("duplicate", 0)
+                self.invalid += data.get("invalid", 0)
+            return
+    
+    async def run(self, workload: List[dict]) -> float:
+        """
+        Kirim seluruh workload
+        
+        Returns:
+            Durasi pengiriman (detik)
+        """
+        requests = [
+            workload[i:i + self.batch_size]
+            for i in range(0, len(workload), self.batch_size)
+        ]
+        pending = iter(requests)
+        
+        async def worker():
+            for events in pending:
+                try:
+                    await self._post(events)
+                except httpx.HTTPError:
+                    self.errors += 1
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return time.perf_counter() - started
+
+
+async def wait_drained(client: httpx.AsyncClient, baseline: Dict, expected_unique: int,
+                       timeout: float) -> Dict:
+    """Tunggu sampai queue kosong dan semua event unik tersimpan"""
+    deadline = time.monotonic() + timeout
+    while True:
+        stats = (await client.get("/stats")).json()
+        processed = stats["unique_processed"] - baseline["unique_processed"]
+        if (processed >= expected_unique and stats.get("queue_depth", 0) == 0) \
+                or time.monotonic() > deadline:
+            return stats
+        await asyncio.sleep(0.05)
+
+
+async def collect_stored(client: httpx.AsyncClient, topics: List[str]) -> List[dict]:
+    """Ambil event yang tersimpan untuk topic run ini lewat /events/stream"""
+    rows = []
+    for topic in topics:
+        response = await client.get("/events/stream", params={"topic": topic})
+        response.raise_for_status()
+        rows.extend(json.loads(line) for line in response.text.splitlines() if line)
+    return rows
+
+
+def _epoch(iso: str) -> float:
+    """processed_at (UTC naive ISO 8601) -> epoch detik"""
+    return datetime.fromisoformat(iso).replace(tzinfo=timezone.utc).timestamp()
+
+
+async def run_benchmark(args) -> Dict:
+    """Jalankan satu benchmark lengkap dan kembalikan hasil sebagai dict"""
+    run_id = uuid.uuid4().hex[:8]
+    topics = [f"loadgen.{run_id}.{i}" for i in range(max(1, args.topics))]
+    workload = make_workload(args.events, args.duplicate_ratio, topics,
+                             args.payload_size, args.seed)
+    expected_unique = len({event["event_id"] for event in workload})
+    
+    async with open_client(args.url, args.db_dir) as client:
+        baseline = (await client.get("/stats")).json()
+        generator = LoadGenerator(client, args.concurrency, args.batch_size)
+        duration = await generator.run(workload)
+        published = time.perf_counter()
+        
+        stats = await wait_drained(client, baseline, expected_unique, args.drain_timeout)
+        drained = time.perf_counter()
+        backend = (stats.get("dedup_backend") or {}).get("backend", "sqlite")
+        stored = await collect_stored(client, topics) if backend == "sqlite" else []
+    
+    if backend == "sqlite":
+        stored_ids = [row["event_id"] for row in stored]
+        stored_rows = len(stored_ids)
+        distinct = set(stored_ids)
+        stored_unique = len(distinct & generator.sent_at.keys())
+        duplicates_stored = stored_rows - len(distinct)
+    else:
+        # Backend key-only tidak menyimpan event; pakai counter per topic dari /stats
+        stored_rows = stored_unique = sum(
+            entry["total"] for entry in stats.get("topic_stats", [])
+            if entry["topic"] in topics
+        )
+        duplicates_stored = max(0, stored_rows - expected_unique)
+    missing = max(0, expected_unique - stored_unique)
+    
+    end_to_end = [
+        (_epoch(row["processed_at"]) - generator.sent_at[row["event_id"]]) * 1000.0
+        for row in stored
+        if row["event_id"] in generator.sent_at
+    ]
+    
+    return {
+        "run_id": run_id,
+        "started_at": datetime.utcnow().isoformat(),
+        "mode": "remote" if args.url else "in-process",
+        "dedup_backend": backend,
+        "config": {
+            "url": args.url,
+            "events": args.events,
+            "duplicate_ratio": args.duplicate_ratio,
+            "topics": len(topics),
+            "payload_size": args.payload_size,
+            "concurrency": args.concurrency,
+            "batch_size": args.batch_size,
+            "seed": args.seed,
+        },
+        "throughput": {
+            "publish_seconds": duration,
+            "events_per_sec": len(workload) / duration if duration else 0.0,
+            "requests_per_sec": len(generator.latencies) / duration if duration else 0.0,
+        },
+        "publish_latency_ms": summarize(generator.latencies),
+        "end_to_end_latency_ms": summarize(end_to_end),
+        "dedup": {
+            "sent": len(workload),
+            "expected_unique": expected_unique,
+            "expected_duplicates": len(workload) - expected_unique,
+            "accepted": generator.accepted,
+            "in_batch_duplicates": generator.duplicates,
+            "stored_rows": stored_rows,
+            "stored_unique": stored_unique,
+            "missing": missing,
+            "duplicates_stored": duplicates_stored,
+            "server_duplicate_dropped": stats["duplicate_dropped"] - baseline["duplicate_dropped"],
+            "accuracy": 1.0 - (missing + duplicates_stored) / expected_unique,
+        },
+        "errors": {
+            "http_errors": generator.errors,
+            "invalid": generator.invalid,
+            "throttled_429": generator.throttled,
+            "drain_timed_out": stats["unique_processed"] - baseline["unique_processed"]
+                               < expected_unique,
+        },
+        "drain_seconds": drained - published,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Bandingkan hasil dengan run sebelumnya
+    
+    Returns:
+        Daftar regresi (metrik yang memburuk lebih dari tolerance relatif)
+    """
+    regressions = []
+    for path, higher_is_better in COMPARED_METRICS:
+        try:
+            old = baseline[path[0]][path[1]]
+            new = current[path[0]][path[1]]
+        except KeyError:
+            continue
+        if not old:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions.append(f"{'.'.join(path)}: {old:.3f} -> {new:.3f} ({change:+.1%})")
+    return regressions
+
+
+def print_report(result: Dict):
+    config = result["config"]
+    dedup = result["dedup"]
+    publish = result["publish_latency_ms"]
+    e2e = result["end_to_end_latency_ms"]
+    print(f"Mode          : {result['mode']} (run {result['run_id']})")
+    print(f"Workload      : {config['events']} events, {config['duplicate_ratio']:.0%} duplicate, "
+          f"{config['topics']} topics, payload ~{config['payload_size']} B, "
+          f"concurrency {config['concurrency']}, batch {config['batch_size']}")
+    print(f"Throughput    : {result['throughput']['events_per_sec']:,.0f} events/s "
+          f"({result['throughput']['publish_seconds']:.2f} s)")
+    print(f"Publish (ms)  : p50 {publish['p50']:.2f}  p95 {publish['p95']:.2f}  p99 {publish['p99']:.2f}")
+    print(f"End-to-end(ms): p50 {e2e['p50']:.2f}  p95 {e2e['p95']:.2f}  p99 {e2e['p99']:.2f}")
+    print(f"Dedup         : {dedup['stored_unique']}/{dedup['expected_unique']} unique stored, "
+          f"{dedup['server_duplicate_dropped']} duplicates dropped, "
+          f"{dedup['missing']} missing, {dedup['duplicates_stored']} stored twice "
+          f"(accuracy {dedup['accuracy']:.4f})")
+    errors = result["errors"]
+    if errors["http_errors"] or errors["throttled_429"] or errors["drain_timed_out"]:
+        print(f"Errors        : {errors}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load generator & benchmark aggregator")
+    parser.add_argument("--url", default=os.getenv("AGGREGATOR_URL"),
+                        help="Base URL server (default: in-process via ASGI)")
+    parser.add_argument("--events", type=int, default=5000, help="Total event yang dikirim")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2,
+                        help="Proporsi event duplikat (0..1)")
+    parser.add_argument("--topics", type=int, default=10, help="Jumlah topic berbeda")
+    parser.add_argument("--payload-size", type=int, default=128, help="Ukuran string payload")
+    parser.add_argument("--concurrency", type=int, default=16, help="Request paralel")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Event per request (1 = /publish, >1 = /publish/batch)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed workload")
+    parser.add_argument("--drain-timeout", type=float, default=60.0,
+                        help="Batas tunggu consumer selesai (detik)")
+    parser.add_argument("--db-dir", help="Direktori database sementara (mode in-process)")
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON")
+    parser.add_argument("--compare", help="File JSON hasil run sebelumnya")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Toleransi regresi relatif untuk --compare")
+    args = parser.parse_args(argv)
+    
+    if not 0 <= args.duplicate_ratio < 1:
+        parser.error("--duplicate-ratio harus di antara 0 dan 1")
+    
+    result = asyncio.run(run_benchmark(args))
+    print_report(result)
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("Regresi terhadap baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"Tidak ada regresi terhadap {args.compare} (toleransi {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
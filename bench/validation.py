@@ -0,0 +1,94 @@
+"""
+Benchmark validasi event: jalur standar vs jalur cepat
+
+Jalur standar meniru /publish sebelum fast ingest: json.loads, model Event
+pydantic, lalu event.dict(). Jalur cepat: fast_ingest.parse_event
+(orjson + cek manual) yang langsung menghasilkan EventRecord.
+
+Contoh:
+    python -m bench.validation --events 100000 --payload-size 256
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+
+from src.codec import orjson
+from src.fast_ingest import parse_event
+from src.models import Event
+
+
+def make_bodies(count: int, payload_size: int) -> list:
+    """Buat body JSON event valid dengan payload kira-kira payload_size byte"""
+    bodies = []
+    for i in range(count):
+        event = {
+            "topic": f"bench.topic.{i % 16}",
+            "event_id": str(uuid.uuid4()),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "source": "bench",
+            "payload": {"n": i, "data": "x" * payload_size}
+        }
+        bodies.append(json.dumps(event).encode("utf-8"))
+    return bodies
+
+
+def standard_path(body: bytes) -> dict:
+    return Event(**json.loads(body)).dict()
+
+
+def fast_path(body: bytes):
+    return parse_event(body)
+
+
+def run(func, bodies: list, rounds: int) -> float:
+    """Jalankan func untuk semua body, kembalikan waktu terbaik (detik)"""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for body in bodies:
+            func(body)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark validasi event")
+    parser.add_argument("--events", type=int, default=50000, help="Jumlah event per putaran")
+    parser.add_argument("--payload-size", type=int, default=128, help="Ukuran string payload")
+    parser.add_argument("--rounds", type=int, default=3, help="Jumlah putaran (diambil terbaik)")
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON")
+    args = parser.parse_args()
+    
+    bodies = make_bodies(args.events, args.payload_size)
+    assert all(fast_path(body) is not None for body in bodies[:100])
+    
+    standard = run(standard_path, bodies, args.rounds)
+    fast = run(fast_path, bodies, args.rounds)
+    
+    result = {
+        "events": args.events,
+        "payload_size": args.payload_size,
+        "orjson": orjson is not None,
+        "standard_events_per_sec": args.events / standard,
+        "fast_events_per_sec": args.events / fast,
+        "standard_us_per_event": standard / args.events * 1e6,
+        "fast_us_per_event": fast / args.events * 1e6,
+        "speedup": standard / fast,
+    }
+    
+    print(f"Events       : {args.events} (payload ~{args.payload_size} B, orjson={result['orjson']})")
+    print(f"Standard path: {result['standard_events_per_sec']:>12,.0f} events/s "
+          f"({result['standard_us_per_event']:.2f} us/event)")
+    print(f"Fast path    : {result['fast_events_per_sec']:>12,.0f} events/s "
+          f"({result['fast_us_per_event']:.2f} us/event)")
+    print(f"Speedup      : {result['speedup']:.2f}x")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Aggregates
+Agregasi window waktu (tumbling / sliding) per (topic, source)
+
+Setiap event unik yang baru tersimpan ditambahkan ke satu "pane": bucket
+event-time berukuran tetap (AGGREGATE_PANE_S, default 60 detik) per
+(topic, source) yang berisi jumlah event dan, untuk setiap field payload
+numerik level atas, jumlah nilai dan total-nya. Window apa pun yang ukuran
+dan slide-nya kelipatan pane dibentuk saat query dengan menjumlahkan pane:
+
+- tumbling: size = slide, window tidak tumpang tindih
+- sliding: slide < size, jumlah berjalan (tambah pane masuk, kurangi pane
+  keluar) sehingga biaya query O(window + pane), bukan O(event)
+
+Pane disimpan di memori selama AGGREGATE_RETENTION_S dan di-flush berkala ke
+SQLite tersendiri (aggregates.db) sebagai ringkasan ringkas; saat startup
+pane dalam horizon retensi dimuat kembali. Pane yang berubah setelah flush
+terakhir bisa hilang jika proses crash (maksimal satu interval flush).
+
+Horizon event-time hanya maju sampai jam dinding + AGGREGATE_MAX_SKEW_S;
+event bertimestamp lebih jauh di masa depan dibuang (future_dropped) agar
+satu timestamp salah tidak membuat semua event berikutnya late_dropped.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .codec import loads
+from .models import EventRecord, parse_epoch
+
+logger = logging.getLogger(__name__)
+
+# Pane: [jumlah event, {field: [jumlah nilai, total]}]
+_Pane = list
+
+
+def format_epoch(seconds: int) -> str:
+    """Detik epoch ke ISO8601 UTC (akhiran Z)"""
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class AggregateStore:
+    """Persistensi pane di file SQLite terpisah dari dedup store"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS window_panes (
+                    topic TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    pane_size INTEGER NOT NULL,
+                    pane_start INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    fields TEXT NOT NULL,
+                    PRIMARY KEY (topic, source, pane_size, pane_start)
+                ) WITHOUT ROWID
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_pane_start ON window_panes (pane_size, pane_start)"
+            )
+    
+    def save(self, pane_size: int, rows: List[Tuple[str, str, int, int, str]]):
+        """Upsert pane (topic, source, pane_start, count, fields JSON) dalam satu transaksi"""
+        with self._lock, self._conn as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO window_panes
+                (topic, source, pane_size, pane_start, count, fields)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(topic, source, pane_size, start, count, fields)
+                  for topic, source, start, count, fields in rows])
+    
+    def load(self, pane_size: int, horizon: int,
+             max_start: int) -> List[Tuple[str, str, int, int, str]]:
+        """
+        Pane dalam horizon detik dari pane terbaru yang tersimpan
+        
+        Args:
+            pane_size: Ukuran pane
+            horizon: Rentang (detik) di bawah pane terbaru yang dimuat
+            max_start: Pane setelah ini diabaikan (timestamp masa depan yang
+                sempat tersimpan sebelum ada batas skew)
+        """
+        with self._lock:
+            return self._conn.execute("""
+                SELECT topic, source, pane_start, count, fields
+                FROM window_panes
+                WHERE pane_size = ? AND pane_start <= ? AND pane_start >= (
+                    SELECT MAX(pane_start) FROM window_panes
+                    WHERE pane_size = ? AND pane_start <= ?
+                ) - ?
+            """, (pane_size, max_start, pane_size, max_start, horizon)).fetchall()
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class WindowAggregator:
+    """
+    Agregat pane in-memory per (topic, source) plus flush berkala
+    
+    add_many dipanggil EventConsumer di event loop (tanpa I/O); flush ke
+    SQLite berjalan di thread executor dengan snapshot pane yang berubah.
+    """
+    
+    def __init__(self, store: Optional[AggregateStore] = None, pane_seconds: int = 60,
+                 retention_seconds: int = 86400, flush_interval: float = 5.0,
+                 max_fields: int = 16, max_skew_seconds: int = 300):
+        """
+        Args:
+            store: AggregateStore untuk persistensi (None = hanya memori)
+            pane_seconds: Granularitas pane; ukuran/slide window harus kelipatannya
+            retention_seconds: Umur pane di memori (dihitung dari pane terbaru)
+            flush_interval: Jeda (detik) antar flush pane yang berubah
+            max_fields: Maksimal field numerik yang dilacak per pane
+            max_skew_seconds: Batas timestamp di depan jam dinding yang masih diterima
+        """
+        self.store = store
+        self.pane = max(1, int(pane_seconds))
+        self.retention = max(self.pane, int(retention_seconds))
+        self.flush_interval = flush_interval
+        self.max_fields = max_fields
+        self.max_skew = max(0, int(max_skew_seconds))
+        # (topic, source) -> {pane_start: pane}
+        self._panes: Dict[Tuple[str, str], Dict[int, _Pane]] = {}
+        self._dirty = set()
+        self._latest = 0
+        self._evicted_until = 0
+        self._stopped = asyncio.Event()
+        self.stats = {
+            'events': 0,
+            'late_dropped': 0,
+            'future_dropped': 0,
+            'invalid_timestamp': 0,
+            'fields_truncated': 0,
+            'flushes': 0,
+            'panes_flushed': 0,
+            'panes_evicted': 0,
+            'last_flush_seconds': 0.0,
+        }
+        if store is not None:
+            self._load()
+    
+    def _load(self):
+        rows = self.store.load(self.pane, self.retention, int(time.time()) + self.max_skew)
+        for topic, source, start, count, fields in rows:
+            self._panes.setdefault((topic, source), {})[start] = [count, json.loads(fields)]
+            self._latest = max(self._latest, start)
+        if rows:
+            logger.info(f"Loaded {len(rows)} aggregate panes from {self.store.db_path}")
+    
+    def add_many(self, events: List):
+        """Tambahkan event unik ke pane event-time-nya"""
+        pane_size = self.pane
+        max_epoch = time.time() + self.max_skew
+        for event in events:
+            if type(event) is not EventRecord:
+                event = EventRecord.from_dict(event)
+            try:
+                epoch = parse_epoch(event.timestamp)
+            except ValueError:
+                self.stats['invalid_timestamp'] += 1
+                continue
+            if epoch > max_epoch:
+                self.stats['future_dropped'] += 1
+                continue
+            start = int(epoch) // pane_size * pane_size
+            if start > self._latest:
+                self._latest = start
+            elif start < self._latest - self.retention:
+                self.stats['late_dropped'] += 1
+                continue
+            
+            key = (event.topic, event.source)
+            panes = self._panes.get(key)
+            if panes is None:
+                panes = self._panes[key] = {}
+            pane = panes.get(start)
+            if pane is None:
+                pane = panes[start] = [0, {}]
+            pane[0] += 1
+            self._add_fields(pane[1], event.payload_json)
+            self._dirty.add((key, start))
+        self.stats['events'] += len(events)
+    
+    def _add_fields(self, fields: Dict[str, list], payload_json: bytes):
+        """Akumulasi field payload numerik level atas (bool diabaikan)"""
+        if payload_json == b"{}":
+            return
+        payload = loads(payload_json)
+        if not isinstance(payload, dict):
+            return
+        for name, value in payload.items():
+            if type(value) not in (int, float):
+                continue
+            acc = fields.get(name)
+            if acc is None:
+                if len(fields) >= self.max_fields:
+                    self.stats['fields_truncated'] += 1
+                    continue
+                acc = fields[name] = [0, 0]
+            acc[0] += 1
+            acc[1] += value
+    
+    def _snapshot_dirty(self) -> List[Tuple[str, str, int, int, str]]:
+        """Salin pane yang berubah (di event loop) untuk ditulis di thread"""
+        rows = []
+        for key, start in self._dirty:
+            pane = self._panes.get(key, {}).get(start)
+            if pane is not None:
+                rows.append((key[0], key[1], start, pane[0], json.dumps(pane[1])))
+        self._dirty = set()
+        return rows
+    
+    def _evict(self):
+        """Buang pane di luar horizon retensi yang sudah tersimpan"""
+        cutoff = self._latest - self.retention
+        # Scan penuh hanya jika horizon bergeser (paling sering sekali per pane)
+        if cutoff <= self._evicted_until and not self._dirty:
+            return
+        self._evicted_until = cutoff
+        evicted = 0
+        for key in list(self._panes):
+            panes = self._panes[key]
+            for start in [s for s in panes if s < cutoff and (key, s) not in self._dirty]:
+                del panes[start]
+                evicted += 1
+            if not panes:
+                del self._panes[key]
+        self.stats['panes_evicted'] += evicted
+    
+    async def flush(self):
+        """Tulis pane yang berubah ke AggregateStore lalu evict pane lama"""
+        if self.store is not None and self._dirty:
+            started = time.monotonic()
+            rows = self._snapshot_dirty()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.store.save, self.pane, rows)
+            self.stats['flushes'] += 1
+            self.stats['panes_flushed'] += len(rows)
+            self.stats['last_flush_seconds'] = time.monotonic() - started
+        elif self.store is None:
+            self._dirty = set()
+        self._evict()
+    
+    async def run(self):
+        """Loop flush berkala sampai stop(); flush terakhir saat berhenti"""
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Aggregate flush failed: {e}", exc_info=True)
+    
+    def stop(self):
+        self._stopped.set()
+    
+    def query(self, size: int, slide: Optional[int] = None, topic: Optional[str] = None,
+              source: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, limit: int = 60) -> Dict:
+        """
+        Window per (topic, source) dari pane
+        
+        Window diberi label [start, end); end selaras dengan slide. Tanpa
+        since/until, dikembalikan hingga limit window terakhir sampai pane
+        terbaru. Window kosong tidak dikembalikan.
+        
+        Args:
+            size: Ukuran window (detik, kelipatan pane)
+            slide: Jarak antar window (default = size, tumbling)
+            topic / source: Filter (optional)
+            since / until: Rentang akhir window (ISO8601, optional)
+            limit: Maksimal window per series
+        
+        Returns:
+            Dictionary window (size, slide, type) dan series per (topic, source)
+        
+        Raises:
+            ValueError: Jika size/slide bukan kelipatan pane, slide > size,
+                atau since/until tidak valid
+        """
+        slide = slide or size
+        pane = self.pane
+        if size <= 0 or size % pane or slide % pane:
+            raise ValueError(f"Ukuran dan slide window harus kelipatan {pane} detik")
+        if slide > size:
+            raise ValueError("Slide window tidak boleh lebih besar dari ukurannya")
+        
+        last_end = self._latest + pane
+        if until:
+            last_end = int(parse_epoch(until))
+        last_end = -(-last_end // slide) * slide
+        first_end = last_end - (max(1, limit) - 1) * slide
+        if since:
+            first_end = max(first_end, -(-int(parse_epoch(since)) // slide) * slide)
+        
+        series = []
+        for (key_topic, key_source), panes in sorted(self._panes.items()):
+            if (topic and key_topic != topic) or (source and key_source != source):
+                continue
+            windows = self._windows(panes, size, slide, first_end, last_end)
+            if windows:
+                series.append({'topic': key_topic, 'source': key_source, 'windows': windows})
+        
+        return {
+            'window': {
+                'type': 'tumbling' if slide == size else 'sliding',
+                'size': size,
+                'slide': slide
+            },
+            'pane': pane,
+            'series': series
+        }
+    
+    @staticmethod
+    def _windows(panes: Dict[int, _Pane], size: int, slide: int,
+                 first_end: int, last_end: int) -> List[Dict]:
+        """Jumlah berjalan atas pane terurut: O(window + pane dalam rentang)"""
+        starts = sorted(start for start in panes if first_end - size <= start < last_end)
+        if not starts:
+            return []
+        
+        count = 0
+        fields: Dict[str, list] = {}
+        enter = leave = 0
+        windows = []
+        end = first_end
+        while end <= last_end:
+            while enter < len(starts) and starts[enter] < end:
+                pane = panes[starts[enter]]
+                count += pane[0]
+                for name, (n, total) in pane[1].items():
+                    acc = fields.setdefault(name, [0, 0])
+                    acc[0] += n
+                    acc[1] += total
+                enter += 1
+            while leave < enter and starts[leave] < end - size:
+                pane = panes[starts[leave]]
+                count -= pane[0]
+                for name, (n, total) in pane[1].items():
+                    acc = fields[name]
+                    acc[0] -= n
+                    acc[1] -= total
+                leave += 1
+            if count:
+                windows.append({
+                    'start': format_epoch(end - size),
+                    'end': format_epoch(end),
+                    'count': count,
+                    'fields': {
+                        name: {'count': n, 'sum': total, 'avg': total / n}
+                        for name, (n, total) in fields.items() if n
+                    }
+                })
+            if enter >= len(starts) and leave >= enter:
+                break
+            end += slide
+        return windows
+    
+    def get_stats(self) -> Dict:
+        return {
+            'keys': len(self._panes),
+            'panes': sum(len(panes) for panes in self._panes.values()),
+            'dirty_panes': len(self._dirty),
+            'pane_seconds': self.pane,
+            'retention_seconds': self.retention,
+            **self.stats
+        }
+    
+    def close(self):
+        if self.store is not None:
+            self.store.close()
@@ -0,0 +1,523 @@
+"""
+Columnar Archive
+Segment file kolumnar (immutable, terkompresi) untuk event dingin
+
+Compactor retensi menyerahkan setiap chunk payload yang di-compact ke
+ColumnarArchive, yang menulisnya sebagai satu segment. Segment menyimpan
+setiap kolom dalam blok zlib terpisah:
+- kolom tetap: topic, event_id, timestamp, source, processed_at
+- kolom payload bertipe (int, float, bool, str, json) untuk field level atas
+  yang paling sering muncul; sisanya di kolom json __rest
+
+Footer segment berisi index min/max timestamp (juga sebagai epoch UTC, yang
+dipakai untuk pruning karena string timestamp client tidak bisa dibandingkan
+langsung) dan jumlah baris per topic.
+ArchiveReader membuang segment yang tidak mungkin cocok hanya dari footer,
+lalu membaca dan men-decode (sekaligus per kolom) hanya kolom yang diminta.
+
+Layout file:
+    MAGIC | blok kolom ... | footer JSON | panjang footer (>I) | MAGIC
+"""
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+import uuid
+import zlib
+from array import array
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .codec import loads
+from .models import parse_epoch
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"EVSEG1\x00\x00"
+SEGMENT_SUFFIX = ".evseg"
+FORMAT_VERSION = 1
+
+FIXED_COLUMNS = ("topic", "event_id", "timestamp", "source", "processed_at")
+REST_COLUMN = "__rest"
+PAYLOAD_PREFIX = "payload."
+
+_TRAILER = struct.Struct(">I")
+_LITTLE = sys.byteorder == "little"
+# Integer di luar rentang ini disimpan sebagai json (tidak muat di array('q'))
+_INT_MIN, _INT_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def _json_bytes(values: list) -> bytes:
+    return json.dumps(values, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _epoch_or_none(timestamp: str) -> Optional[float]:
+    try:
+        return parse_epoch(timestamp)
+    except (TypeError, ValueError):
+        return None
+
+
+def _epoch_range(since: Optional[str], until: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Batas since/until (ISO8601) ke epoch
+    
+    Raises:
+        ValueError: Jika since/until bukan ISO8601
+    """
+    return (parse_epoch(since) if since else None, parse_epoch(until) if until else None)
+
+
+def _column_type(values: list) -> str:
+    """
+    Tipe kolom untuk nilai-nilai yang ada (tanpa baris yang tidak punya field)
+    
+    Campuran int dan float menjadi json, bukan float: 5 harus terbaca lagi
+    sebagai 5, bukan 5.0, agar payload hasil scan sama persis dengan aslinya.
+    """
+    kinds = {type(v) for v in values}
+    if kinds == {bool}:
+        return "bool"
+    if kinds == {str}:
+        return "str"
+    if kinds == {int}:
+        if all(_INT_MIN <= v <= _INT_MAX for v in values):
+            return "int"
+        return "json"
+    if kinds == {float}:
+        return "float"
+    return "json"
+
+
+def _encode_values(kind: str, values: list) -> bytes:
+    """List nilai (baris kosong sudah diisi default) menjadi bytes kolom"""
+    if kind in ("int", "float"):
+        arr = array("q" if kind == "int" else "d", values)
+        if not _LITTLE:
+            arr.byteswap()
+        return arr.tobytes()
+    if kind == "bool":
+        return bytes(values)
+    return _json_bytes(values)
+
+
+def _decode_values(kind: str, data: bytes) -> list:
+    if kind in ("int", "float"):
+        arr = array("q" if kind == "int" else "d")
+        arr.frombytes(data)
+        if not _LITTLE:
+            arr.byteswap()
+        return arr.tolist()
+    if kind == "bool":
+        return [b == 1 for b in data]
+    return loads(data)
+
+
+_FILL = {"int": 0, "float": 0.0, "bool": False, "str": "", "json": None}
+
+
+def write_segment(path: str, rows: List[tuple], max_fields: int = 32, level: int = 6) -> Dict:
+    """
+    Tulis baris sebagai satu segment kolumnar (atomik: tmp + fsync + rename)
+    
+    Args:
+        path: Path file segment
+        rows: Tuple (topic, event_id, timestamp, source, payload JSON, processed_at)
+        max_fields: Maksimal field payload yang dijadikan kolom bertipe
+        level: Level kompresi zlib per blok kolom
+    
+    Returns:
+        Metadata footer segment
+    """
+    count = len(rows)
+    columns: List[Tuple[str, str, list, Optional[bytes]]] = [
+        (name, "str", [r[i] for r in rows], None)
+        for name, i in zip(FIXED_COLUMNS, (0, 1, 2, 3, 5))
+    ]
+    
+    # Field level atas yang paling sering muncul menjadi kolom bertipe
+    payloads = [loads(r[4]) for r in rows]
+    frequency = Counter(k for p in payloads if type(p) is dict for k in p)
+    fields = [k for k, _ in frequency.most_common(max_fields)]
+    extracted = set(fields)
+    for name in fields:
+        present = bytes(type(p) is dict and name in p for p in payloads)
+        kind = _column_type([p[name] for p in payloads if type(p) is dict and name in p])
+        fill = _FILL[kind]
+        values = [
+            p[name] if type(p) is dict and name in p else fill
+            for p in payloads
+        ]
+        columns.append((PAYLOAD_PREFIX + name, kind, values, None if all(present) else present))
+    
+    # __rest: dict field sisa, atau [payload] untuk payload yang bukan object
+    rest = []
+    for p in payloads:
+        if type(p) is not dict:
+            rest.append([p])
+        elif len(p) > len(extracted & p.keys()):
+            rest.append({k: v for k, v in p.items() if k not in extracted})
+        else:
+            rest.append(None)
+    if any(v is not None for v in rest):
+        columns.append((REST_COLUMN, "json", rest, None))
+    
+    timestamps = [r[2] for r in rows]
+    epochs = [e for e in map(_epoch_or_none, timestamps) if e is not None]
+    processed = [r[5] for r in rows]
+    meta = {
+        "version": FORMAT_VERSION,
+        "rows": count,
+        "topics": dict(Counter(r[0] for r in rows)),
+        "min_timestamp": min(timestamps) if rows else None,
+        "max_timestamp": max(timestamps) if rows else None,
+        "min_epoch": min(epochs) if epochs else None,
+        "max_epoch": max(epochs) if epochs else None,
+        "unparsed_timestamps": count - len(epochs),
+        "min_processed_at": min(processed) if rows else None,
+        "max_processed_at": max(processed) if rows else None,
+        "created_at": datetime.utcnow().isoformat(),
+        "columns": []
+    }
+    
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        offset = len(MAGIC)
+        for name, kind, values, present in columns:
+            column = {"name": name, "type": kind}
+            for key, raw in (("data", _encode_values(kind, values)), ("present", present)):
+                if raw is None:
+                    continue
+                block = zlib.compress(raw, level)
+                f.write(block)
+                column[key] = [offset, len(block)]
+                offset += len(block)
+            meta["columns"].append(column)
+        footer = _json_bytes(meta)
+        f.write(footer + _TRAILER.pack(len(footer)) + MAGIC)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return meta
+
+
+class Segment:
+    """Satu file segment; footer dibaca sekali saat dibuka"""
+    
+    def __init__(self, path: Path):
+        """
+        Raises:
+            ValueError: Jika file bukan segment yang valid
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            tail = _TRAILER.size + len(MAGIC)
+            if size < len(MAGIC) + tail:
+                raise ValueError(f"Segment terlalu kecil: {path}")
+            f.seek(size - tail)
+            trailer = f.read(tail)
+            if trailer[_TRAILER.size:] != MAGIC:
+                raise ValueError(f"Segment tidak valid: {path}")
+            length = _TRAILER.unpack_from(trailer)[0]
+            f.seek(size - tail - length)
+            self.meta = json.loads(f.read(length))
+        self.columns = {c["name"]: c for c in self.meta["columns"]}
+    
+    @property
+    def rows(self) -> int:
+        return self.meta["rows"]
+    
+    @property
+    def epoch_indexed(self) -> bool:
+        """True jika index epoch footer mencakup semua baris (segment lama tidak punya)"""
+        return self.meta.get("min_epoch") is not None and not self.meta.get("unparsed_timestamps")
+    
+    def matches(self, topic: Optional[str], since: Optional[float], until: Optional[float]) -> bool:
+        """Cek index footer: False jika tidak ada baris yang mungkin cocok (since/until epoch)"""
+        if not self.rows:
+            return False
+        if topic and topic not in self.meta["topics"]:
+            return False
+        if since is None and until is None:
+            return True
+        if "min_epoch" not in self.meta:
+            # Segment lama tanpa index epoch: baris dicek satu per satu
+            return True
+        if self.meta["min_epoch"] is None:
+            return False
+        if since is not None and self.meta["max_epoch"] < since:
+            return False
+        if until is not None and self.meta["min_epoch"] >= until:
+            return False
+        return True
+    
+    def _block(self, f, span: List[int]) -> bytes:
+        f.seek(span[0])
+        return zlib.decompress(f.read(span[1]))
+    
+    def _read(self, f, name: str) -> Tuple[list, Optional[bytes]]:
+        column = self.columns[name]
+        values = _decode_values(column["type"], self._block(f, column["data"]))
+        present = self._block(f, column["present"]) if "present" in column else None
+        return values, present
+    
+    def read_columns(self, names: List[str], f) -> Dict[str, list]:
+        """
+        Decode kolom yang diminta (seluruh baris segment)
+        
+        Nama kolom: kolom tetap, "payload" (payload utuh), atau
+        "payload.<field>"; field yang tidak ada bernilai None.
+        """
+        cache: Dict[str, Tuple[list, Optional[bytes]]] = {}
+        
+        def read(name):
+            if name not in cache:
+                cache[name] = self._read(f, name)
+            return cache[name]
+        
+        def rest():
+            if REST_COLUMN in self.columns:
+                return read(REST_COLUMN)[0]
+            return [None] * self.rows
+        
+        result = {}
+        for name in names:
+            if name in FIXED_COLUMNS:
+                result[name] = read(name)[0]
+            elif name == "payload":
+                result[name] = self._payloads(read, rest())
+            elif name.startswith(PAYLOAD_PREFIX) and name in self.columns:
+                values, present = read(name)
+                if present is not None:
+                    values = [v if ok else None for v, ok in zip(values, present)]
+                result[name] = values
+            elif name.startswith(PAYLOAD_PREFIX):
+                # Field tidak diekstrak di segment ini; cari di __rest
+                field = name[len(PAYLOAD_PREFIX):]
+                result[name] = [r.get(field) if type(r) is dict else None for r in rest()]
+            else:
+                raise ValueError(f"Kolom tidak dikenal: {name}")
+        return result
+    
+    def _payloads(self, read, rest: list) -> list:
+        """Susun ulang payload utuh dari kolom field dan __rest"""
+        fields = [
+            (name[len(PAYLOAD_PREFIX):],) + read(name)
+            for name in self.columns if name.startswith(PAYLOAD_PREFIX)
+        ]
+        payloads = []
+        for i, extra in enumerate(rest):
+            if type(extra) is list:
+                payloads.append(extra[0])
+                continue
+            payload = {
+                field: values[i]
+                for field, values, present in fields
+                if present is None or present[i]
+            }
+            if extra:
+                payload.update(extra)
+            payloads.append(payload)
+        return payloads
+
+
+class ColumnarArchive:
+    """Tujuan arsip Compactor: satu segment per chunk yang di-compact"""
+    
+    def __init__(self, directory: str, max_fields: int = 32, level: int = 6):
+        """
+        Args:
+            directory: Direktori file segment
+            max_fields: Maksimal field payload yang dijadikan kolom bertipe
+            level: Level kompresi zlib blok kolom
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_fields = max_fields
+        self.level = level
+        self._lock = threading.Lock()
+        self.stats = {
+            'segments_written': 0,
+            'rows_archived': 0,
+            'bytes_written': 0
+        }
+    
+    def __call__(self, rows: List[tuple]) -> Optional[Path]:
+        """
+        Tulis baris (topic, event_id, timestamp, source, payload, processed_at)
+        
+        Dipanggil DedupStore.compact_payloads di luar lock writer, sebelum
+        transaksi yang membuang payload; segment sudah di-fsync saat kembali.
+        
+        Returns:
+            Path segment (untuk discard), atau None jika tidak ada baris
+        """
+        if not rows:
+            return None
+        name = f"segment-{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}{SEGMENT_SUFFIX}"
+        path = self.directory / name
+        write_segment(str(path), rows, self.max_fields, self.level)
+        with self._lock:
+            self.stats['segments_written'] += 1
+            self.stats['rows_archived'] += len(rows)
+            self.stats['bytes_written'] += path.stat().st_size
+        logger.debug(f"Archived {len(rows)} rows to {name}")
+        return path
+    
+    def discard(self, path: Path):
+        """Hapus segment yang chunk-nya batal di-compact (lihat compact_payloads)"""
+        rows = Segment(path).rows
+        path.unlink(missing_ok=True)
+        with self._lock:
+            self.stats['segments_written'] -= 1
+            self.stats['rows_archived'] -= rows
+        logger.warning(f"Archive segment {path.name} discarded")
+    
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
+
+
+class ArchiveReader:
+    """
+    Scan segment di satu direktori
+    
+    Footer segment di-cache per nama file (segment immutable), sehingga
+    pruning tidak membaca isi file sama sekali.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._segments: Dict[str, Segment] = {}
+        self._lock = threading.Lock()
+    
+    def segments(self) -> List[Segment]:
+        """Semua segment di direktori, urut nama (waktu tulis)"""
+        if not self.directory.is_dir():
+            return []
+        names = sorted(p.name for p in self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+        with self._lock:
+            for name in names:
+                if name not in self._segments:
+                    try:
+                        self._segments[name] = Segment(self.directory / name)
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Skipping archive segment {name}: {e}")
+            for name in set(self._segments) - set(names):
+                del self._segments[name]
+            return [self._segments[n] for n in names if n in self._segments]
+    
+    def prune(self, topic: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None) -> Tuple[List[Segment], int]:
+        """
+        Returns:
+            Tuple (segment yang mungkin cocok, jumlah seluruh segment)
+        
+        Raises:
+            ValueError: Jika since/until bukan ISO8601
+        """
+        since_epoch, until_epoch = _epoch_range(since, until)
+        segments = self.segments()
+        return [s for s in segments if s.matches(topic, since_epoch, until_epoch)], len(segments)
+    
+    def scan(self, columns: Optional[List[str]] = None, topic: Optional[str] = None,
+             since: Optional[str] = None, until: Optional[str] = None) -> Iterator[Dict[str, list]]:
+        """
+        Scan kolumnar: satu batch {kolom: list nilai} per segment yang cocok
+        
+        Kolom filter (topic / timestamp) hanya dibaca jika index footer tidak
+        cukup untuk memastikan semua baris segment cocok.
+        
+        Args:
+            columns: Kolom yang dikembalikan (default: kolom tetap + payload)
+            topic: Filter topic (opsional)
+            since/until: Rentang field timestamp (ISO8601, inklusif/eksklusif)
+        
+        Raises:
+            ValueError: Jika nama kolom tidak dikenal
+        """
+        for batch in self._scan(self._columns(columns), topic, since, until):
+            if batch is not None:
+                yield batch
+    
+    @staticmethod
+    def _columns(columns: Optional[List[str]]) -> List[str]:
+        columns = list(columns or FIXED_COLUMNS + ("payload",))
+        for name in columns:
+            if name not in FIXED_COLUMNS and name != "payload" and not name.startswith(PAYLOAD_PREFIX):
+                raise ValueError(f"Kolom tidak dikenal: {name}")
+        return columns
+    
+    def _scan(self, columns: List[str], topic: Optional[str], since: Optional[str],
+              until: Optional[str]) -> Iterator[Optional[Dict[str, list]]]:
+        """scan tanpa membuang segment yang ternyata kosong (None) setelah filter baris"""
+        segments, _ = self.prune(topic, since, until)
+        since, until = _epoch_range(since, until)
+        for segment in segments:
+            meta = segment.meta
+            indexed = segment.epoch_indexed
+            need_topic = bool(topic) and len(meta["topics"]) > 1
+            need_since = since is not None and (not indexed or meta["min_epoch"] < since)
+            need_until = until is not None and (not indexed or meta["max_epoch"] >= until)
+            filters = (["topic"] if need_topic else []) + (
+                ["timestamp"] if need_since or need_until else []
+            )
+            with open(segment.path, "rb") as f:
+                batch = segment.read_columns(list(dict.fromkeys(columns + filters)), f)
+            
+            if filters:
+                epochs = (
+                    [_epoch_or_none(t) for t in batch["timestamp"]]
+                    if need_since or need_until else None
+                )
+                keep = [
+                    i for i in range(segment.rows)
+                    if (not need_topic or batch["topic"][i] == topic)
+                    and (not need_since or (epochs[i] is not None and epochs[i] >= since))
+                    and (not need_until or (epochs[i] is not None and epochs[i] < until))
+                ]
+                batch = {name: [batch[name][i] for i in keep] for name in columns} if keep else None
+            yield batch
+    
+    def scan_columns(self, columns: Optional[List[str]] = None, topic: Optional[str] = None,
+                     since: Optional[str] = None, until: Optional[str] = None,
+                     limit: int = 1000) -> Dict:
+        """
+        Gabungkan hasil scan menjadi satu response kolumnar (untuk GET /archive/scan)
+        
+        Returns:
+            Dictionary segments (total/scanned/pruned), rows, truncated, columns
+        
+        Raises:
+            ValueError: Jika nama kolom tidak dikenal
+        """
+        columns = self._columns(columns)
+        selected, total = self.prune(topic, since, until)
+        merged: Dict[str, list] = {name: [] for name in columns}
+        rows = scanned = 0
+        truncated = False
+        for batch in self._scan(columns, topic, since, until):
+            if rows >= limit:
+                truncated = True
+                break
+            scanned += 1
+            if batch is None:
+                continue
+            size = len(batch[columns[0]])
+            take = min(size, limit - rows)
+            for name in columns:
+                merged[name].extend(batch[name][:take])
+            rows += take
+            truncated = take < size
+        return {
+            'segments': {'total': total, 'scanned': scanned, 'pruned': total - len(selected)},
+            'rows': rows,
+            'truncated': truncated,
+            'columns': merged
+        }
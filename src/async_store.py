@@ -0,0 +1,158 @@
+"""
+Async wrapper untuk DedupStore
+Semua I/O SQLite dijalankan di thread terpisah sehingga event loop uvicorn
+tidak pernah terblokir oleh disk write
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from .dedup_backend import DedupBackend
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDedupStore:
+    """
+    API async di atas DedupStore (atau DedupBackend lain)
+    
+    - Write (store_event, store_events, clear) berjalan di satu thread writer
+      khusus, sehingga seluruh write terserialisasi di koneksi writer
+    - Read berjalan di thread pool reader seukuran pool koneksi reader
+    - Lookup yang bisa dijawab front cache tidak berpindah thread sama sekali
+    - Backend tanpa I/O blocking (blocking_io = False, mis. memory)
+      dipanggil langsung di event loop
+    - Counter (stats, note_duplicates) dibaca langsung hanya jika backend
+      menyatakan inline_counters; backend yang counternya berbagi lock dengan
+      I/O (mis. mmap) dilayani lewat thread
+    """
+    
+    def __init__(self, store: DedupBackend):
+        """
+        Args:
+            store: Instance DedupStore synchronous atau DedupBackend lain
+        """
+        self.store = store
+        self.blocking_io = getattr(store, "blocking_io", True)
+        self.inline_counters = getattr(store, "inline_counters", True)
+        self._write_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="dedup-writer"
+        )
+        self._read_executor = ThreadPoolExecutor(
+            max_workers=store.reader_pool_size, thread_name_prefix="dedup-reader"
+        )
+    
+    async def _run_write(self, func, *args):
+        """Jalankan fungsi di thread writer"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._write_executor, partial(func, *args))
+    
+    async def _run_read(self, func, *args):
+        """Jalankan fungsi di thread pool reader"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_executor, partial(func, *args))
+    
+    async def _run_counters(self, func, *args):
+        """Baca counter langsung jika inline_counters, selain itu di thread reader"""
+        if self.inline_counters:
+            return func(*args)
+        return await self._run_read(func, *args)
+    
+    async def is_duplicate(self, topic: str, event_id: str) -> bool:
+        """Versi async DedupStore.is_duplicate"""
+        cached = self.store.is_duplicate_cached(topic, event_id)
+        if cached is not None:
+            return cached
+        return await self._run_read(self.store.is_duplicate_db, topic, event_id)
+    
+    async def store_event(self, event: dict) -> bool:
+        """Versi async DedupStore.store_event"""
+        return await self._run_write(self.store.store_event, event)
+    
+    async def store_events(self, events: List[dict]) -> List[bool]:
+        """Versi async DedupStore.store_events (group commit)"""
+        return await self._run_write(self.store.store_events, events)
+    
+    async def query(self, topic: str, event_id: str) -> bool:
+        """Versi async DedupBackend.query"""
+        if not self.blocking_io:
+            return self.store.query(topic, event_id)
+        cached = self.store.is_duplicate_cached(topic, event_id)
+        if cached is not None:
+            return cached
+        return await self._run_read(self.store.query, topic, event_id)
+    
+    async def check_and_mark(self, event) -> bool:
+        """Versi async DedupBackend.check_and_mark"""
+        if not self.blocking_io:
+            return self.store.check_and_mark(event)
+        return await self._run_write(self.store.check_and_mark, event)
+    
+    async def check_and_mark_many(self, events: List) -> List[bool]:
+        """Versi async DedupBackend.check_and_mark_many"""
+        if not self.blocking_io:
+            return self.store.check_and_mark_many(events)
+        return await self._run_write(self.store.check_and_mark_many, events)
+    
+    async def get_events(self, topic: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Versi async DedupStore.get_events"""
+        return await self._run_read(self.store.get_events, topic, limit)
+    
+    async def get_events_page(self, topic: Optional[str] = None, limit: int = 100,
+                              **filters) -> Tuple[List[Dict], Optional[str]]:
+        """Versi async DedupStore.get_events_page (keyset pagination)"""
+        return await self._run_read(partial(self.store.get_events_page, topic, limit, **filters))
+    
+    async def get_topics(self) -> List[str]:
+        """Versi async DedupStore.get_topics"""
+        return await self._run_counters(self.store.get_topics)
+    
+    async def get_stats(self) -> Dict:
+        """Versi async DedupStore.get_stats"""
+        return await self._run_counters(self.store.get_stats)
+    
+    def get_topic_stats(self) -> List[Dict]:
+        """Ringkasan per topic (in-memory)"""
+        return self.store.get_topic_stats()
+    
+    async def collect_stats(self) -> Dict:
+        """Topic, ringkasan per topic, front cache, dan stats backend sekaligus"""
+        return await self._run_counters(self.stats_snapshot)
+    
+    def stats_snapshot(self) -> Dict:
+        """Versi sync collect_stats"""
+        return {
+            'topics': self.store.get_topics(),
+            'topic_stats': self.store.get_topic_stats(),
+            'dedup_cache': self.store.get_cache_stats(),
+            'dedup_backend': self.store.stats(),
+        }
+    
+    def note_duplicates(self, counts: Dict[str, int]):
+        """
+        Catat duplikat per topic (in-memory, di-flush pada write berikutnya)
+        
+        Backend tanpa inline_counters dicatat di thread writer tanpa ditunggu,
+        berurutan dengan write lain.
+        """
+        if self.inline_counters:
+            self.store.note_duplicates(counts)
+        else:
+            self._write_executor.submit(self.store.note_duplicates, counts)
+    
+    async def clear(self):
+        """Versi async DedupStore.clear"""
+        await self._run_write(self.store.clear)
+    
+    def get_cache_stats(self) -> Optional[Dict]:
+        """Statistik front cache (in-memory, tidak perlu thread)"""
+        return self.store.get_cache_stats()
+    
+    def close(self):
+        """Tunggu write yang tertunda selesai, lalu tutup store"""
+        self._write_executor.shutdown(wait=True)
+        self._read_executor.shutdown(wait=True)
+        self.store.close()
+        logger.info("AsyncDedupStore closed")
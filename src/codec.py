@@ -0,0 +1,45 @@
+"""
+JSON codec bersama
+Memakai orjson jika tersedia (lebih cepat, output bytes), fallback ke json standar
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson opsional
+    orjson = None
+
+
+def loads(data) -> Any:
+    """
+    Decode JSON; orjson jika tersedia, fallback ke json standar
+    
+    orjson lebih ketat (NaN, integer > 64-bit, surrogate tunggal); input
+    seperti itu di-decode ulang dengan json agar hasil dan error-nya sama
+    dengan jalur standar.
+    
+    Raises:
+        ValueError: json.JSONDecodeError dari json standar
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode JSON ringkas (tanpa spasi, UTF-8) sebagai bytes"""
+    if orjson is not None:
+        try:
+            data = orjson.dumps(obj)
+        except TypeError:
+            # Misalnya integer > 64-bit yang tidak didukung orjson
+            pass
+        else:
+            # orjson mengalokasikan buffer minimal ~1 KiB yang tidak di-trim;
+            # output kecil disalin agar objek yang disimpan lama (queue) tetap kecil
+            return bytes(memoryview(data)) if len(data) < 1024 else data
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,248 @@
+"""
+Konfigurasi aplikasi
+Semua nilai dibaca dari environment variable agar mudah diatur lewat Docker
+"""
+import os
+from dataclasses import dataclass
+
+
+def _env_int(name: str, default: int) -> int:
+    """Baca environment variable sebagai integer"""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Baca environment variable sebagai float"""
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Baca environment variable sebagai boolean (1/true/yes/on)"""
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_str(name: str, default: str) -> str:
+    """Baca environment variable sebagai string"""
+    value = os.getenv(name)
+    return value if value not in (None, "") else default
+
+
+@dataclass
+class Settings:
+    """
+    Pengaturan runtime aggregator
+    
+    Attributes:
+        db_path: Path database SQLite dedup store
+        batch_size: Maksimal event per group commit (1 = per event)
+        batch_timeout_ms: Waktu tunggu maksimal untuk melengkapi batch
+        consumer_workers: Jumlah worker consumer paralel (partisi hash key)
+        queue_max_size: Batas keras kedalaman queue (0 = tidak dibatasi)
+        queue_high_watermark: Kedalaman yang mengaktifkan backpressure (0 = max)
+        queue_low_watermark: Kedalaman yang melepas backpressure (-1 = 80% high)
+        enqueue_timeout_ms: Waktu tunggu publish saat backpressure sebelum 429
+        retry_after_seconds: Nilai header Retry-After pada respons 429
+        ingest_log_enabled: Tulis event ke write-ahead ingest log sebelum di-accept
+        ingest_log_dir: Direktori ingest log (default: <dir db>/ingest_log)
+        ingest_log_segment_bytes: Ukuran segment sebelum rotasi
+        ingest_log_sync_ms: Jeda pengumpulan append sebelum group fsync
+        sqlite_synchronous: PRAGMA synchronous (OFF/NORMAL/FULL/EXTRA)
+        sqlite_mmap_size: PRAGMA mmap_size dalam byte
+        sqlite_cache_size: PRAGMA cache_size (negatif = KiB)
+        sqlite_reader_pool: Jumlah koneksi reader read-only
+        dedup_cache_size: Ukuran LRU front cache dedup (0 = nonaktif)
+        fast_ingest: Validasi cepat (orjson + cek manual) untuk /publish dan batch
+        dedup_precheck: Cek duplikat lewat reader sebelum check-and-insert (mode per event)
+        dedup_backend: Backend dedup: sqlite, memory, atau mmap
+        dedup_mmap_path: File hash table backend mmap (default: <dir db>/dedup_keys.mmap)
+        dedup_mmap_capacity: Jumlah slot awal hash table mmap
+        dedup_shards: Jumlah shard SQLite (1 = satu file db_path)
+        dedup_shard_dir: Direktori file shard (default: <dir db>/shards)
+        payload_compression: Kompresi payload tersimpan: off, zlib, atau zlib-dict
+        payload_compression_level: Level kompresi zlib (1 = tercepat)
+        payload_compression_min_bytes: Payload lebih kecil dari ini disimpan apa adanya
+        payload_dict_samples: Contoh payload per topic untuk melatih dictionary
+        payload_dict_size: Ukuran maksimal dictionary per topic (byte)
+        retention_payload_seconds: Umur payload penuh sebelum di-compact (0 = selamanya)
+        retention_key_seconds: Umur key dedup sebelum dihapus (0 = selamanya)
+        retention_topics: Kebijakan per topic, format topic=payload[:key],...
+        retention_archive_dir: Arsip payload yang di-compact ("" = dibuang)
+        retention_archive_format: Format arsip: ndjson atau columnar (segment, bisa di-scan)
+        archive_max_fields: Maksimal field payload yang dijadikan kolom bertipe per segment
+        compaction_interval_s: Jeda antar putaran compaction
+        compaction_chunk_size: Baris per transaksi compaction
+        compaction_chunk_pause_ms: Jeda antar chunk compaction
+        compaction_vacuum_pages: Page per incremental vacuum (0 = nonaktif)
+        subscribe_buffer_size: Maksimal event tertunda per subscriber /subscribe
+        subscribe_slow_policy: Subscriber lambat: drop (buang terlama) atau disconnect
+        subscribe_replay_size: Event terakhir yang disimpan untuk resume Last-Event-ID
+        subscribe_heartbeat_s: Jeda keep-alive SSE saat tidak ada event
+        aggregates_enabled: Agregasi window per (topic, source) untuk GET /aggregates (opt-in)
+        aggregate_pane_s: Granularitas pane; ukuran/slide window harus kelipatannya
+        aggregate_retention_s: Umur pane di memori (dari pane terbaru)
+        aggregate_flush_s: Jeda flush pane yang berubah ke SQLite
+        aggregate_max_fields: Maksimal field payload numerik per pane
+        aggregate_max_skew_s: Batas timestamp event di depan jam dinding (detik)
+        aggregate_db_path: File ringkasan pane (default: <dir db>/aggregates.db)
+        ingest_mode: standalone (satu proses) atau frontend (worker HTTP ke proses writer)
+        ingest_socket: Unix socket proses writer (default: <dir db>/ingest.sock)
+    """
+    db_path: str = "data/dedup_store.db"
+    batch_size: int = 100
+    batch_timeout_ms: float = 10.0
+    consumer_workers: int = 4
+    queue_max_size: int = 100000
+    queue_high_watermark: int = 0
+    queue_low_watermark: int = -1
+    enqueue_timeout_ms: float = 0.0
+    retry_after_seconds: int = 1
+    ingest_log_enabled: bool = True
+    ingest_log_dir: str = ""
+    ingest_log_segment_bytes: int = 64 * 1024 * 1024
+    ingest_log_sync_ms: float = 2.0
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64000
+    sqlite_reader_pool: int = 4
+    dedup_cache_size: int = 100000
+    fast_ingest: bool = True
+    dedup_precheck: bool = False
+    dedup_backend: str = "sqlite"
+    dedup_mmap_path: str = ""
+    dedup_mmap_capacity: int = 1 << 16
+    dedup_shards: int = 1
+    dedup_shard_dir: str = ""
+    payload_compression: str = "off"
+    payload_compression_level: int = 1
+    payload_compression_min_bytes: int = 128
+    payload_dict_samples: int = 100
+    payload_dict_size: int = 4096
+    retention_payload_seconds: float = 0
+    retention_key_seconds: float = 0
+    retention_topics: str = ""
+    retention_archive_dir: str = ""
+    retention_archive_format: str = "ndjson"
+    archive_max_fields: int = 32
+    compaction_interval_s: float = 60.0
+    compaction_chunk_size: int = 1000
+    compaction_chunk_pause_ms: float = 50.0
+    compaction_vacuum_pages: int = 0
+    subscribe_buffer_size: int = 1000
+    subscribe_slow_policy: str = "drop"
+    subscribe_replay_size: int = 10000
+    subscribe_heartbeat_s: float = 15.0
+    aggregates_enabled: bool = False
+    aggregate_pane_s: int = 60
+    aggregate_retention_s: int = 86400
+    aggregate_flush_s: float = 5.0
+    aggregate_max_fields: int = 16
+    aggregate_max_skew_s: int = 300
+    aggregate_db_path: str = ""
+    ingest_mode: str = "standalone"
+    ingest_socket: str = ""
+    
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Buat Settings dari environment variable"""
+        return cls(
+            db_path=_env_str("DEDUP_DB_PATH", cls.db_path),
+            batch_size=_env_int("CONSUMER_BATCH_SIZE", cls.batch_size),
+            batch_timeout_ms=_env_float("CONSUMER_BATCH_TIMEOUT_MS", cls.batch_timeout_ms),
+            consumer_workers=_env_int("CONSUMER_WORKERS", cls.consumer_workers),
+            queue_max_size=_env_int("QUEUE_MAX_SIZE", cls.queue_max_size),
+            queue_high_watermark=_env_int("QUEUE_HIGH_WATERMARK", cls.queue_high_watermark),
+            queue_low_watermark=_env_int("QUEUE_LOW_WATERMARK", cls.queue_low_watermark),
+            enqueue_timeout_ms=_env_float("ENQUEUE_TIMEOUT_MS", cls.enqueue_timeout_ms),
+            retry_after_seconds=_env_int("RETRY_AFTER_SECONDS", cls.retry_after_seconds),
+            sqlite_synchronous=_env_str("SQLITE_SYNCHRONOUS", cls.sqlite_synchronous),
+            sqlite_mmap_size=_env_int("SQLITE_MMAP_SIZE", cls.sqlite_mmap_size),
+            sqlite_cache_size=_env_int("SQLITE_CACHE_SIZE", cls.sqlite_cache_size),
+            sqlite_reader_pool=_env_int("SQLITE_READER_POOL", cls.sqlite_reader_pool),
+            dedup_cache_size=_env_int("DEDUP_CACHE_SIZE", cls.dedup_cache_size),
+            fast_ingest=_env_bool("FAST_INGEST", cls.fast_ingest),
+            dedup_precheck=_env_bool("DEDUP_PRECHECK", cls.dedup_precheck),
+            dedup_backend=_env_str("DEDUP_BACKEND", cls.dedup_backend).lower(),
+            dedup_mmap_path=_env_str("DEDUP_MMAP_PATH", cls.dedup_mmap_path),
+            dedup_mmap_capacity=_env_int("DEDUP_MMAP_CAPACITY", cls.dedup_mmap_capacity),
+            dedup_shards=_env_int("DEDUP_SHARDS", cls.dedup_shards),
+            dedup_shard_dir=_env_str("DEDUP_SHARD_DIR", cls.dedup_shard_dir),
+            payload_compression=_env_str("PAYLOAD_COMPRESSION", cls.payload_compression).lower(),
+            payload_compression_level=_env_int(
+                "PAYLOAD_COMPRESSION_LEVEL", cls.payload_compression_level
+            ),
+            payload_compression_min_bytes=_env_int(
+                "PAYLOAD_COMPRESSION_MIN_BYTES", cls.payload_compression_min_bytes
+            ),
+            payload_dict_samples=_env_int("PAYLOAD_DICT_SAMPLES", cls.payload_dict_samples),
+            payload_dict_size=_env_int("PAYLOAD_DICT_SIZE", cls.payload_dict_size),
+            retention_payload_seconds=_env_float(
+                "RETENTION_PAYLOAD_SECONDS", cls.retention_payload_seconds
+            ),
+            retention_key_seconds=_env_float("RETENTION_KEY_SECONDS", cls.retention_key_seconds),
+            retention_topics=_env_str("RETENTION_TOPICS", cls.retention_topics),
+            retention_archive_dir=_env_str("RETENTION_ARCHIVE_DIR", cls.retention_archive_dir),
+            retention_archive_format=_env_str(
+                "RETENTION_ARCHIVE_FORMAT", cls.retention_archive_format
+            ).lower(),
+            archive_max_fields=_env_int("ARCHIVE_MAX_FIELDS", cls.archive_max_fields),
+            compaction_interval_s=_env_float("COMPACTION_INTERVAL_S", cls.compaction_interval_s),
+            compaction_chunk_size=_env_int("COMPACTION_CHUNK_SIZE", cls.compaction_chunk_size),
+            compaction_chunk_pause_ms=_env_float(
+                "COMPACTION_CHUNK_PAUSE_MS", cls.compaction_chunk_pause_ms
+            ),
+            compaction_vacuum_pages=_env_int(
+                "COMPACTION_VACUUM_PAGES", cls.compaction_vacuum_pages
+            ),
+            ingest_log_enabled=_env_bool("INGEST_LOG_ENABLED", cls.ingest_log_enabled),
+            ingest_log_dir=_env_str("INGEST_LOG_DIR", cls.ingest_log_dir),
+            ingest_log_segment_bytes=_env_int(
+                "INGEST_LOG_SEGMENT_BYTES", cls.ingest_log_segment_bytes
+            ),
+            ingest_log_sync_ms=_env_float("INGEST_LOG_SYNC_MS", cls.ingest_log_sync_ms),
+            subscribe_buffer_size=_env_int("SUBSCRIBE_BUFFER_SIZE", cls.subscribe_buffer_size),
+            subscribe_slow_policy=_env_str(
+                "SUBSCRIBE_SLOW_POLICY", cls.subscribe_slow_policy
+            ).lower(),
+            subscribe_replay_size=_env_int("SUBSCRIBE_REPLAY_SIZE", cls.subscribe_replay_size),
+            subscribe_heartbeat_s=_env_float("SUBSCRIBE_HEARTBEAT_S", cls.subscribe_heartbeat_s),
+            aggregates_enabled=_env_bool("AGGREGATES_ENABLED", cls.aggregates_enabled),
+            aggregate_pane_s=_env_int("AGGREGATE_PANE_S", cls.aggregate_pane_s),
+            aggregate_retention_s=_env_int("AGGREGATE_RETENTION_S", cls.aggregate_retention_s),
+            aggregate_flush_s=_env_float("AGGREGATE_FLUSH_S", cls.aggregate_flush_s),
+            aggregate_max_fields=_env_int("AGGREGATE_MAX_FIELDS", cls.aggregate_max_fields),
+            aggregate_max_skew_s=_env_int("AGGREGATE_MAX_SKEW_S", cls.aggregate_max_skew_s),
+            aggregate_db_path=_env_str("AGGREGATE_DB_PATH", cls.aggregate_db_path),
+            ingest_mode=_env_str("INGEST_MODE", cls.ingest_mode).lower(),
+            ingest_socket=_env_str("INGEST_SOCKET", cls.ingest_socket),
+        )
+    
+    def resolved_mmap_path(self) -> str:
+        """File hash table mmap; default di samping file database"""
+        return self.dedup_mmap_path or os.path.join(
+            os.path.dirname(self.db_path), "dedup_keys.mmap"
+        )
+    
+    def resolved_aggregate_db_path(self) -> str:
+        """File ringkasan pane agregasi; default di samping file database"""
+        return self.aggregate_db_path or os.path.join(
+            os.path.dirname(self.db_path), "aggregates.db"
+        )
+    
+    def resolved_shard_dir(self) -> str:
+        """Direktori shard; default di samping file database"""
+        return self.dedup_shard_dir or os.path.join(os.path.dirname(self.db_path), "shards")
+    
+    def resolved_ingest_log_dir(self) -> str:
+        """Direktori ingest log; default di samping file database"""
+        return self.ingest_log_dir or os.path.join(os.path.dirname(self.db_path), "ingest_log")
+    
+    def resolved_ingest_socket(self) -> str:
+        """Unix socket writer multi-proses; default di samping file database"""
+        return self.ingest_socket or os.path.join(
+            os.path.abspath(os.path.dirname(self.db_path)), "ingest.sock"
+        )
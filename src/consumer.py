@@ -4,54 +4,327 @@ Memproses event dari queue dengan idempotency dan deduplication
 """
 import asyncio
 import logging
+import time
+import zlib
 from datetime import datetime
-from typing import Dict, List
-from .dedup_store import DedupStore
+from typing import Dict, List, Optional, Tuple, Union
+from .async_store import AsyncDedupStore
+from .dedup_backend import DedupBackend
+from .ingest_log import IngestLog
+from .metrics import ConsumerMetrics
+from .models import EventRecord
+from .aggregates import WindowAggregator
+from .subscriptions import SubscriptionHub
 
 logger = logging.getLogger(__name__)
 
 
+class QueueFullError(Exception):
+    """Queue penuh / backpressure aktif; publisher harus mencoba lagi nanti"""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class EventConsumer:
     """
     Consumer yang memproses event dari queue
     Fitur:
     - Idempotent: event yang sama (topic, event_id) hanya diproses sekali
     - Deduplication: mendeteksi dan membuang event duplikat
-    - Persistent storage: menggunakan DedupStore untuk tahan restart
+    - Persistent storage: menggunakan DedupStore untuk tahan restart, atau
+      DedupBackend lain (memory / mmap) lewat check_and_mark
+    - Parallel workers: N worker dengan queue per partisi; event dirutekan
+      berdasarkan hash (topic, event_id) sehingga satu key selalu ditangani
+      worker yang sama
+    - Backpressure: queue berbatas dengan high/low watermark; saat penuh,
+      enqueue ditolak dengan QueueFullError
+    - Durability (opsional): event ditulis ke IngestLog sebelum masuk queue,
+      offset di-commit setelah tersimpan di DedupStore
+    
+    Item di queue berbentuk tuple (offset, EventRecord, enqueued_at); offset
+    None jika IngestLog tidak dipakai, enqueued_at dari time.perf_counter()
+    untuk histogram queue wait / end-to-end. Event dictionary diubah menjadi
+    EventRecord saat enqueue sehingga payload antre sebagai JSON bytes, bukan dict.
     """
     
-    def __init__(self, dedup_store: DedupStore):
+    def __init__(self, dedup_store: Union[DedupBackend, AsyncDedupStore], batch_size: int = 1,
+                 batch_timeout: float = 0.01, num_workers: int = 1,
+                 max_queue_size: int = 0, high_watermark: Optional[int] = None,
+                 low_watermark: Optional[int] = None, enqueue_timeout: float = 0.0,
+                 retry_after: int = 1, ingest_log: Optional[IngestLog] = None,
+                 precheck: bool = False, hub: Optional[SubscriptionHub] = None,
+                 aggregator: Optional[WindowAggregator] = None):
         """
         Inisialisasi consumer
         
         Args:
-            dedup_store: Instance DedupStore untuk persistensi
+            dedup_store: DedupStore / DedupBackend (atau AsyncDedupStore) untuk dedup
+            batch_size: Maksimal event per group commit; 1 = proses per event
+            batch_timeout: Waktu tunggu maksimal (detik) untuk melengkapi batch
+            num_workers: Jumlah worker paralel (satu queue per worker)
+            max_queue_size: Batas keras total event di queue (0 = tidak dibatasi)
+            high_watermark: Kedalaman queue yang mengaktifkan backpressure
+                (default = max_queue_size)
+            low_watermark: Kedalaman queue yang melepas backpressure
+                (default = 80% dari high_watermark)
+            enqueue_timeout: Waktu tunggu maksimal (detik) saat backpressure aktif
+                sebelum enqueue ditolak (0 = langsung ditolak)
+            retry_after: Saran detik untuk header Retry-After
+            ingest_log: IngestLog yang sudah dibuka (None = queue in-memory saja)
+            precheck: Mode per event: cek duplikat lewat reader (query) dulu
+                sebelum check_and_mark; default langsung check_and_mark yang
+                menentukan baru/duplikat dalam satu round trip writer
+            hub: SubscriptionHub penerima event unik yang baru tersimpan (optional)
+            aggregator: WindowAggregator untuk agregat window per (topic, source) (optional)
         """
-        self.dedup_store = dedup_store
-        self.queue: asyncio.Queue = asyncio.Queue()
+        # Semua I/O dari coroutine lewat AsyncDedupStore agar event loop tidak terblokir
+        if isinstance(dedup_store, AsyncDedupStore):
+            self.store = dedup_store
+        else:
+            self.store = AsyncDedupStore(dedup_store)
+        self.dedup_store = self.store.store
+        self.ingest_log = ingest_log
+        self.batch_size = max(1, batch_size)
+        self.batch_timeout = batch_timeout
+        self.precheck = precheck
+        self.hub = hub
+        self.aggregator = aggregator
+        self.num_workers = max(1, num_workers)
+        self.queues: List[asyncio.Queue] = [asyncio.Queue() for _ in range(self.num_workers)]
+        # Alias ke partisi pertama (satu-satunya queue pada mode single worker)
+        self.queue: asyncio.Queue = self.queues[0]
         self.is_running = False
         
+        # Backpressure (hysteresis antara high dan low watermark)
+        self.max_queue_size = max(0, max_queue_size)
+        self.high_watermark = high_watermark or self.max_queue_size
+        self.low_watermark = (
+            low_watermark if low_watermark is not None else int(self.high_watermark * 0.8)
+        )
+        self.enqueue_timeout = enqueue_timeout
+        self.retry_after = retry_after
+        self._backpressure_since: Optional[float] = None
+        # Event yang sudah di-admit tetapi belum masuk queue (menunggu fsync IngestLog)
+        self._reserved = 0
+        self._space_available = asyncio.Event()
+        self._space_available.set()
+        
         # Statistik
         self.stats = {
             'received': 0,
             'unique_processed': 0,
             'duplicate_dropped': 0,
+            'rejected': 0,
+            'replayed': 0,
             'start_time': datetime.utcnow()
         }
+        self.worker_stats = [
+            {'processed': 0, 'duplicates': 0} for _ in range(self.num_workers)
+        ]
+        # Histogram latency hot path (dirender oleh /metrics)
+        self.metrics = ConsumerMetrics()
+        
+        logger.info(f"EventConsumer initialized with {self.num_workers} worker(s)")
+    
+    def _partition(self, topic: str, event_id: str) -> int:
+        """
+        Tentukan partisi/worker untuk sebuah key
+        
+        Memakai crc32 (bukan hash() bawaan yang di-random per proses) agar
+        routing stabil dan deterministik.
+        """
+        if self.num_workers == 1:
+            return 0
+        return zlib.crc32(f"{topic}\x00{event_id}".encode("utf-8")) % self.num_workers
+    
+    def queue_depth(self) -> int:
+        """Total event yang menunggu di seluruh partisi"""
+        return sum(q.qsize() for q in self.queues)
+    
+    @property
+    def backpressure_active(self) -> bool:
+        """True jika backpressure sedang aktif"""
+        return self._backpressure_since is not None
+    
+    def _update_backpressure(self, incoming: int = 0):
+        """
+        Perbarui status backpressure berdasarkan kedalaman queue
         
-        logger.info("EventConsumer initialized")
+        Aktif saat depth + incoming melewati high watermark, lepas saat
+        depth turun ke low watermark.
+        """
+        if not self.max_queue_size:
+            return
+        depth = self.queue_depth() + self._reserved
+        if self._backpressure_since is not None and depth <= self.low_watermark:
+            self._backpressure_since = None
+            self._space_available.set()
+            logger.info(f"Backpressure released (queue depth {depth})")
+        elif self._backpressure_since is None and depth + incoming > self.high_watermark:
+            self._backpressure_since = time.monotonic()
+            self._space_available.clear()
+            logger.warning(f"Backpressure engaged (queue depth {depth})")
     
-    async def enqueue(self, event: dict):
+    def _admit(self, count: int) -> bool:
+        """Cek apakah count event boleh masuk queue sekarang"""
+        if not self.max_queue_size:
+            return True
+        self._update_backpressure(count)
+        return (
+            self._backpressure_since is None and
+            self.queue_depth() + self._reserved + count <= self.max_queue_size
+        )
+    
+    async def _reserve(self, count: int):
+        """
+        Pastikan ada ruang untuk count event, opsional menunggu sebentar
+        
+        Ruang yang diberikan langsung dicatat di _reserved agar publish lain
+        yang datang selama append IngestLog tidak ikut di-admit; pemanggil
+        wajib melepasnya lewat _release setelah put (atau saat append gagal).
+        
+        Raises:
+            QueueFullError: Jika queue tetap penuh setelah enqueue_timeout
+        """
+        if self._admit(count):
+            self._reserved += count
+            return
+        if self.enqueue_timeout > 0:
+            try:
+                await asyncio.wait_for(self._space_available.wait(), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                pass
+            if self._admit(count):
+                self._reserved += count
+                return
+        
+        self.stats['rejected'] += count
+        raise QueueFullError(
+            f"Queue penuh ({self.queue_depth()}/{self.max_queue_size}), coba lagi nanti",
+            retry_after=self.retry_after
+        )
+    
+    def _release(self, count: int):
+        """Lepas reservasi _reserve (event sudah di queue atau batal)"""
+        self._reserved -= count
+    
+    async def enqueue(self, event: Union[EventRecord, dict]):
         """
         Tambahkan event ke queue untuk diproses
         
         Args:
-            event: Event dictionary
+            event: EventRecord atau event dictionary
+            
+        Raises:
+            QueueFullError: Jika backpressure aktif dan queue tidak punya ruang
         """
-        await self.queue.put(event)
+        if type(event) is not EventRecord:
+            event = EventRecord.from_dict(event)
+        await self._reserve(1)
+        try:
+            offset = None
+            if self.ingest_log is not None:
+                offset = (await self.ingest_log.append([event]))[0]
+            await self.queues[self._partition(event['topic'], event['event_id'])].put(
+                (offset, event, time.perf_counter())
+            )
+        finally:
+            self._release(1)
         self.stats['received'] += 1
         logger.debug(f"Event enqueued: {event['topic']}:{event['event_id']}")
     
+    async def enqueue_many(self, events: List[Union[EventRecord, dict]]) -> Tuple[int, int]:
+        """
+        Tambahkan banyak event ke queue sekaligus (batch publish)
+        
+        Duplikat di dalam batch yang sama (topic, event_id) langsung dibuang
+        di sini sehingga tidak perlu melewati dedup store.
+        
+        Args:
+            events: List EventRecord (atau event dictionary) yang sudah tervalidasi
+            
+        Returns:
+            Tuple (accepted, duplicate)
+            
+        Raises:
+            QueueFullError: Jika queue tidak punya ruang untuk seluruh batch
+        """
+        seen = set()
+        unique = []
+        duplicate_counts: Dict[str, int] = {}
+        
+        for event in events:
+            if type(event) is not EventRecord:
+                event = EventRecord.from_dict(event)
+            key = (event.topic, event.event_id)
+            if key in seen:
+                duplicate_counts[key[0]] = duplicate_counts.get(key[0], 0) + 1
+            else:
+                seen.add(key)
+                unique.append(event)
+        
+        await self._reserve(len(unique))
+        try:
+            if self.ingest_log is not None:
+                offsets = await self.ingest_log.append(unique)
+            else:
+                offsets = [None] * len(unique)
+            enqueued_at = time.perf_counter()
+            for offset, event in zip(offsets, unique):
+                self.queues[self._partition(event['topic'], event['event_id'])].put_nowait(
+                    (offset, event, enqueued_at)
+                )
+        finally:
+            self._release(len(unique))
+        
+        accepted = len(unique)
+        duplicate = len(events) - accepted
+        
+        self.stats['received'] += accepted + duplicate
+        self.stats['duplicate_dropped'] += duplicate
+        if duplicate_counts:
+            self.store.note_duplicates(duplicate_counts)
+        logger.debug(f"Batch enqueued: {accepted} accepted, {duplicate} duplicate")
+        return accepted, duplicate
+    
+    async def replay(self, entries: List[Tuple[int, dict]]):
+        """
+        Masukkan kembali entri IngestLog yang belum committed (saat startup)
+        
+        Replay melewati backpressure karena event ini sudah pernah di-accept.
+        
+        Args:
+            entries: List (offset, event) dari IngestLog.open()
+        """
+        enqueued_at = time.perf_counter()
+        for offset, event in entries:
+            record = EventRecord.from_dict(event)
+            self.queues[self._partition(record.topic, record.event_id)].put_nowait(
+                (offset, record, enqueued_at)
+            )
+        self.stats['received'] += len(entries)
+        self.stats['replayed'] += len(entries)
+        if entries:
+            logger.info(f"Replayed {len(entries)} uncommitted events from ingest log")
+    
+    def _commit(self, offsets):
+        """Tandai offset IngestLog sudah tersimpan di DedupStore"""
+        if self.ingest_log is not None:
+            for offset in offsets:
+                self.ingest_log.commit(offset)
+    
+    async def _dead_letter(self, offsets: List[Optional[int]], events: List, error: Exception):
+        """
+        Event yang gagal diproses: log, lalu dead-letter di IngestLog
+        
+        Offset-nya di-commit sehingga IngestLog tidak macet di offset ini.
+        """
+        logger.error(f"Failed to process {len(events)} event(s): {error}", exc_info=True)
+        if self.ingest_log is not None:
+            await self.ingest_log.dead_letter(offsets, events, error)
+    
     async def start(self):
         """
         Mulai consumer loop
@@ -60,47 +333,191 @@ class EventConsumer:
         self.is_running = True
         logger.info("EventConsumer started")
         
+        await asyncio.gather(*(self._worker(i) for i in range(self.num_workers)))
+    
+    async def _worker(self, worker: int):
+        """
+        Loop satu worker: hanya membaca queue partisinya sendiri
+        
+        Args:
+            worker: Index worker / partisi
+        """
+        queue = self.queues[worker]
+        queue_wait = self.metrics.queue_wait
+        
         while self.is_running:
             try:
                 # Ambil event dari queue dengan timeout
-                event = await asyncio.wait_for(self.queue.get(), timeout=1.0)
-                await self._process_event(event)
+                item = await asyncio.wait_for(queue.get(), timeout=1.0)
+                if self.batch_size > 1:
+                    batch = await self._drain_batch(item, queue)
+                    if self._backpressure_since is not None:
+                        self._update_backpressure()
+                    now = time.perf_counter()
+                    for _, _, enqueued_at in batch:
+                        queue_wait.observe(now - enqueued_at)
+                    events = [event for _, event, _ in batch]
+                    offsets = [offset for offset, _, _ in batch]
+                    try:
+                        await self._process_batch(
+                            events, worker, offsets,
+                            [enqueued_at for _, _, enqueued_at in batch]
+                        )
+                    except Exception as e:
+                        await self._dead_letter(offsets, events, e)
+                else:
+                    if self._backpressure_since is not None:
+                        self._update_backpressure()
+                    offset, event, enqueued_at = item
+                    queue_wait.observe(time.perf_counter() - enqueued_at)
+                    try:
+                        await self._process_event(event, worker, offset, enqueued_at)
+                    except Exception as e:
+                        await self._dead_letter([offset], [event], e)
             except asyncio.TimeoutError:
                 # Tidak ada event, lanjut loop
                 continue
             except Exception as e:
                 logger.error(f"Error in consumer loop: {e}", exc_info=True)
     
-    async def _process_event(self, event: dict):
+    async def _drain_batch(self, first: tuple, queue: asyncio.Queue) -> List[tuple]:
+        """
+        Kumpulkan batch: sampai batch_size event atau batch_timeout habis
+        
+        Args:
+            first: Item (offset, event, enqueued_at) pertama yang sudah diambil dari queue
+            queue: Queue partisi yang sedang dikuras
+            
+        Returns:
+            List item (offset, event, enqueued_at) untuk satu group commit
+        """
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_timeout
+        
+        while len(batch) < self.batch_size:
+            # Ambil yang sudah tersedia tanpa menunggu
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            remaining = deadline - loop.time()
+            if len(batch) >= self.batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        return batch
+    
+    async def _process_batch(self, events: List[dict], worker: int = 0,
+                             offsets: Optional[List[Optional[int]]] = None,
+                             enqueued: Optional[List[float]] = None):
+        """
+        Proses batch event dengan satu transaksi ke dedup store
+        
+        Args:
+            events: List event dictionary
+            worker: Index worker yang memproses
+            offsets: Offset IngestLog untuk tiap event (optional)
+            enqueued: Waktu enqueue (perf_counter) tiap event (optional)
+        """
+        metrics = self.metrics
+        started = time.perf_counter()
+        results = await self.store.check_and_mark_many(events)
+        metrics.store.observe(time.perf_counter() - started)
+        self._commit(offsets or [])
+        if self.hub is not None or self.aggregator is not None:
+            self._fan_out([event for event, stored in zip(events, results) if stored])
+        worker_stats = self.worker_stats[worker]
+        
+        for event, stored in zip(events, results):
+            if stored:
+                self.stats['unique_processed'] += 1
+                worker_stats['processed'] += 1
+                logger.debug(f"Event processed: {event['topic']}:{event['event_id']}")
+                started = time.perf_counter()
+                await self._simulate_processing(event)
+                metrics.processing.observe(time.perf_counter() - started)
+            else:
+                self.stats['duplicate_dropped'] += 1
+                worker_stats['duplicates'] += 1
+                logger.debug(f"Duplicate event dropped: {event['topic']}:{event['event_id']}")
+        
+        if enqueued:
+            now = time.perf_counter()
+            for enqueued_at in enqueued:
+                metrics.end_to_end.observe(now - enqueued_at)
+        
+        logger.info(
+            f"Batch processed: {sum(results)} unique, {len(results) - sum(results)} duplicate"
+        )
+    
+    async def _process_event(self, event: dict, worker: int = 0,
+                             offset: Optional[int] = None,
+                             enqueued_at: Optional[float] = None):
         """
         Proses single event dengan idempotency check
         
         Args:
             event: Event dictionary
+            worker: Index worker yang memproses
+            offset: Offset IngestLog event ini (optional)
+            enqueued_at: Waktu enqueue (perf_counter) untuk histogram end-to-end
         """
         topic = event['topic']
         event_id = event['event_id']
+        worker_stats = self.worker_stats[worker]
+        metrics = self.metrics
         
-        # Cek apakah event sudah pernah diproses (idempotency check)
-        if self.dedup_store.is_duplicate(topic, event_id):
-            self.stats['duplicate_dropped'] += 1
-            logger.info(f"Duplicate event dropped: {topic}:{event_id}")
-            return
+        # Precheck opsional: duplikat yang dijawab front cache / reader tidak
+        # perlu antre di writer
+        if self.precheck:
+            started = time.perf_counter()
+            duplicate = await self.store.query(topic, event_id)
+            metrics.dedup_lookup.observe(time.perf_counter() - started)
+            if duplicate:
+                self.stats['duplicate_dropped'] += 1
+                worker_stats['duplicates'] += 1
+                self.store.note_duplicates({topic: 1})
+                self._commit([offset])
+                if enqueued_at is not None:
+                    metrics.end_to_end.observe(time.perf_counter() - enqueued_at)
+                logger.info(f"Duplicate event dropped: {topic}:{event_id}")
+                return
         
-        # Simpan event ke dedup store
-        stored = self.dedup_store.store_event(event)
+        # Check-and-insert atomik: baru vs duplikat dalam satu round trip
+        started = time.perf_counter()
+        stored = await self.store.check_and_mark(event)
+        metrics.store.observe(time.perf_counter() - started)
+        self._commit([offset])
         
         if stored:
             self.stats['unique_processed'] += 1
+            worker_stats['processed'] += 1
             logger.info(f"Event processed: {topic}:{event_id}")
+            if self.hub is not None or self.aggregator is not None:
+                self._fan_out([event])
             
             # Simulasi pemrosesan event
             # Di sini bisa ditambahkan logic pemrosesan sebenarnya
+            started = time.perf_counter()
             await self._simulate_processing(event)
+            metrics.processing.observe(time.perf_counter() - started)
         else:
-            # Race condition: event sudah disimpan oleh proses lain
             self.stats['duplicate_dropped'] += 1
-            logger.warning(f"Event already processed (race condition): {topic}:{event_id}")
+            worker_stats['duplicates'] += 1
+            logger.info(f"Duplicate event dropped: {topic}:{event_id}")
+        
+        if enqueued_at is not None:
+            metrics.end_to_end.observe(time.perf_counter() - enqueued_at)
+    
+    def _fan_out(self, stored: List[EventRecord]):
+        """Teruskan event unik yang baru tersimpan ke agregasi window dan subscriber"""
+        if self.aggregator is not None:
+            self.aggregator.add_many(stored)
+        if self.hub is not None:
+            self.hub.publish_many(stored)
     
     async def _simulate_processing(self, event: dict):
         """
@@ -128,17 +545,54 @@ class EventConsumer:
         Returns:
             Dictionary berisi statistik
         """
+        return self._build_stats(self.store.stats_snapshot())
+    
+    async def collect_stats(self) -> Dict:
+        """
+        Versi async get_stats (counter backend dibaca lewat thread jika perlu)
+        
+        Returns:
+            Dictionary berisi statistik
+        """
+        return self._build_stats(await self.store.collect_stats())
+    
+    def _build_stats(self, store_stats: Dict) -> Dict:
+        """Gabungkan counter consumer dengan statistik dedup store"""
         uptime = (datetime.utcnow() - self.stats['start_time']).total_seconds()
         
         return {
             'received': self.stats['received'],
             'unique_processed': self.stats['unique_processed'],
             'duplicate_dropped': self.stats['duplicate_dropped'],
-            'topics': self.dedup_store.get_topics(),
-            'uptime': uptime
+            'topics': store_stats['topics'],
+            'uptime': uptime,
+            'topic_stats': store_stats['topic_stats'],
+            'dedup_cache': store_stats['dedup_cache'],
+            'dedup_backend': store_stats['dedup_backend'],
+            'queue_depth': self.queue_depth(),
+            'max_queue_size': self.max_queue_size,
+            'backpressure_active': self.backpressure_active,
+            'backpressure_seconds': (
+                time.monotonic() - self._backpressure_since
+                if self._backpressure_since is not None else 0.0
+            ),
+            'rejected': self.stats['rejected'],
+            'replayed': self.stats['replayed'],
+            'ingest_log': self.ingest_log.get_stats() if self.ingest_log is not None else None,
+            'subscriptions': self.hub.get_stats() if self.hub is not None else None,
+            'aggregates': self.aggregator.get_stats() if self.aggregator is not None else None,
+            'workers': [
+                {
+                    'worker': i,
+                    'processed': ws['processed'],
+                    'duplicates': ws['duplicates'],
+                    'queue_depth': self.queues[i].qsize()
+                }
+                for i, ws in enumerate(self.worker_stats)
+            ]
         }
     
-    def get_events(self, topic: str = None, limit: int = 100) -> List[Dict]:
+    async def get_events(self, topic: str = None, limit: int = 100) -> List[Dict]:
         """
         Dapatkan daftar event yang telah diproses
         
@@ -149,4 +603,19 @@ class EventConsumer:
         Returns:
             List of event dictionaries
         """
-        return self.dedup_store.get_events(topic, limit)
+        return await self.store.get_events(topic, limit)
+    
+    async def get_events_page(self, topic: str = None, limit: int = 100,
+                              **filters) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Dapatkan satu halaman event dengan keyset pagination
+        
+        Args:
+            topic: Filter berdasarkan topic (optional)
+            limit: Maksimal jumlah event per halaman
+            **filters: cursor, since, until, processed_since, processed_until
+            
+        Returns:
+            Tuple (events, next_cursor)
+        """
+        return await self.store.get_events_page(topic, limit, **filters)
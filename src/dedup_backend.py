@@ -0,0 +1,441 @@
+"""
+Dedup Backend
+Interface minimal dedup ("apakah event ini sudah pernah dilihat?") dan
+dua implementasi ringan di samping DedupStore SQLite:
+- MemoryDedupBackend: set in-memory untuk test dan topic ephemeral
+- MmapDedupBackend: hash table open addressing di file memory-mapped,
+  lookup O(1) tanpa B-tree maupun SQL
+
+Backend ringan hanya menyimpan key dedup (16 byte, lihat dedup_key) dan
+counter per topic; payload event tidak disimpan sehingga /events dan
+/events/stream selalu kosong.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Protocol, Tuple, runtime_checkable
+
+from .dedup_store import dedup_key
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("sqlite", "memory", "mmap")
+
+
+@runtime_checkable
+class DedupBackend(Protocol):
+    """
+    Kontrak dedup yang dipakai EventConsumer
+    
+    - check_and_mark: tandai event; True jika baru (unik), False jika duplikat
+    - check_and_mark_many: versi batch, hasil sesuai urutan input
+    - query: cek tanpa menandai
+    - stats: ringkasan backend (nama, jumlah key, dsb.)
+    """
+    
+    def check_and_mark(self, event) -> bool: ...
+    
+    def check_and_mark_many(self, events: List) -> List[bool]: ...
+    
+    def query(self, topic: str, event_id: str) -> bool: ...
+    
+    def stats(self) -> Dict: ...
+
+
+class KeyOnlyBackend:
+    """
+    Basis backend yang hanya menyimpan key dedup
+    
+    Menyediakan counter per topic (total, duplicates, first_seen, last_seen)
+    dan permukaan API DedupStore yang dipakai consumer dan endpoint, sehingga
+    backend bisa menggantikan DedupStore tanpa cabang khusus. Subclass cukup
+    mengimplementasikan _mark, _contains, _reset, dan __len__.
+    
+    Secara default operasi tidak melakukan I/O blocking (blocking_io = False)
+    sehingga AsyncDedupStore memanggilnya langsung tanpa pindah thread; subclass
+    yang bisa blocking (mis. mmap) menimpa blocking_io = True.
+    """
+    
+    name = "key-only"
+    blocking_io = False
+    reader_pool_size = 1
+    cache = None
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topic_stats: Dict[str, Dict] = {}
+    
+    @property
+    def inline_counters(self) -> bool:
+        """Counter berbagi _lock dengan _mark; hanya aman dibaca di event loop jika tidak blocking"""
+        return not self.blocking_io
+    
+    def _mark(self, key: bytes) -> bool:
+        raise NotImplementedError
+    
+    def _contains(self, key: bytes) -> bool:
+        raise NotImplementedError
+    
+    def _reset(self):
+        raise NotImplementedError
+    
+    def __len__(self) -> int:
+        raise NotImplementedError
+    
+    def _entry(self, topic: str) -> Dict:
+        """Counter topic, dibuat jika belum ada (dipanggil dengan _lock dipegang)"""
+        entry = self._topic_stats.get(topic)
+        if entry is None:
+            entry = self._topic_stats[topic] = {
+                'total': 0, 'duplicates': 0, 'first_seen': None, 'last_seen': None
+            }
+        return entry
+    
+    def _after_write(self):
+        """Hook setelah key/counter berubah (dipanggil dengan _lock dipegang)"""
+    
+    def _count(self, topic: str, unique: bool, now: str):
+        """Update counter topic (dipanggil dengan _lock dipegang)"""
+        entry = self._entry(topic)
+        if unique:
+            entry['total'] += 1
+            entry['first_seen'] = entry['first_seen'] or now
+            entry['last_seen'] = now
+        else:
+            entry['duplicates'] += 1
+    
+    def check_and_mark(self, event) -> bool:
+        """
+        Tandai event sebagai sudah dilihat
+        
+        Args:
+            event: EventRecord atau event dictionary
+        
+        Returns:
+            True jika event baru, False jika duplikat
+        """
+        topic = event['topic']
+        key = dedup_key(topic, event['event_id'])
+        with self._lock:
+            unique = self._mark(key)
+            self._count(topic, unique, datetime.utcnow().isoformat())
+            self._after_write()
+        return unique
+    
+    def check_and_mark_many(self, events: List) -> List[bool]:
+        """Versi batch check_and_mark (satu lock dan satu timestamp per panggilan)"""
+        now = datetime.utcnow().isoformat()
+        results = []
+        with self._lock:
+            for event in events:
+                topic = event['topic']
+                unique = self._mark(dedup_key(topic, event['event_id']))
+                self._count(topic, unique, now)
+                results.append(unique)
+            self._after_write()
+        return results
+    
+    def query(self, topic: str, event_id: str) -> bool:
+        """True jika (topic, event_id) sudah pernah ditandai"""
+        key = dedup_key(topic, event_id)
+        with self._lock:
+            return self._contains(key)
+    
+    def stats(self) -> Dict:
+        return {'backend': self.name, 'keys': len(self), **self.get_stats()}
+    
+    # Permukaan API DedupStore (dipakai EventConsumer, AsyncDedupStore, endpoint)
+    
+    def is_duplicate(self, topic: str, event_id: str) -> bool:
+        return self.query(topic, event_id)
+    
+    def is_duplicate_cached(self, topic: str, event_id: str) -> Optional[bool]:
+        # Backend blocking (mmap) selalu di-probe lewat thread agar event loop
+        # tidak menunggu _lock yang dipegang _grow
+        if self.blocking_io:
+            return None
+        return self.query(topic, event_id)
+    
+    def is_duplicate_db(self, topic: str, event_id: str) -> bool:
+        return self.query(topic, event_id)
+    
+    def store_event(self, event) -> bool:
+        return self.check_and_mark(event)
+    
+    def store_events(self, events: List) -> List[bool]:
+        return self.check_and_mark_many(events)
+    
+    def note_duplicates(self, counts: Dict[str, int]):
+        """Catat duplikat yang dibuang sebelum sampai ke backend"""
+        with self._lock:
+            for topic, count in counts.items():
+                self._entry(topic)['duplicates'] += count
+            self._after_write()
+    
+    def get_topics(self) -> List[str]:
+        with self._lock:
+            return sorted(t for t, e in self._topic_stats.items() if e['total'] > 0)
+    
+    def get_topic_stats(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {'topic': topic, **entry}
+                for topic, entry in sorted(self._topic_stats.items())
+            ]
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'total_processed': sum(e['total'] for e in self._topic_stats.values()),
+                'topic_count': sum(1 for e in self._topic_stats.values() if e['total'] > 0)
+            }
+    
+    def get_cache_stats(self) -> Optional[Dict]:
+        return None
+    
+    def get_events(self, topic: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        return []
+    
+    def get_events_page(self, topic: Optional[str] = None, limit: int = 100,
+                        **filters) -> Tuple[List[Dict], Optional[str]]:
+        return [], None
+    
+    def iter_events_ndjson(self, topic: Optional[str] = None,
+                           batch_size: int = 1000) -> Iterator[bytes]:
+        return iter(())
+    
+    def get_db_size(self) -> int:
+        return 0
+    
+    def clear(self):
+        """Hapus semua key dan counter (untuk testing)"""
+        with self._lock:
+            self._reset()
+            self._topic_stats = {}
+        logger.warning(f"{type(self).__name__} cleared")
+    
+    def close(self):
+        pass
+
+
+class MemoryDedupBackend(KeyOnlyBackend):
+    """Backend dedup in-memory (hilang saat restart)"""
+    
+    name = "memory"
+    
+    def __init__(self):
+        super().__init__()
+        self._keys = set()
+    
+    def _mark(self, key: bytes) -> bool:
+        if key in self._keys:
+            return False
+        self._keys.add(key)
+        return True
+    
+    def _contains(self, key: bytes) -> bool:
+        return key in self._keys
+    
+    def _reset(self):
+        self._keys = set()
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+# Layout file: header 64 byte (magic, kapasitas, jumlah key) lalu slot 16 byte
+_MAGIC = b"DDUPMM01"
+_HEADER = struct.Struct("<8sQQ")
+_HEADER_SIZE = 64
+_SLOT_SIZE = 16
+_EMPTY_SLOT = bytes(_SLOT_SIZE)
+# Slot kosong bernilai nol; key nol (peluang 2^-128) dipetakan ke nilai ini
+_ZERO_KEY = bytes(_SLOT_SIZE - 1) + b"\x01"
+
+
+class MmapDedupBackend(KeyOnlyBackend):
+    """
+    Hash table dedup di file memory-mapped
+    
+    - Open addressing dengan linear probing; slot berisi key 16 byte,
+      index awal dari 8 byte pertama key (sudah berupa hash blake2b)
+    - Lookup dan insert O(1) rata-rata, langsung di page cache tanpa syscall
+    - Kapasitas (pangkat 2) digandakan saat load factor melewati max_load;
+      tabel baru ditulis ke file sementara lalu di-rename (atomic)
+    - Write masuk ke page cache dan tetap ada jika proses crash; flush ke
+      disk saat close. Counter per topic disimpan di file samping .topics.json
+      paling lambat tiap stats_interval detik, jadi crash hanya kehilangan
+      counter beberapa detik terakhir
+    
+    blocking_io = True: page fault di tabel besar dan rehash saat grow bisa
+    memakan ratusan milidetik, jadi AsyncDedupStore menjalankannya di thread.
+    """
+    
+    name = "mmap"
+    blocking_io = True
+    
+    def __init__(self, path: str, initial_capacity: int = 1 << 16, max_load: float = 0.7,
+                 stats_interval: float = 1.0):
+        """
+        Args:
+            path: Path file hash table (dibuat jika belum ada)
+            initial_capacity: Jumlah slot awal (dibulatkan ke pangkat 2)
+            max_load: Load factor maksimal sebelum tabel digandakan
+            stats_interval: Jeda maksimal (detik) sebelum counter topic disimpan
+        """
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.initial_capacity = 1 << max(4, (max(1, initial_capacity) - 1).bit_length())
+        self.max_load = max_load
+        self.stats_interval = stats_interval
+        self._stats_saved_at = time.monotonic()
+        self._file = None
+        self._mm = None
+        self._open()
+        self._load_topic_stats()
+        logger.info(f"MmapDedupBackend opened: {self.path} ({self._count_keys} keys, "
+                    f"capacity {self._capacity})")
+    
+    @property
+    def _topics_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".topics.json")
+    
+    @staticmethod
+    def _create(path: Path, capacity: int):
+        """Buat file tabel kosong dengan kapasitas tertentu"""
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, capacity, 0).ljust(_HEADER_SIZE, b"\0"))
+            f.truncate(_HEADER_SIZE + capacity * _SLOT_SIZE)
+    
+    def _open(self):
+        if not self.path.exists():
+            self._create(self.path, self.initial_capacity)
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        magic, capacity, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or len(self._mm) != _HEADER_SIZE + capacity * _SLOT_SIZE:
+            self._mm.close()
+            self._file.close()
+            raise ValueError(f"Bukan file hash table dedup yang valid: {self.path}")
+        self._capacity = capacity
+        self._count_keys = count
+    
+    def _close_map(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+    
+    def _probe(self, key: bytes) -> Tuple[int, bool]:
+        """Offset slot untuk key dan apakah key sudah ada di sana"""
+        mm = self._mm
+        mask = self._capacity - 1
+        index = int.from_bytes(key[:8], "little") & mask
+        while True:
+            offset = _HEADER_SIZE + index * _SLOT_SIZE
+            slot = mm[offset:offset + _SLOT_SIZE]
+            if slot == key:
+                return offset, True
+            if slot == _EMPTY_SLOT:
+                return offset, False
+            index = (index + 1) & mask
+    
+    def _mark(self, key: bytes) -> bool:
+        if key == _EMPTY_SLOT:
+            key = _ZERO_KEY
+        offset, found = self._probe(key)
+        if found:
+            return False
+        self._mm[offset:offset + _SLOT_SIZE] = key
+        self._count_keys += 1
+        struct.pack_into("<Q", self._mm, 16, self._count_keys)
+        if self._count_keys > self._capacity * self.max_load:
+            self._grow()
+        return True
+    
+    def _contains(self, key: bytes) -> bool:
+        if key == _EMPTY_SLOT:
+            key = _ZERO_KEY
+        return self._probe(key)[1]
+    
+    def _grow(self):
+        """Gandakan kapasitas: rehash ke file baru lalu rename atomic"""
+        capacity = self._capacity * 2
+        tmp = self.path.with_name(self.path.name + ".grow")
+        self._create(tmp, capacity)
+        old = self._mm
+        with open(tmp, "r+b") as f, mmap.mmap(f.fileno(), 0) as mm:
+            mask = capacity - 1
+            for offset in range(_HEADER_SIZE, len(old), _SLOT_SIZE):
+                key = old[offset:offset + _SLOT_SIZE]
+                if key == _EMPTY_SLOT:
+                    continue
+                index = int.from_bytes(key[:8], "little") & mask
+                target = _HEADER_SIZE + index * _SLOT_SIZE
+                while mm[target:target + _SLOT_SIZE] != _EMPTY_SLOT:
+                    index = (index + 1) & mask
+                    target = _HEADER_SIZE + index * _SLOT_SIZE
+                mm[target:target + _SLOT_SIZE] = key
+            struct.pack_into("<Q", mm, 16, self._count_keys)
+            mm.flush()
+        self._close_map()
+        os.replace(tmp, self.path)
+        self._open()
+        self._save_topic_stats()
+        logger.info(f"MmapDedupBackend grown to {capacity} slots ({self._count_keys} keys)")
+    
+    def _after_write(self):
+        if time.monotonic() - self._stats_saved_at >= self.stats_interval:
+            self._save_topic_stats()
+    
+    def _load_topic_stats(self):
+        try:
+            with open(self._topics_path, encoding="utf-8") as f:
+                self._topic_stats = json.load(f)
+        except FileNotFoundError:
+            pass
+    
+    def _save_topic_stats(self):
+        tmp = self._topics_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._topic_stats, f)
+        os.replace(tmp, self._topics_path)
+        self._stats_saved_at = time.monotonic()
+    
+    def _reset(self):
+        self._close_map()
+        self._create(self.path, self.initial_capacity)
+        self._open()
+        self._topics_path.unlink(missing_ok=True)
+    
+    def __len__(self) -> int:
+        return self._count_keys
+    
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats['capacity'] = self._capacity
+        stats['load_factor'] = self._count_keys / self._capacity
+        return stats
+    
+    def get_db_size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+    
+    def close(self):
+        """Flush tabel dan counter topic ke disk lalu tutup mmap"""
+        with self._lock:
+            if self._mm is None:
+                return
+            self._save_topic_stats()
+            self._close_map()
+        logger.info("MmapDedupBackend closed")
@@ -0,0 +1,276 @@
+"""
+Front cache in-memory untuk DedupStore
+Dua level index di depan SQLite:
+- Bloom filter (scalable): jika key belum pernah terlihat, lookup ke database dilewati
+- LRU: key terbaru yang pasti sudah ada, duplikat "panas" ditolak di memori
+"""
+import hashlib
+import logging
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _key_bytes(topic: str, event_id: str) -> bytes:
+    """Encode (topic, event_id) menjadi bytes unik untuk hashing"""
+    return topic.encode("utf-8") + b"\x00" + event_id.encode("utf-8")
+
+
+def _hashes(key: bytes) -> Tuple[int, int]:
+    """Dua hash 64-bit untuk double hashing (dihitung sekali per key)"""
+    digest = hashlib.blake2b(key, digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """
+    Bloom filter sederhana berbasis bytearray
+    Tidak pernah false negative; false positive dibatasi oleh error_rate
+    selama jumlah item tidak melebihi capacity
+    """
+    
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Args:
+            capacity: Jumlah item yang direncanakan
+            error_rate: Target probabilitas false positive
+        """
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, h1: int, h2: int):
+        """Double hashing: posisi bit ke-i = h1 + i * h2"""
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+    
+    def add_hashed(self, h1: int, h2: int):
+        for pos in self._positions(h1, h2):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+    
+    def contains_hashed(self, h1: int, h2: int) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(h1, h2))
+    
+    def add(self, key: bytes):
+        """Tambahkan key ke filter"""
+        self.add_hashed(*_hashes(key))
+    
+    def __contains__(self, key: bytes) -> bool:
+        return self.contains_hashed(*_hashes(key))
+    
+    @property
+    def saturated(self) -> bool:
+        """True jika jumlah item sudah melewati kapasitas rencana"""
+        return self.count > self.capacity
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter yang tumbuh tanpa rebuild
+    
+    Saat layer terakhir mencapai kapasitasnya, layer baru ditambahkan dengan
+    kapasitas GROWTH kali lipat dan error rate TIGHTENING kali lebih kecil;
+    layer lama tetap dipakai apa adanya. Total false positive tetap di bawah
+    error_rate (deret geometri), dan tidak pernah ada rescan database.
+    """
+    
+    GROWTH = 2
+    TIGHTENING = 0.5
+    
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Args:
+            capacity: Kapasitas layer pertama
+            error_rate: Target probabilitas false positive gabungan
+        """
+        self.error_rate = error_rate
+        self.layers: List[BloomFilter] = [
+            BloomFilter(capacity, error_rate * (1 - self.TIGHTENING))
+        ]
+    
+    def add(self, key: bytes):
+        """Tambahkan key ke layer terakhir, buat layer baru jika sudah penuh"""
+        layer = self.layers[-1]
+        if layer.saturated:
+            layer = BloomFilter(
+                layer.capacity * self.GROWTH, layer.error_rate * self.TIGHTENING
+            )
+            self.layers.append(layer)
+            logger.info(
+                f"Bloom filter grown to {len(self.layers)} layers "
+                f"(new layer capacity {layer.capacity})"
+            )
+        layer.add(key)
+    
+    def __contains__(self, key: bytes) -> bool:
+        h1, h2 = _hashes(key)
+        # Layer terbaru paling besar dan berisi key paling baru
+        return any(layer.contains_hashed(h1, h2) for layer in reversed(self.layers))
+    
+    @property
+    def count(self) -> int:
+        return sum(layer.count for layer in self.layers)
+    
+    @property
+    def capacity(self) -> int:
+        return sum(layer.capacity for layer in self.layers)
+
+
+class LRUCache:
+    """LRU berbatas untuk key yang diketahui sudah tersimpan"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[bytes, None]" = OrderedDict()
+    
+    def __contains__(self, key: bytes) -> bool:
+        if key in self._items:
+            self._items.move_to_end(key)
+            return True
+        return False
+    
+    def add(self, key: bytes):
+        """Tambahkan key, buang key paling lama jika penuh"""
+        self._items[key] = None
+        self._items.move_to_end(key)
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+    
+    def discard(self, key: bytes):
+        """Buang key jika ada"""
+        self._items.pop(key, None)
+    
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class DedupCache:
+    """
+    Gabungan Bloom filter + LRU dengan statistik hit/miss
+    
+    Aturan lookup:
+    - LRU hit            -> pasti duplikat
+    - Bloom miss         -> pasti belum pernah terlihat (DB dilewati)
+    - selain itu         -> harus dicek ke database
+    """
+    
+    # Hasil lookup
+    DUPLICATE = 1
+    NEW = 0
+    UNKNOWN = -1
+    
+    def __init__(self, lru_size: int = 100000, min_capacity: int = 100000,
+                 error_rate: float = 0.01):
+        """
+        Args:
+            lru_size: Maksimal key di LRU
+            min_capacity: Kapasitas minimal Bloom filter
+            error_rate: Target false positive Bloom filter
+        """
+        self.lru_size = lru_size
+        self.min_capacity = min_capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self.bloom = ScalableBloomFilter(min_capacity, error_rate)
+        self.lru = LRUCache(lru_size)
+        self.stats = {
+            'lru_hits': 0,
+            'bloom_negatives': 0,
+            'db_lookups': 0,
+            'bloom_false_positives': 0,
+        }
+    
+    def warm(self, keys: Iterable[Tuple[str, str]], row_count: int):
+        """
+        Bangun ulang Bloom filter dari seluruh key yang tersimpan (startup)
+        
+        Args:
+            keys: Iterable (topic, event_id); key terakhir dianggap paling baru
+            row_count: Jumlah baris, dipakai untuk sizing Bloom filter
+        """
+        bloom = ScalableBloomFilter(max(self.min_capacity, row_count * 2), self.error_rate)
+        lru = LRUCache(self.lru_size)
+        for topic, event_id in keys:
+            key = _key_bytes(topic, event_id)
+            bloom.add(key)
+            lru.add(key)
+        with self._lock:
+            self.bloom = bloom
+            self.lru = lru
+        logger.info(
+            f"DedupCache warmed: {bloom.count} keys, bloom capacity {bloom.capacity}, "
+            f"{len(lru)} keys in LRU"
+        )
+    
+    def lookup(self, topic: str, event_id: str) -> int:
+        """
+        Cek key di cache
+        
+        Returns:
+            DUPLICATE, NEW, atau UNKNOWN (perlu cek database)
+        """
+        key = _key_bytes(topic, event_id)
+        with self._lock:
+            if key in self.lru:
+                self.stats['lru_hits'] += 1
+                return self.DUPLICATE
+            if key not in self.bloom:
+                self.stats['bloom_negatives'] += 1
+                return self.NEW
+            self.stats['db_lookups'] += 1
+            return self.UNKNOWN
+    
+    def record_db_result(self, topic: str, event_id: str, exists: bool):
+        """Catat hasil lookup database untuk key berstatus UNKNOWN"""
+        with self._lock:
+            if exists:
+                self.lru.add(_key_bytes(topic, event_id))
+            else:
+                self.stats['bloom_false_positives'] += 1
+    
+    def add(self, topic: str, event_id: str):
+        """Tandai key sebagai tersimpan (dipanggil setelah INSERT berhasil)"""
+        key = _key_bytes(topic, event_id)
+        with self._lock:
+            self.bloom.add(key)
+            self.lru.add(key)
+    
+    def discard(self, topic: str, event_id: str):
+        """
+        Lupakan key yang sudah dihapus dari database (retention)
+        
+        Key hanya dibuang dari LRU; Bloom filter tidak mendukung penghapusan,
+        sehingga lookup berikutnya berstatus UNKNOWN dan dicek ke database.
+        """
+        with self._lock:
+            self.lru.discard(_key_bytes(topic, event_id))
+    
+    def reset(self):
+        """Kosongkan cache (misalnya setelah store di-clear)"""
+        with self._lock:
+            self.bloom = ScalableBloomFilter(self.min_capacity, self.error_rate)
+            self.lru = LRUCache(self.lru_size)
+    
+    def get_stats(self) -> Dict:
+        """Statistik hit/miss cache"""
+        with self._lock:
+            lookups = (
+                self.stats['lru_hits'] + self.stats['bloom_negatives'] + self.stats['db_lookups']
+            )
+            served = self.stats['lru_hits'] + self.stats['bloom_negatives']
+            return {
+                **self.stats,
+                'lookups': lookups,
+                'hit_rate': served / lookups if lookups else 0.0,
+                'bloom_keys': self.bloom.count,
+                'bloom_capacity': self.bloom.capacity,
+                'bloom_layers': len(self.bloom.layers),
+                'lru_size': len(self.lru),
+            }
@@ -3,53 +3,308 @@ Deduplication Store menggunakan SQLite
 Menyimpan event yang sudah diproses untuk deteksi duplikasi
 """
 import sqlite3
+import base64
+import hashlib
 import json
 import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Callable, Optional, List, Dict, Iterator, Tuple
 from pathlib import Path
 
+from .dedup_cache import DedupCache
+from .models import EventRecord, utc_iso
+from .payload_codec import PayloadCodec, store_dict
+
 logger = logging.getLogger(__name__)
 
+# SQL disimpan sebagai konstanta supaya string-nya identik di setiap panggilan
+# sehingga statement cache sqlite3 (per koneksi) bisa dipakai ulang
+_SQL_INSERT = """
+    INSERT INTO processed_events
+    (topic, event_id, timestamp, source, payload, processed_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# Dedup key: hash 16-byte di tabel WITHOUT ROWID, diverifikasi ke baris arsip
+_SQL_LOOKUP_KEY = """
+    SELECT e.topic, e.event_id
+    FROM dedup_keys k LEFT JOIN processed_events e ON e.id = k.archive_id
+    WHERE k.key = ?
+"""
+# Klaim key sekaligus menetapkan id arsip berikutnya; baris kembali hanya jika
+# key belum ada (RETURNING butuh SQLite >= 3.35, selain itu lookup + insert)
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+_SQL_CLAIM_KEY = """
+    INSERT INTO dedup_keys (key, archive_id)
+    SELECT ?, COALESCE(
+        (SELECT seq FROM sqlite_sequence WHERE name = 'processed_events'), 0
+    ) + 1
+    WHERE true
+    ON CONFLICT(key) DO NOTHING
+    RETURNING archive_id
+"""
+_SQL_INSERT_WITH_ID = """
+    INSERT INTO processed_events
+    (id, topic, event_id, timestamp, source, payload, processed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+_SQL_LOOKUP_COLLISION = "SELECT 1 FROM dedup_collisions WHERE topic = ? AND event_id = ?"
+_SQL_UPSERT_KEY = "INSERT OR REPLACE INTO dedup_keys (key, archive_id) VALUES (?, ?)"
+_SQL_INSERT_COLLISION = """
+    INSERT OR REPLACE INTO dedup_collisions (topic, event_id, archive_id) VALUES (?, ?, ?)
+"""
+
+_SQL_UPSERT_TOPIC_STATS = """
+    INSERT INTO topic_stats (topic, total, duplicates, first_seen, last_seen)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(topic) DO UPDATE SET
+        total = total + excluded.total,
+        duplicates = duplicates + excluded.duplicates,
+        first_seen = COALESCE(first_seen, excluded.first_seen),
+        last_seen = COALESCE(excluded.last_seen, last_seen)
+"""
+
+_SQL_UPSERT_RETENTION_MARK = """
+    INSERT INTO retention_state (topic, payload_compacted_id)
+    VALUES (?, ?)
+    ON CONFLICT(topic) DO UPDATE SET payload_compacted_id = excluded.payload_compacted_id
+"""
+
+# Payload event yang sudah melewati retensi diganti JSON null
+COMPACTED_PAYLOAD = "null"
+
+# Versi skema (PRAGMA user_version); 1 = dedup key dipisah ke tabel dedup_keys
+_SCHEMA_VERSION = 1
+
+# Status key hasil _key_state
+_KEY_FREE = 0        # belum ada event dengan hash ini
+_KEY_MATCH = 1       # event yang sama sudah tersimpan (duplikat)
+_KEY_COLLISION = 2   # hash dipakai event lain (collision), event ini belum tersimpan
+
+_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def dedup_key(topic: str, event_id: str) -> bytes:
+    """Hash 16-byte (blake2b) dari (topic, event_id) untuk tabel dedup_keys"""
+    raw = topic.encode("utf-8") + b"\x00" + event_id.encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+def encode_cursor(last_id: int) -> str:
+    """Encode id baris terakhir menjadi cursor opaque (base64url)"""
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode cursor menjadi id baris
+    
+    Raises:
+        ValueError: Jika cursor tidak valid
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        last_id = data["id"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Cursor tidak valid: {cursor}") from e
+    if not isinstance(last_id, int):
+        raise ValueError(f"Cursor tidak valid: {cursor}")
+    return last_id
+
 
 class DedupStore:
     """
     Store untuk menyimpan event yang telah diproses
     Menggunakan SQLite untuk persistensi yang tahan restart
     Idempotency: event dengan (topic, event_id) yang sama hanya diproses sekali
+    
+    Connection layer:
+    - Satu koneksi writer yang hidup selama store terbuka (dilindungi lock)
+    - Pool kecil koneksi reader read-only
+    - WAL journal mode sehingga reader tidak pernah memblokir writer
     """
     
-    def __init__(self, db_path: str = "data/dedup_store.db"):
+    def __init__(self, db_path: str = "data/dedup_store.db",
+                 synchronous: str = "NORMAL",
+                 mmap_size: int = 256 * 1024 * 1024,
+                 cache_size: int = -64000,
+                 reader_pool_size: int = 4,
+                 cached_statements: int = 256,
+                 dedup_cache_size: int = 100000,
+                 payload_compression: str = "off",
+                 compression_level: int = 1,
+                 compression_min_bytes: int = 128,
+                 dict_samples: int = 100,
+                 dict_size: int = 4096):
         """
         Inisialisasi dedup store
         
         Args:
             db_path: Path ke database SQLite
+            synchronous: PRAGMA synchronous (OFF/NORMAL/FULL/EXTRA)
+            mmap_size: PRAGMA mmap_size dalam byte (0 = nonaktif)
+            cache_size: PRAGMA cache_size (negatif = KiB, positif = jumlah page)
+            reader_pool_size: Maksimal koneksi reader read-only
+            cached_statements: Ukuran cache prepared statement per koneksi
+            dedup_cache_size: Ukuran LRU front cache (0 = tanpa Bloom/LRU cache)
+            payload_compression: Kompresi payload: off, zlib, atau zlib-dict
+            compression_level: Level kompresi zlib
+            compression_min_bytes: Payload lebih kecil dari ini tidak dikompresi
+            dict_samples: Contoh payload per topic untuk melatih dictionary
+            dict_size: Ukuran maksimal dictionary per topic (byte)
         """
+        synchronous = synchronous.upper()
+        if synchronous not in _SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous harus salah satu dari {_SYNCHRONOUS_MODES}")
+        
         self.db_path = db_path
-        self._conn = None
+        self.synchronous = synchronous
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.reader_pool_size = max(1, reader_pool_size)
+        self.cached_statements = cached_statements
+        self.codec = PayloadCodec(
+            payload_compression, level=compression_level, min_bytes=compression_min_bytes,
+            dict_samples=dict_samples, dict_size=dict_size
+        )
+        
+        self._conn: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.RLock()
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._reader_count = 0
+        self._pool_lock = threading.Lock()
+        
+        # Counter per topic (mirror in-memory dari tabel topic_stats)
+        self._stats_lock = threading.Lock()
+        # Serialkan compact_payloads (archive ditulis di luar lock writer)
+        self._compact_lock = threading.Lock()
+        self._topic_stats: Dict[str, Dict] = {}
+        self._pending_duplicates: Dict[str, int] = {}
         
         # Pastikan direktori exists
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         
         self._init_db()
+        self._load_topic_stats()
+        with self._writer() as conn:
+            self.codec.load_dicts(conn)
+        
+        # Front cache (Bloom + LRU) di depan is_duplicate
+        self.cache: Optional[DedupCache] = None
+        if dedup_cache_size > 0:
+            self.cache = DedupCache(lru_size=dedup_cache_size)
+            self._warm_cache()
+        
         logger.info(f"DedupStore initialized with database: {db_path}")
     
-    def _get_connection(self):
-        """Get or create database connection"""
+    def _apply_pragmas(self, conn: sqlite3.Connection):
+        """Terapkan PRAGMA tuning yang berlaku per koneksi"""
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA busy_timeout = 5000")
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """Get or create koneksi writer yang persisten"""
         if self._conn is None:
-            self._conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                cached_statements=self.cached_statements
+            )
+            # Hanya berlaku untuk database baru (harus sebelum WAL dan tabel
+            # pertama); memungkinkan PRAGMA incremental_vacuum setelah compaction
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA journal_mode = WAL")
+            self._apply_pragmas(conn)
+            self._conn = conn
         return self._conn
     
+    def _open_reader(self) -> sqlite3.Connection:
+        """Buka koneksi reader read-only baru"""
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        self._apply_pragmas(conn)
+        return conn
+    
+    @contextmanager
+    def _reader(self):
+        """
+        Pinjam koneksi reader dari pool
+        
+        Koneksi dibuat lazily sampai reader_pool_size; jika semua sedang
+        dipakai, pemanggil menunggu sampai ada yang dikembalikan.
+        """
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._pool_lock:
+                if self._reader_count < self.reader_pool_size:
+                    self._reader_count += 1
+                    conn = self._open_reader()
+            if conn is None:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+    
+    @contextmanager
+    def _writer(self):
+        """
+        Transaksi pada koneksi writer
+        
+        Commit otomatis saat blok selesai, rollback jika terjadi exception.
+        """
+        with self._write_lock:
+            conn = self._get_connection()
+            with conn:
+                yield conn
+    
     def close(self):
-        """Close database connection"""
-        if self._conn:
-            self._conn.close()
-            self._conn = None
+        """Close semua koneksi database (writer dan reader)"""
+        with self._write_lock:
+            if self._conn and self._pending_duplicates:
+                with self._writer() as conn:
+                    self._flush_topic_stats(conn, {}, None)
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+        with self._pool_lock:
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._reader_count = 0
     
     def _init_db(self):
-        """Inisialisasi database dan tabel"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Inisialisasi database dan tabel (termasuk migrasi skema lama)"""
+        with self._writer() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            legacy = version < _SCHEMA_VERSION and conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'processed_events'"
+            ).fetchone()
+            if legacy:
+                # DDL tidak membuka transaksi otomatis; migrasi harus atomik
+                conn.execute("BEGIN")
+                conn.execute("ALTER TABLE processed_events RENAME TO processed_events_legacy")
+            
+            # Arsip event; keunikan dijaga oleh dedup_keys, bukan index TEXT
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS processed_events (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -58,23 +313,342 @@ class DedupStore:
                     timestamp TEXT NOT NULL,
                     source TEXT NOT NULL,
                     payload TEXT NOT NULL,
-                    processed_at TEXT NOT NULL,
-                    UNIQUE(topic, event_id)
+                    processed_at TEXT NOT NULL
+                )
+            """)
+            
+            # Index dedup: hash 16-byte -> id baris arsip (clustered, tanpa rowid)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS dedup_keys (
+                    key BLOB PRIMARY KEY,
+                    archive_id INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            
+            # Event yang hash-nya bertabrakan dengan event lain (sangat jarang)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS dedup_collisions (
+                    topic TEXT NOT NULL,
+                    event_id TEXT NOT NULL,
+                    archive_id INTEGER NOT NULL,
+                    PRIMARY KEY (topic, event_id)
+                ) WITHOUT ROWID
+            """)
+            
+            if legacy:
+                self._migrate_legacy_events(conn)
+            
+            # Lookup (topic, event_id) sekarang lewat dedup_keys
+            conn.execute("DROP INDEX IF EXISTS idx_topic_event_id")
+            
+            # Keyset pagination: (topic, id) juga melayani filter topic saja,
+            # sehingga idx_topic lama menjadi redundan
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_topic_id
+                ON processed_events(topic, id)
+            """)
+            conn.execute("DROP INDEX IF EXISTS idx_topic")
+            
+            # Filter rentang waktu: timestamp apa adanya dari client (offset dan
+            # pecahan detik campuran), jadi dibandingkan sebagai julianday, bukan string
+            conn.execute("DROP INDEX IF EXISTS idx_timestamp")
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_timestamp_jd
+                ON processed_events(julianday(timestamp))
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_processed_at
+                ON processed_events(processed_at)
+            """)
+            
+            # Ringkasan per topic, diperbarui di transaksi write yang sama
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS topic_stats (
+                    topic TEXT PRIMARY KEY,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    duplicates INTEGER NOT NULL DEFAULT 0,
+                    first_seen TEXT,
+                    last_seen TEXT
                 )
             """)
             
-            # Index untuk performa lookup
+            # Posisi compaction payload per topic (id terakhir yang payload-nya dibuang)
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_topic_event_id 
-                ON processed_events(topic, event_id)
+                CREATE TABLE IF NOT EXISTS retention_state (
+                    topic TEXT PRIMARY KEY,
+                    payload_compacted_id INTEGER NOT NULL DEFAULT 0
+                )
             """)
             
+            # Dictionary kompresi payload (lihat payload_codec.py)
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_topic 
-                ON processed_events(topic)
+                CREATE TABLE IF NOT EXISTS payload_dicts (
+                    id INTEGER PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    dict BLOB NOT NULL,
+                    created_at TEXT NOT NULL
+                )
             """)
             
-            conn.commit()
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+    
+    def _migrate_legacy_events(self, conn: sqlite3.Connection):
+        """
+        Migrasi processed_events lama (UNIQUE(topic, event_id)) ke skema dedup_keys
+        
+        Baris disalin dengan id yang sama, lalu dedup_keys dibangun dari
+        seluruh baris. Berjalan di dalam transaksi _init_db.
+        """
+        logger.info("Migrating processed_events to hashed dedup_keys schema")
+        row = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'processed_events_legacy'"
+        ).fetchone()
+        conn.execute("""
+            INSERT INTO processed_events
+            (id, topic, event_id, timestamp, source, payload, processed_at)
+            SELECT id, topic, event_id, timestamp, source, payload, processed_at
+            FROM processed_events_legacy
+            ORDER BY id
+        """)
+        if row is not None:
+            # Pertahankan sequence AUTOINCREMENT (id yang pernah dihapus tidak dipakai ulang)
+            conn.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'processed_events'",
+                (row[0],)
+            )
+        conn.execute("DROP TABLE processed_events_legacy")
+        
+        migrated = collisions = 0
+        cursor = conn.execute("SELECT id, topic, event_id FROM processed_events ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            for archive_id, topic, event_id in rows:
+                # Data lama sudah unik; insert yang diabaikan berarti hash collision
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO dedup_keys (key, archive_id) VALUES (?, ?)",
+                    (dedup_key(topic, event_id), archive_id)
+                ).rowcount
+                if not inserted:
+                    conn.execute(_SQL_INSERT_COLLISION, (topic, event_id, archive_id))
+                    collisions += 1
+            migrated += len(rows)
+        logger.info(f"Migrated {migrated} events ({collisions} hash collisions)")
+    
+    def _load_topic_stats(self):
+        """
+        Muat topic_stats ke memori saat startup
+        
+        Database lama yang belum punya ringkasan dibangun ulang sekali dari
+        processed_events (duplikat historis tidak diketahui, dihitung 0).
+        """
+        with self._writer() as conn:
+            has_summary = conn.execute("SELECT 1 FROM topic_stats LIMIT 1").fetchone()
+            has_events = conn.execute("SELECT 1 FROM processed_events LIMIT 1").fetchone()
+            if has_events and not has_summary:
+                self._rebuild_topic_stats(conn)
+            rows = conn.execute(
+                "SELECT topic, total, duplicates, first_seen, last_seen FROM topic_stats"
+            ).fetchall()
+        
+        with self._stats_lock:
+            self._topic_stats = {
+                row[0]: {
+                    'total': row[1],
+                    'duplicates': row[2],
+                    'first_seen': row[3],
+                    'last_seen': row[4],
+                }
+                for row in rows
+            }
+    
+    def _rebuild_topic_stats(self, conn: sqlite3.Connection):
+        """Hitung ulang total/first_seen/last_seen per topic dari processed_events"""
+        logger.info("Rebuilding topic_stats from processed_events")
+        conn.execute("""
+            INSERT INTO topic_stats (topic, total, duplicates, first_seen, last_seen)
+            SELECT topic, COUNT(*), 0, MIN(processed_at), MAX(processed_at)
+            FROM processed_events
+            WHERE true
+            GROUP BY topic
+            ON CONFLICT(topic) DO UPDATE SET
+                total = excluded.total,
+                first_seen = excluded.first_seen,
+                last_seen = excluded.last_seen
+        """)
+    
+    def import_rows(self, rows: List[tuple]) -> int:
+        """
+        Import baris mentah apa adanya (dipakai tool reshard/migrasi offline)
+        
+        processed_at dan payload asli dipertahankan; baris yang sudah ada
+        diabaikan. Panggil refresh_topic_stats() setelah seluruh import selesai.
+        
+        Args:
+            rows: Tuple (topic, event_id, timestamp, source, payload, processed_at)
+        
+        Returns:
+            Jumlah baris yang benar-benar ditambahkan
+        """
+        added = 0
+        with self._writer() as conn:
+            for row in rows:
+                key = dedup_key(row[0], row[1])
+                state = self._key_state(conn, row[0], row[1], key)
+                if state != _KEY_MATCH:
+                    self._insert_event(conn, row, key, state)
+                    added += 1
+        return added
+    
+    def refresh_topic_stats(self):
+        """Bangun ulang topic_stats dari processed_events dan muat ulang ke memori"""
+        with self._writer() as conn:
+            self._rebuild_topic_stats(conn)
+        self._load_topic_stats()
+        if self.cache is not None:
+            self._warm_cache()
+    
+    def note_duplicates(self, counts: Dict[str, int]):
+        """
+        Catat duplikat yang dibuang per topic
+        
+        Counter in-memory langsung diperbarui; tabel topic_stats menyusul di
+        transaksi write berikutnya sehingga jalur duplikat tidak perlu commit.
+        
+        Args:
+            counts: Mapping topic -> jumlah duplikat
+        """
+        with self._stats_lock:
+            for topic, count in counts.items():
+                if not count:
+                    continue
+                self._pending_duplicates[topic] = self._pending_duplicates.get(topic, 0) + count
+                entry = self._topic_stats.setdefault(topic, {
+                    'total': 0, 'duplicates': 0, 'first_seen': None, 'last_seen': None
+                })
+                entry['duplicates'] += count
+    
+    def _flush_topic_stats(self, conn: sqlite3.Connection, new_counts: Dict[str, int],
+                           processed_at: Optional[str]):
+        """
+        Tulis perubahan topic_stats di dalam transaksi write yang sedang berjalan
+        
+        Args:
+            conn: Koneksi writer (di dalam transaksi)
+            new_counts: Mapping topic -> jumlah event baru di transaksi ini
+            processed_at: Waktu proses event baru
+        """
+        with self._stats_lock:
+            duplicates = self._pending_duplicates
+            self._pending_duplicates = {}
+        
+        rows = []
+        for topic in set(new_counts) | set(duplicates):
+            new = new_counts.get(topic, 0)
+            seen_at = processed_at if new else None
+            rows.append((topic, new, duplicates.get(topic, 0), seen_at, seen_at))
+        
+        try:
+            conn.executemany(_SQL_UPSERT_TOPIC_STATS, rows)
+        except Exception:
+            # Transaksi akan di-rollback; kembalikan duplikat ke antrean flush
+            with self._stats_lock:
+                for topic, count in duplicates.items():
+                    self._pending_duplicates[topic] = self._pending_duplicates.get(topic, 0) + count
+            raise
+    
+    def _apply_new_counts(self, new_counts: Dict[str, int], processed_at: str):
+        """Perbarui mirror in-memory setelah transaksi write berhasil commit"""
+        with self._stats_lock:
+            for topic, count in new_counts.items():
+                entry = self._topic_stats.setdefault(topic, {
+                    'total': 0, 'duplicates': 0, 'first_seen': None, 'last_seen': None
+                })
+                entry['total'] += count
+                if entry['first_seen'] is None:
+                    entry['first_seen'] = processed_at
+                entry['last_seen'] = processed_at
+    
+    def _warm_cache(self):
+        """Isi Bloom filter dan LRU dari processed_events (startup / refresh)"""
+        with self._reader() as conn:
+            row_count = conn.execute("SELECT COUNT(*) FROM processed_events").fetchone()[0]
+            cursor = conn.execute("SELECT topic, event_id FROM processed_events ORDER BY id")
+            self.cache.warm(((row[0], row[1]) for row in cursor), row_count)
+    
+    def get_cache_stats(self) -> Optional[Dict]:
+        """
+        Statistik hit/miss front cache
+        
+        Returns:
+            Dictionary statistik, atau None jika cache nonaktif
+        """
+        return self.cache.get_stats() if self.cache is not None else None
+    
+    @staticmethod
+    def _event_row(event, processed_at: str) -> tuple:
+        """
+        Ubah event menjadi tuple parameter INSERT
+        
+        EventRecord sudah membawa payload sebagai JSON sehingga tidak perlu
+        json.dumps ulang; event dictionary tetap didukung.
+        """
+        if type(event) is EventRecord:
+            return (
+                event.topic,
+                event.event_id,
+                event.timestamp,
+                event.source,
+                event.payload_json.decode("utf-8"),
+                processed_at
+            )
+        return (
+            event['topic'],
+            event['event_id'],
+            event['timestamp'],
+            event['source'],
+            json.dumps(event['payload']),
+            processed_at
+        )
+    
+    def _stored_row(self, event, processed_at: str) -> tuple:
+        """_event_row dengan payload yang sudah di-encode codec (jika aktif)"""
+        row = self._event_row(event, processed_at)
+        if not self.codec.enabled:
+            return row
+        return row[:4] + (self.codec.encode(row[0], row[4]),) + row[5:]
+    
+    @staticmethod
+    def _key_state(conn: sqlite3.Connection, topic: str, event_id: str, key: bytes) -> int:
+        """
+        Cek hash key di dedup_keys dan verifikasi ke baris arsip
+        
+        Hash yang sama milik event lain (collision) tidak dianggap duplikat;
+        event seperti itu dicatat di dedup_collisions saat disimpan.
+        Key yang menunjuk ke baris yang sudah dihapus dianggap bebas.
+        
+        Returns:
+            _KEY_FREE, _KEY_MATCH, atau _KEY_COLLISION
+        """
+        row = conn.execute(_SQL_LOOKUP_KEY, (key,)).fetchone()
+        if row is None or row[0] is None:
+            return _KEY_FREE
+        if row[0] == topic and row[1] == event_id:
+            return _KEY_MATCH
+        if conn.execute(_SQL_LOOKUP_COLLISION, (topic, event_id)).fetchone():
+            return _KEY_MATCH
+        return _KEY_COLLISION
+    
+    @staticmethod
+    def _insert_event(conn: sqlite3.Connection, row: tuple, key: bytes, state: int):
+        """Insert baris arsip lalu daftarkan key-nya (di dalam transaksi writer)"""
+        archive_id = conn.execute(_SQL_INSERT, row).lastrowid
+        if state == _KEY_COLLISION:
+            logger.warning(f"Dedup key hash collision: {row[0]}:{row[1]}")
+            conn.execute(_SQL_INSERT_COLLISION, (row[0], row[1], archive_id))
+        else:
+            conn.execute(_SQL_UPSERT_KEY, (key, archive_id))
     
     def is_duplicate(self, topic: str, event_id: str) -> bool:
         """
@@ -83,92 +657,506 @@ class DedupStore:
         Args:
             topic: Topic event
             event_id: ID event
-            
+        
         Returns:
             True jika event sudah pernah diproses (duplikat)
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                "SELECT COUNT(*) FROM processed_events WHERE topic = ? AND event_id = ?",
-                (topic, event_id)
-            )
-            count = cursor.fetchone()[0]
-            return count > 0
+        cached = self.is_duplicate_cached(topic, event_id)
+        if cached is not None:
+            return cached
+        return self.is_duplicate_db(topic, event_id)
+    
+    def is_duplicate_cached(self, topic: str, event_id: str) -> Optional[bool]:
+        """
+        Jawab is_duplicate hanya dari front cache (tanpa I/O)
+        
+        Returns:
+            True/False jika cache bisa memutuskan, None jika perlu cek database
+        """
+        if self.cache is None:
+            return None
+        state = self.cache.lookup(topic, event_id)
+        if state == DedupCache.UNKNOWN:
+            return None
+        return state == DedupCache.DUPLICATE
+    
+    def is_duplicate_db(self, topic: str, event_id: str) -> bool:
+        """Cek duplikasi langsung ke database lalu catat hasilnya di cache"""
+        with self._reader() as conn:
+            state = self._key_state(conn, topic, event_id, dedup_key(topic, event_id))
+        exists = state == _KEY_MATCH
+        
+        if self.cache is not None:
+            self.cache.record_db_result(topic, event_id, exists)
+        return exists
+    
+    def _check_and_store(self, conn: sqlite3.Connection, event, processed_at: str) -> bool:
+        """
+        Check-and-insert satu event di dalam transaksi writer
+        
+        Key diklaim dengan satu INSERT ... ON CONFLICT DO NOTHING RETURNING yang
+        sekaligus menetapkan id baris arsip (sqlite_sequence + 1, aman karena
+        writer tunggal memegang transaksi). Event baru cukup dua statement tanpa
+        SELECT terpisah; pemilik key hanya diverifikasi saat klaim gagal
+        (duplikat, key basi, atau hash collision).
+        
+        Returns:
+            True jika event baru disimpan, False jika duplikat
+        """
+        topic = event['topic']
+        event_id = event['event_id']
+        key = dedup_key(topic, event_id)
+        if _HAS_RETURNING:
+            claimed = conn.execute(_SQL_CLAIM_KEY, (key,)).fetchone()
+            if claimed is not None:
+                conn.execute(_SQL_INSERT_WITH_ID, (claimed[0],) + self._stored_row(event, processed_at))
+                return True
+        state = self._key_state(conn, topic, event_id, key)
+        if state == _KEY_MATCH:
+            return False
+        self._insert_event(conn, self._stored_row(event, processed_at), key, state)
+        return True
+    
+    def check_and_store(self, event) -> bool:
+        """
+        Simpan event jika belum pernah diproses, dalam satu round trip writer
+        
+        Menggantikan pola is_duplicate (reader) lalu store_event (writer):
+        baru vs duplikat ditentukan di transaksi yang sama dengan insert,
+        tanpa exception di jalur duplikat dan tanpa celah race di antaranya.
+        
+        Args:
+            event: EventRecord atau event dictionary
+        
+        Returns:
+            True jika berhasil disimpan, False jika duplikat
+        """
+        return self.check_and_store_many([event])[0]
+    
+    def check_and_store_many(self, events: List) -> List[bool]:
+        """
+        Versi batch check_and_store dalam satu transaksi (group commit)
+        
+        Hanya ada satu commit (satu fsync) untuk seluruh batch. Duplikat di
+        dalam batch yang sama terdeteksi karena key event pertama sudah
+        diklaim saat event berikutnya diproses. Duplikat panas yang ada di
+        LRU front cache tidak menyentuh database.
+        
+        Args:
+            events: List EventRecord / event dictionary
+        
+        Returns:
+            List boolean sejajar dengan input: True jika baru disimpan,
+            False jika duplikat (termasuk duplikat di dalam batch yang sama)
+        """
+        if not events:
+            return []
+        
+        processed_at = datetime.utcnow().isoformat()
+        results = []
+        lookups = []
+        
+        cache = self.cache
+        
+        with self._writer() as conn:
+            for event in events:
+                if cache is not None:
+                    lookup = cache.lookup(event['topic'], event['event_id'])
+                    lookups.append(lookup)
+                    if lookup == DedupCache.DUPLICATE:
+                        results.append(False)
+                        continue
+                results.append(self._check_and_store(conn, event, processed_at))
+            
+            new_counts: Dict[str, int] = {}
+            duplicate_counts: Dict[str, int] = {}
+            for event, stored in zip(events, results):
+                counts = new_counts if stored else duplicate_counts
+                counts[event['topic']] = counts.get(event['topic'], 0) + 1
+            self.note_duplicates(duplicate_counts)
+            # Batch yang seluruhnya duplikat tidak menulis apa pun; counter
+            # duplikat ikut di-flush pada write berikutnya
+            if new_counts:
+                self._flush_topic_stats(conn, new_counts, processed_at)
+        
+        self._apply_new_counts(new_counts, processed_at)
+        if self.codec.enabled:
+            self._store_pending_dicts()
+        
+        if cache is not None:
+            for event, stored, lookup in zip(events, results, lookups):
+                if stored:
+                    # Bloom bilang mungkin ada tapi INSERT berhasil: false positive
+                    if lookup == DedupCache.UNKNOWN:
+                        cache.record_db_result(event['topic'], event['event_id'], False)
+                    cache.add(event['topic'], event['event_id'])
+                else:
+                    cache.record_db_result(event['topic'], event['event_id'], True)
+        
+        logger.debug(f"Batch stored: {sum(results)} new, {len(results) - sum(results)} duplicate")
+        return results
+    
+    def _store_pending_dicts(self):
+        """
+        Simpan dictionary payload yang siap dilatih di transaksi tersendiri
+        
+        Dictionary baru dipakai encode setelah commit, sehingga tidak ada
+        baris yang mereferensikan dictionary yang belum tersimpan.
+        """
+        pending = self.codec.pending_dicts()
+        if not pending:
+            return
+        with self._writer() as conn:
+            stored = [(topic, store_dict(conn, topic, data), data) for topic, data in pending]
+        for topic, dict_id, data in stored:
+            self.codec.activate(topic, dict_id, data)
     
     def store_event(self, event: dict) -> bool:
         """
-        Simpan event yang telah diproses
+        Simpan event yang telah diproses (lihat check_and_store)
         
         Args:
             event: Dictionary event yang akan disimpan
-            
+        
         Returns:
             True jika berhasil disimpan, False jika duplikat
         """
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT INTO processed_events 
-                    (topic, event_id, timestamp, source, payload, processed_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    event['topic'],
-                    event['event_id'],
-                    event['timestamp'],
-                    event['source'],
-                    json.dumps(event['payload']),
-                    datetime.utcnow().isoformat()
-                ))
-                conn.commit()
-                logger.debug(f"Event stored: {event['topic']}:{event['event_id']}")
-                return True
-        except sqlite3.IntegrityError:
-            # Duplikat terdeteksi (UNIQUE constraint violated)
-            logger.debug(f"Duplicate detected: {event['topic']}:{event['event_id']}")
-            return False
+        return self.check_and_store(event)
+    
+    def store_events(self, events: List[dict]) -> List[bool]:
+        """Simpan banyak event dalam satu transaksi (lihat check_and_store_many)"""
+        return self.check_and_store_many(events)
+    
+    # Kontrak DedupBackend (lihat dedup_backend.py)
+    
+    def check_and_mark(self, event) -> bool:
+        """DedupBackend.check_and_mark: check_and_store"""
+        return self.check_and_store(event)
+    
+    def check_and_mark_many(self, events: List) -> List[bool]:
+        """DedupBackend.check_and_mark_many: check_and_store_many"""
+        return self.check_and_store_many(events)
+    
+    def query(self, topic: str, event_id: str) -> bool:
+        """DedupBackend.query: cek duplikat tanpa menyimpan"""
+        return self.is_duplicate(topic, event_id)
+    
+    def stats(self) -> Dict:
+        """DedupBackend.stats"""
+        return {
+            'backend': 'sqlite',
+            **self.get_stats(),
+            'payload_compression': self.codec.get_stats()
+        }
     
     def get_events(self, topic: Optional[str] = None, limit: int = 100) -> List[Dict]:
         """
-        Ambil daftar event yang telah diproses
+        Ambil daftar event yang telah diproses (terbaru dulu)
         
         Args:
             topic: Filter berdasarkan topic (optional)
             limit: Maksimal jumlah event yang dikembalikan
-            
+        
         Returns:
             List of event dictionaries
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        events, _ = self.get_events_page(topic, limit)
+        return events
+    
+    def get_events_page(self, topic: Optional[str] = None, limit: int = 100,
+                        cursor: Optional[str] = None,
+                        since: Optional[str] = None, until: Optional[str] = None,
+                        processed_since: Optional[str] = None,
+                        processed_until: Optional[str] = None,
+                        include_id: bool = False) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Ambil satu halaman event dengan keyset pagination
+        
+        Urutan berdasarkan id autoincrement (terbaru dulu). Halaman berikutnya
+        dilanjutkan dari "id < id terakhir" lewat index (topic, id), sehingga
+        biaya query konstan berapa pun jauhnya halaman.
+        
+        Args:
+            topic: Filter berdasarkan topic (optional)
+            limit: Maksimal jumlah event per halaman
+            cursor: next_cursor dari halaman sebelumnya (optional)
+            since/until: Rentang field timestamp (ISO8601, inklusif/eksklusif);
+                dibandingkan sebagai waktu UTC, bukan string
+            processed_since/processed_until: Rentang processed_at (ISO8601)
+            include_id: Sertakan kolom id internal di tiap event
+        
+        Returns:
+            Tuple (events, next_cursor); next_cursor None jika halaman terakhir
+        
+        Raises:
+            ValueError: Jika cursor atau since/until tidak valid
+        """
+        conditions = []
+        params: list = []
+        
+        if topic:
+            conditions.append("topic = ?")
+            params.append(topic)
+        if cursor:
+            conditions.append("id < ?")
+            params.append(decode_cursor(cursor))
+        if since:
+            conditions.append("julianday(timestamp) >= julianday(?)")
+            params.append(utc_iso(since))
+        if until:
+            conditions.append("julianday(timestamp) < julianday(?)")
+            params.append(utc_iso(until))
+        if processed_since:
+            conditions.append("processed_at >= ?")
+            params.append(processed_since)
+        if processed_until:
+            conditions.append("processed_at < ?")
+            params.append(processed_until)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit + 1)
+        
+        with self._reader() as conn:
+            rows = conn.execute(f"""
+                SELECT id, topic, event_id, timestamp, source, payload, processed_at
+                FROM processed_events
+                {where}
+                ORDER BY id DESC
+                LIMIT ?
+            """, params).fetchall()
             
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(rows[-1]['id'])
+            
+            # Payload terkompresi baru di-decode di sini, hanya untuk halaman ini
+            decode = self.codec.decode
+            events = []
+            for row in rows:
+                event = {
+                    'topic': row['topic'],
+                    'event_id': row['event_id'],
+                    'timestamp': row['timestamp'],
+                    'source': row['source'],
+                    'payload': json.loads(decode(row['payload'], conn)),
+                    'processed_at': row['processed_at']
+                }
+                if include_id:
+                    event['id'] = row['id']
+                events.append(event)
+        
+        return events, next_cursor
+    
+    def iter_events_ndjson(self, topic: Optional[str] = None,
+                           batch_size: int = 1000) -> Iterator[bytes]:
+        """
+        Stream seluruh event sebagai NDJSON tanpa membangun list di memori
+        
+        Cursor SQLite dibaca per fetchmany(batch_size) dan payload ditulis
+        apa adanya (JSON mentah yang tersimpan, di-decompress jika perlu) tanpa
+        json.loads/dumps ulang, sehingga pemakaian memori konstan berapa pun
+        besar ekspornya.
+        Koneksi reader dipinjam selama generator berjalan.
+        
+        Args:
+            topic: Filter berdasarkan topic (optional)
+            batch_size: Jumlah baris per fetchmany / per chunk output
+        
+        Yields:
+            Chunk bytes berisi satu atau lebih baris NDJSON
+        """
+        dumps = json.dumps
+        decode = self.codec.decode
+        with self._reader() as conn:
             if topic:
                 cursor = conn.execute("""
                     SELECT topic, event_id, timestamp, source, payload, processed_at
                     FROM processed_events
                     WHERE topic = ?
-                    ORDER BY processed_at DESC
-                    LIMIT ?
-                """, (topic, limit))
+                    ORDER BY id
+                """, (topic,))
             else:
                 cursor = conn.execute("""
                     SELECT topic, event_id, timestamp, source, payload, processed_at
                     FROM processed_events
-                    ORDER BY processed_at DESC
-                    LIMIT ?
-                """, (limit,))
+                    ORDER BY id
+                """)
             
-            events = []
-            for row in cursor.fetchall():
-                events.append({
-                    'topic': row['topic'],
-                    'event_id': row['event_id'],
-                    'timestamp': row['timestamp'],
-                    'source': row['source'],
-                    'payload': json.loads(row['payload']),
-                    'processed_at': row['processed_at']
-                })
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                chunk = "".join(
+                    '{"topic":%s,"event_id":%s,"timestamp":%s,"source":%s,'
+                    '"payload":%s,"processed_at":%s}\n' % (
+                        dumps(row[0]), dumps(row[1]), dumps(row[2]),
+                        dumps(row[3]), decode(row[4], conn), dumps(row[5])
+                    )
+                    for row in rows
+                )
+                yield chunk.encode("utf-8")
+    
+    @staticmethod
+    def _compacted_id(conn: sqlite3.Connection, topic: str) -> int:
+        """Id terakhir yang payload-nya sudah di-compact untuk topic"""
+        row = conn.execute(
+            "SELECT payload_compacted_id FROM retention_state WHERE topic = ?", (topic,)
+        ).fetchone()
+        return row[0] if row else 0
+    
+    def compact_payloads(self, topic: str, cutoff: str, limit: int = 1000,
+                         archive: Optional[Callable[[List[tuple]], None]] = None) -> int:
+        """
+        Buang payload event lama satu chunk (retention)
+        
+        Baris dipindai urut id lewat index (topic, id) mulai setelah posisi
+        compaction terakhir, sehingga setiap chunk hanya membaca baris yang
+        belum di-compact. Key (topic, event_id) tetap ada untuk dedup.
+        Baris dibaca lewat koneksi reader dan archive ditulis tanpa lock
+        writer; lock hanya dipegang untuk UPDATE payload dan posisi compaction.
+        Compaction sendiri diserialkan _compact_lock sehingga chunk yang sama
+        tidak pernah diarsipkan dua kali.
+        
+        Args:
+            topic: Topic yang di-compact
+            cutoff: processed_at (ISO8601); baris lebih lama dari ini di-compact
+            limit: Maksimal baris per chunk
+            archive: Callback opsional yang menerima baris
+                (topic, event_id, timestamp, source, payload, processed_at)
+                sebelum payload dibuang; jika punya discard(hasil), dipanggil
+                untuk membatalkan arsip chunk yang akhirnya dilewati
+        
+        Returns:
+            Jumlah baris yang di-compact (0 = tidak ada lagi yang perlu di-compact)
+        """
+        with self._compact_lock:
+            return self._compact_chunk(topic, cutoff, limit, archive)
+    
+    def _compact_chunk(self, topic: str, cutoff: str, limit: int,
+                       archive: Optional[Callable[[List[tuple]], None]]) -> int:
+        with self._reader() as conn:
+            after_id = self._compacted_id(conn, topic)
+            rows = conn.execute("""
+                SELECT id, topic, event_id, timestamp, source, payload, processed_at
+                FROM processed_events
+                WHERE topic = ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (topic, after_id, limit)).fetchall()
             
-            return events
+            # processed_at naik seiring id; berhenti di baris pertama yang masih baru
+            expired = []
+            for r in rows:
+                if r[6] >= cutoff:
+                    break
+                expired.append(r)
+            if not expired:
+                return 0
+            
+            archived = None
+            if archive is not None:
+                decode = self.codec.decode
+                archived = [
+                    r[1:5] + (decode(r[5], conn), r[6])
+                    for r in expired if r[5] != COMPACTED_PAYLOAD
+                ]
+        
+        # Baris yang di-archive tidak berubah selama archive ditulis: hanya
+        # compaction (diserialkan _compact_lock) yang menulis payload baris lama
+        archived_handle = archive(archived) if archived is not None else None
+        
+        last_id = expired[-1][0]
+        with self._writer() as conn:
+            if self._compacted_id(conn, topic) != after_id:
+                # Hanya clear() yang bisa memindahkan mark di sini; batalkan arsip
+                # chunk ini agar putaran berikutnya tidak mengarsipkannya dua kali
+                discard = getattr(archive, "discard", None)
+                if discard is not None and archived_handle is not None:
+                    discard(archived_handle)
+                logger.warning(f"Retention mark of topic {topic} moved during compaction, chunk skipped")
+                return 0
+            conn.execute(
+                "UPDATE processed_events SET payload = ? WHERE topic = ? AND id > ? AND id <= ?",
+                (COMPACTED_PAYLOAD, topic, after_id, last_id)
+            )
+            conn.execute(_SQL_UPSERT_RETENTION_MARK, (topic, last_id))
+        
+        logger.debug(f"Compacted {len(expired)} payloads of topic {topic}")
+        return len(expired)
+    
+    def expire_keys(self, topic: str, cutoff: str, limit: int = 1000) -> int:
+        """
+        Hapus baris (termasuk key dedup) yang lebih lama dari cutoff, satu chunk
+        
+        Setelah key dihapus, event dengan (topic, event_id) yang sama akan
+        diterima lagi sebagai event baru. Counter topic_stats tidak dikurangi
+        karena mencatat jumlah event yang pernah diproses.
+        
+        Args:
+            topic: Topic yang dibersihkan
+            cutoff: processed_at (ISO8601); baris lebih lama dari ini dihapus
+            limit: Maksimal baris per chunk
+        
+        Returns:
+            Jumlah baris yang dihapus
+        """
+        with self._writer() as conn:
+            rows = conn.execute("""
+                SELECT id, event_id, processed_at
+                FROM processed_events
+                WHERE topic = ?
+                ORDER BY id
+                LIMIT ?
+            """, (topic, limit)).fetchall()
+            
+            expired = []
+            for r in rows:
+                if r[2] >= cutoff:
+                    break
+                expired.append(r)
+            if not expired:
+                return 0
+            
+            conn.execute(
+                "DELETE FROM processed_events WHERE topic = ? AND id <= ?",
+                (topic, expired[-1][0])
+            )
+            conn.executemany(
+                "DELETE FROM dedup_keys WHERE key = ? AND archive_id = ?",
+                [(dedup_key(topic, r[1]), r[0]) for r in expired]
+            )
+            conn.execute(
+                "DELETE FROM dedup_collisions WHERE topic = ? AND archive_id <= ?",
+                (topic, expired[-1][0])
+            )
+        
+        if self.cache is not None:
+            for r in expired:
+                self.cache.discard(topic, r[1])
+        
+        logger.debug(f"Expired {len(expired)} keys of topic {topic}")
+        return len(expired)
+    
+    def incremental_vacuum(self, pages: int) -> int:
+        """
+        Kembalikan page kosong ke filesystem (PRAGMA incremental_vacuum)
+        
+        Hanya berpengaruh jika database dibuat dengan auto_vacuum=INCREMENTAL.
+        
+        Returns:
+            Jumlah page yang dibebaskan
+        """
+        with self._write_lock:
+            conn = self._get_connection()
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return 0
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # execute() hanya menjalankan satu step (satu page); executescript
+            # menjalankan pragma sampai selesai
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return before - after
     
     def get_topics(self) -> List[str]:
         """
@@ -177,32 +1165,61 @@ class DedupStore:
         Returns:
             List of unique topics
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT DISTINCT topic FROM processed_events")
-            return [row[0] for row in cursor.fetchall()]
+        with self._stats_lock:
+            return sorted(t for t, entry in self._topic_stats.items() if entry['total'] > 0)
+    
+    def get_topic_stats(self) -> List[Dict]:
+        """
+        Ringkasan per topic (dari counter in-memory, tanpa query)
+        
+        Returns:
+            List dict: topic, total, duplicates, first_seen, last_seen
+        """
+        with self._stats_lock:
+            return [
+                {'topic': topic, **entry}
+                for topic, entry in sorted(self._topic_stats.items())
+            ]
     
     def get_stats(self) -> Dict:
         """
-        Ambil statistik dari store
+        Ambil statistik dari store (O(jumlah topic), tanpa scan processed_events)
         
         Returns:
             Dictionary berisi statistik
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT COUNT(*) FROM processed_events")
-            total_processed = cursor.fetchone()[0]
-            
-            cursor = conn.execute("SELECT COUNT(DISTINCT topic) FROM processed_events")
-            topic_count = cursor.fetchone()[0]
-            
+        with self._stats_lock:
             return {
-                'total_processed': total_processed,
-                'topic_count': topic_count
+                'total_processed': sum(e['total'] for e in self._topic_stats.values()),
+                'topic_count': sum(1 for e in self._topic_stats.values() if e['total'] > 0)
             }
     
+    def get_db_size(self) -> int:
+        """
+        Ukuran database di disk (byte): file utama + WAL
+        
+        Hanya stat() file, tanpa query, sehingga aman dipanggil saat scrape.
+        """
+        size = 0
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+    
     def clear(self):
         """Hapus semua data (untuk testing)"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._writer() as conn:
             conn.execute("DELETE FROM processed_events")
-            conn.commit()
+            conn.execute("DELETE FROM dedup_keys")
+            conn.execute("DELETE FROM dedup_collisions")
+            conn.execute("DELETE FROM topic_stats")
+            conn.execute("DELETE FROM retention_state")
+            conn.execute("DELETE FROM payload_dicts")
+        with self._stats_lock:
+            self._topic_stats = {}
+            self._pending_duplicates = {}
+        if self.cache is not None:
+            self.cache.reset()
         logger.warning("DedupStore cleared")
@@ -0,0 +1,70 @@
+"""
+Jalur validasi cepat untuk ingest event
+Parse body dengan orjson (jika tersedia) dan cek field Event secara manual
+tanpa membuat model pydantic. Input yang tidak lolos jalur cepat selalu
+diserahkan ke validasi pydantic biasa, sehingga pesan error tetap identik.
+"""
+import logging
+from typing import Any, Optional
+
+from .codec import dumps, loads, orjson
+from .models import EventRecord, has_non_finite, is_iso8601
+
+logger = logging.getLogger(__name__)
+
+_REQUIRED_TEXT_FIELDS = ('topic', 'event_id', 'source')
+
+
+def is_json_content_type(value: Optional[str]) -> bool:
+    """True jika Content-Type membuat FastAPI mem-parse body sebagai JSON"""
+    if not value:
+        return False
+    mime = value.split(";", 1)[0].strip().lower()
+    maintype, _, subtype = mime.partition("/")
+    return maintype == "application" and (subtype == "json" or subtype.endswith("+json"))
+
+
+def validate_event(data: Any) -> Optional[EventRecord]:
+    """
+    Validasi item hasil decode JSON terhadap schema Event
+    
+    Hanya menerima input yang pasti valid menurut model Event (tipe persis
+    str/dict, string tidak kosong, timestamp ISO8601, payload tanpa
+    NaN/Infinity). Selain itu
+    mengembalikan None, dan pemanggil wajib jatuh ke validasi pydantic
+    untuk mendapatkan error yang sama persis.
+    
+    Returns:
+        EventRecord jika valid, None jika harus divalidasi jalur standar
+    """
+    if type(data) is not dict:
+        return None
+    for field in _REQUIRED_TEXT_FIELDS:
+        value = data.get(field)
+        if type(value) is not str or not value:
+            return None
+    timestamp = data.get('timestamp')
+    if type(timestamp) is not str or not is_iso8601(timestamp):
+        return None
+    payload = data.get('payload', None)
+    if payload is None:
+        if 'payload' in data:
+            return None
+        payload = {}
+    elif type(payload) is not dict or has_non_finite(payload):
+        return None
+    return EventRecord(data['topic'], data['event_id'], timestamp, data['source'], dumps(payload))
+
+
+def parse_event(body: bytes) -> Optional[EventRecord]:
+    """
+    Parse dan validasi body satu event lewat jalur cepat
+    
+    Returns:
+        EventRecord, atau None jika body harus diproses jalur standar
+    """
+    try:
+        data = loads(body)
+    except ValueError:
+        return None
+    return validate_event(data)
@@ -0,0 +1,522 @@
+"""
+Ingest Channel
+Kanal lokal (Unix domain socket) untuk mode multi-proses (INGEST_MODE=frontend)
+
+Beberapa worker uvicorn (frontend) melakukan parsing HTTP dan validasi
+event secara paralel di proses masing-masing, lalu meneruskan EventRecord
+ke satu proses writer (src.writer_service) yang memegang Runtime: dedup
+store, ingest log, dan consumer. Hanya writer yang menulis ke SQLite,
+sehingga tidak ada worker yang berebut lock database, dan /stats serta
+/metrics selalu menampilkan angka gabungan seluruh proses.
+
+Format frame: header >IIB (panjang body, request id, jenis) lalu body.
+Request dalam satu koneksi di-multiplex dengan request id; writer
+menangani setiap request dalam task terpisah sehingga group commit ingest
+log tetap mendapat banyak append paralel. Record dikirim dalam encoding
+biner (panjang field + bytes) sehingga payload_json diteruskan apa adanya
+tanpa parse ulang. Ekspor NDJSON dan subscription SSE memakai koneksi
+tersendiri agar backpressure klien yang lambat tidak menahan request lain.
+"""
+import asyncio
+import logging
+import os
+import struct
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .codec import dumps, loads
+from .consumer import QueueFullError
+from .models import EventRecord
+from .runtime import build_archive_reader
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">IIB")
+_COUNT = struct.Struct(">I")
+_FIELDS = struct.Struct(">IIIII")
+
+# Request (frontend -> writer)
+HELLO = 1
+ENQUEUE = 2
+ENQUEUE_MANY = 3
+CALL = 4
+STREAM = 5
+SUBSCRIBE = 6
+
+# Response (writer -> frontend)
+OK = 10
+ERROR = 11
+CHUNK = 12
+END = 13
+
+# Method read-only yang boleh dipanggil lewat CALL
+CALLS = ("stats", "events_page", "metrics", "aggregates")
+
+
+def encode_records(records: List[EventRecord]) -> bytes:
+    """
+    Encode list EventRecord: jumlah record, lalu per record panjang kelima
+    field (>IIIII) diikuti isi field-nya
+    """
+    parts = [_COUNT.pack(len(records))]
+    for record in records:
+        topic = record.topic.encode("utf-8")
+        event_id = record.event_id.encode("utf-8")
+        timestamp = record.timestamp.encode("utf-8")
+        source = record.source.encode("utf-8")
+        parts.append(_FIELDS.pack(
+            len(topic), len(event_id), len(timestamp), len(source), len(record.payload_json)
+        ))
+        parts.extend((topic, event_id, timestamp, source, record.payload_json))
+    return b"".join(parts)
+
+
+def decode_records(body: bytes) -> List[EventRecord]:
+    """
+    Kebalikan encode_records
+    
+    Raises:
+        ValueError: Jika body terpotong atau rusak
+    """
+    try:
+        (count,) = _COUNT.unpack_from(body, 0)
+        offset = _COUNT.size
+        records = []
+        for _ in range(count):
+            lengths = _FIELDS.unpack_from(body, offset)
+            offset += _FIELDS.size
+            fields = []
+            for length in lengths:
+                fields.append(body[offset:offset + length])
+                offset += length
+            if offset > len(body):
+                raise ValueError("Record terpotong")
+            topic, event_id, timestamp, source, payload_json = fields
+            records.append(EventRecord(
+                topic.decode("utf-8"), event_id.decode("utf-8"),
+                timestamp.decode("utf-8"), source.decode("utf-8"), payload_json
+            ))
+        return records
+    except struct.error as e:
+        raise ValueError(f"Frame record rusak: {e}") from None
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, int, bytes]:
+    """
+    Baca satu frame (request_id, kind, body)
+    
+    Raises:
+        asyncio.IncompleteReadError: Jika koneksi ditutup di tengah frame
+    """
+    length, request_id, kind = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    body = await reader.readexactly(length) if length else b""
+    return request_id, kind, body
+
+
+def write_frame(writer: asyncio.StreamWriter, request_id: int, kind: int, body: bytes = b""):
+    """Tulis satu frame; header dan body masuk buffer tanpa await di antaranya"""
+    writer.write(_HEADER.pack(len(body), request_id, kind))
+    if body:
+        writer.write(body)
+
+
+def _error_body(exc: Exception) -> bytes:
+    """Bentuk body ERROR dari exception di sisi writer"""
+    if isinstance(exc, QueueFullError):
+        return dumps({"type": "queue_full", "message": str(exc), "retry_after": exc.retry_after})
+    if isinstance(exc, ValueError):
+        return dumps({"type": "value_error", "message": str(exc)})
+    return dumps({"type": "error", "message": f"{type(exc).__name__}: {exc}"})
+
+
+def _raise_error(body: bytes):
+    """Bangun ulang exception dari body ERROR di sisi frontend"""
+    info = loads(body)
+    if info["type"] == "queue_full":
+        raise QueueFullError(info["message"], retry_after=info["retry_after"])
+    if info["type"] == "value_error":
+        raise ValueError(info["message"])
+    raise RuntimeError(info["message"])
+
+
+class IngestServer:
+    """
+    Sisi writer: menerima frame dari frontend dan meneruskannya ke Runtime
+    
+    Statistik per proses frontend (pid, koneksi aktif, request, event)
+    dicatat dari frame HELLO dan ikut dikembalikan pada CALL stats.
+    """
+    
+    def __init__(self, runtime, path: str):
+        """
+        Args:
+            runtime: Runtime yang sudah di-start (src.runtime)
+            path: Path Unix socket
+        """
+        self.runtime = runtime
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers = set()
+        self._tasks = set()
+        self._frontends: Dict[int, Dict] = {}
+    
+    async def start(self):
+        """Bind socket (file socket lama dari run sebelumnya dihapus dulu)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        logger.info(f"Ingest channel listening on {self.path}")
+    
+    async def stop(self):
+        """Tutup socket, koneksi frontend, dan request yang masih berjalan"""
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        frontend = None
+        try:
+            while True:
+                try:
+                    request_id, kind, body = await read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if kind == HELLO:
+                    pid = loads(body)["pid"]
+                    frontend = self._frontends.setdefault(
+                        pid, {"pid": pid, "role": "frontend", "connections": 0,
+                              "requests": 0, "events": 0}
+                    )
+                    frontend["connections"] += 1
+                elif kind in (STREAM, SUBSCRIBE):
+                    # Koneksi khusus ekspor / subscription; dijalankan inline sampai selesai
+                    request = loads(body)
+                    if kind == STREAM:
+                        chunks = self._export(**request)
+                    else:
+                        chunks = self.runtime.subscribe(**request)
+                    await self._pipe(reader, writer, request_id, chunks)
+                    break
+                else:
+                    if frontend is not None:
+                        frontend["requests"] += 1
+                    task = asyncio.create_task(
+                        self._dispatch(writer, request_id, kind, body, frontend)
+                    )
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+        finally:
+            if frontend is not None:
+                frontend["connections"] -= 1
+            self._writers.discard(writer)
+            writer.close()
+    
+    async def _dispatch(self, writer: asyncio.StreamWriter, request_id: int, kind: int,
+                        body: bytes, frontend: Optional[Dict]):
+        try:
+            if kind == ENQUEUE:
+                records = decode_records(body)
+                for record in records:
+                    await self.runtime.consumer.enqueue(record)
+                result = None
+            elif kind == ENQUEUE_MANY:
+                records = decode_records(body)
+                result = await self.runtime.consumer.enqueue_many(records)
+            elif kind == CALL:
+                request = loads(body)
+                result = await self._call(request["method"], request.get("kwargs", {}))
+                records = ()
+            else:
+                raise ValueError(f"Jenis frame tidak dikenal: {kind}")
+            if frontend is not None:
+                frontend["events"] += len(records)
+            response_kind, response = OK, dumps(result)
+        except Exception as e:
+            if not isinstance(e, (QueueFullError, ValueError)):
+                logger.error(f"Ingest channel request failed: {e}", exc_info=True)
+            response_kind, response = ERROR, _error_body(e)
+        if writer.is_closing():
+            return
+        write_frame(writer, request_id, response_kind, response)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+    
+    async def _call(self, method: str, kwargs: Dict):
+        if method not in CALLS:
+            raise ValueError(f"Method tidak dikenal: {method}")
+        if method == "stats":
+            return await self.collect_stats()
+        if method == "events_page":
+            return list(await self.runtime.consumer.get_events_page(**kwargs))
+        if method == "aggregates":
+            return await self.runtime.query_aggregates(**kwargs)
+        return await self.runtime.render_metrics()
+    
+    async def collect_stats(self) -> Dict:
+        """Statistik Runtime ditambah daftar proses (writer + frontend)"""
+        stats = await self.runtime.collect_stats()
+        stats["processes"] = [{"pid": os.getpid(), "role": "writer"}] + [
+            dict(entry) for entry in self._frontends.values()
+        ]
+        return stats
+    
+    async def _export(self, topic: Optional[str] = None,
+                      batch_size: int = 1000) -> AsyncIterator[bytes]:
+        iterator = iter(self.runtime.iter_events_ndjson(topic=topic, batch_size=batch_size))
+        in_flight = None
+        try:
+            while True:
+                # Generator SQLite bersifat blocking: tiap chunk diambil di thread pool
+                in_flight = asyncio.ensure_future(asyncio.to_thread(next, iterator, None))
+                chunk = await asyncio.shield(in_flight)
+                in_flight = None
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            if in_flight is not None:
+                # Dibatalkan saat next() masih berjalan di thread: close() sekarang
+                # gagal "generator already executing" dan koneksi reader tidak kembali
+                await asyncio.wait((in_flight,))
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+    
+    async def _pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                    request_id: int, chunks: AsyncIterator[bytes]):
+        """
+        Teruskan chunk sebagai frame CHUNK lalu END
+        
+        Frontend menutup koneksi saat klien HTTP-nya pergi; EOF di reader
+        menghentikan generator (penting untuk subscription yang bisa
+        menunggu lama tanpa event).
+        """
+        async def forward():
+            try:
+                async for chunk in chunks:
+                    write_frame(writer, request_id, CHUNK, chunk)
+                    await writer.drain()
+                write_frame(writer, request_id, END)
+            except ConnectionError:
+                return
+            except Exception as e:
+                logger.error(f"Ingest channel stream failed: {e}", exc_info=True)
+                write_frame(writer, request_id, ERROR, _error_body(e))
+            finally:
+                await chunks.aclose()
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        
+        forward_task = asyncio.create_task(forward())
+        eof_task = asyncio.create_task(reader.read())
+        try:
+            await asyncio.wait((forward_task, eof_task), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (forward_task, eof_task):
+                task.cancel()
+            await asyncio.gather(forward_task, eof_task, return_exceptions=True)
+
+
+class IngestClient:
+    """
+    Sisi frontend: satu koneksi multiplex ke writer per proses
+    
+    Koneksi dibuka ulang otomatis pada request berikutnya jika terputus;
+    request yang sedang menunggu saat koneksi putus mendapat ConnectionError.
+    """
+    
+    def __init__(self, path: str, connect_timeout: float = 10.0):
+        """
+        Args:
+            path: Path Unix socket writer
+            connect_timeout: Batas waktu menunggu socket writer tersedia
+        """
+        self.path = path
+        self.connect_timeout = connect_timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._connect_lock = asyncio.Lock()
+    
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Buka koneksi, menunggu writer siap sampai connect_timeout"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.connect_timeout
+        while True:
+            try:
+                return await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if loop.time() >= deadline:
+                    raise ConnectionError(f"Writer tidak tersedia di {self.path}") from None
+                await asyncio.sleep(0.1)
+    
+    async def connect(self):
+        """Buka koneksi utama dan kirim HELLO (pid frontend)"""
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await self._open()
+            # Request yang menunggu dicatat per koneksi: reader koneksi lama yang
+            # baru selesai menutup tidak boleh menggagalkan request koneksi baru
+            self._pending = {}
+            write_frame(self._writer, 0, HELLO, dumps({"pid": os.getpid()}))
+            self._read_task = asyncio.create_task(
+                self._read_loop(self._reader, self._writer, self._pending)
+            )
+            logger.info(f"Connected to ingest writer at {self.path}")
+    
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._read_task is not None:
+            await self._read_task
+    
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                         pending: Dict[int, asyncio.Future]):
+        try:
+            while True:
+                request_id, kind, body = await read_frame(reader)
+                future = pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((kind, body))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if self._writer is writer:
+                self._writer = None
+                self._pending = {}
+            futures = list(pending.values())
+            pending.clear()
+            for future in futures:
+                if not future.done():
+                    future.set_exception(ConnectionError("Koneksi ke writer terputus"))
+    
+    async def request(self, kind: int, body: bytes) -> bytes:
+        """
+        Kirim satu request dan tunggu response-nya
+        
+        Raises:
+            QueueFullError / ValueError: Diteruskan dari writer
+            ConnectionError: Jika koneksi ke writer putus
+        """
+        if self._writer is None or self._writer.is_closing():
+            await self.connect()
+        writer, pending = self._writer, self._pending
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF or 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        pending[request_id] = future
+        write_frame(writer, request_id, kind, body)
+        await writer.drain()
+        response_kind, response = await future
+        if response_kind == ERROR:
+            _raise_error(response)
+        return response
+    
+    async def call(self, method: str, **kwargs):
+        return loads(await self.request(CALL, dumps({"method": method, "kwargs": kwargs})))
+    
+    async def stream(self, kind: int, **kwargs) -> AsyncIterator[bytes]:
+        """Ekspor NDJSON / subscription lewat koneksi tersendiri; chunk diteruskan apa adanya"""
+        reader, writer = await self._open()
+        try:
+            write_frame(writer, 1, kind, dumps(kwargs))
+            await writer.drain()
+            while True:
+                _, kind, body = await read_frame(reader)
+                if kind == END:
+                    break
+                if kind == ERROR:
+                    _raise_error(body)
+                yield body
+        finally:
+            writer.close()
+
+
+class RemoteConsumer:
+    """Pengganti EventConsumer di frontend: enqueue dan query diteruskan ke writer"""
+    
+    def __init__(self, client: IngestClient):
+        self.client = client
+    
+    async def enqueue(self, event: EventRecord):
+        await self.client.request(ENQUEUE, encode_records([event]))
+    
+    async def enqueue_many(self, events: List[EventRecord]) -> Tuple[int, int]:
+        accepted, duplicate = loads(await self.client.request(ENQUEUE_MANY, encode_records(events)))
+        return accepted, duplicate
+    
+    async def get_events_page(self, topic: str = None, limit: int = 100,
+                              **filters) -> Tuple[List[Dict], Optional[str]]:
+        events, next_cursor = await self.client.call(
+            "events_page", topic=topic, limit=limit, **filters
+        )
+        return events, next_cursor
+    
+    async def collect_stats(self) -> Dict:
+        return await self.client.call("stats")
+
+
+class RemoteRuntime:
+    """
+    Pasangan Runtime untuk proses frontend
+    
+    Antarmukanya sama dengan Runtime (start/stop, consumer, collect_stats,
+    render_metrics, query_aggregates, scan_archive, iter_events_ndjson,
+    subscribe) sehingga main.py tidak perlu tahu mode mana yang aktif.
+    Segment arsip immutable dibaca langsung dari disk, tanpa lewat writer.
+    """
+    
+    def __init__(self, settings):
+        self.settings = settings
+        self.client = IngestClient(settings.resolved_ingest_socket())
+        self.consumer = RemoteConsumer(self.client)
+        self.archive_reader = build_archive_reader(settings)
+    
+    async def start(self):
+        await self.client.connect()
+    
+    async def stop(self):
+        await self.client.close()
+    
+    async def collect_stats(self) -> Dict:
+        return await self.consumer.collect_stats()
+    
+    async def render_metrics(self) -> str:
+        return await self.client.call("metrics")
+    
+    async def query_aggregates(self, **kwargs) -> Optional[Dict]:
+        return await self.client.call("aggregates", **kwargs)
+    
+    async def scan_archive(self, **kwargs) -> Optional[Dict]:
+        if self.archive_reader is None:
+            return None
+        return await asyncio.to_thread(self.archive_reader.scan_columns, **kwargs)
+    
+    def iter_events_ndjson(self, topic: Optional[str] = None,
+                           batch_size: int = 1000) -> AsyncIterator[bytes]:
+        return self.client.stream(STREAM, topic=topic, batch_size=batch_size)
+    
+    def subscribe(self, topic: Optional[str] = None, last_event_id: Optional[str] = None,
+                  policy: Optional[str] = None) -> AsyncIterator[bytes]:
+        return self.client.stream(
+            SUBSCRIBE, topic=topic, last_event_id=last_event_id, policy=policy
+        )
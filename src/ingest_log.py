@@ -0,0 +1,320 @@
+"""
+Write-Ahead Ingest Log
+Log append-only di disk agar event yang sudah di-accept tidak hilang saat crash
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .models import EventRecord
+
+logger = logging.getLogger(__name__)
+
+
+async def _run_blocking(func, *args):
+    """Jalankan I/O blocking (fsync) di default executor"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+_SEGMENT_SUFFIX = ".log"
+_CHECKPOINT_FILE = "checkpoint"
+_DEAD_LETTER_FILE = "dead_letter.ndjson"
+
+
+class IngestLog:
+    """
+    Log append-only dengan segment rotation dan group fsync
+    
+    - Setiap event yang di-accept mendapat offset monotonic dan ditulis
+      sebagai satu baris JSON ``[offset, event]`` ke segment aktif
+      (EventRecord ditulis lewat to_json tanpa parse ulang payload)
+    - Write dibuffer secara sequential; beberapa append yang berdekatan
+      berbagi satu fsync (group commit)
+    - Consumer menandai offset yang sudah tersimpan di DedupStore lewat
+      commit(); offset committed dicatat di file checkpoint dan segment
+      yang seluruhnya sudah committed dihapus
+    - Saat startup, entri setelah offset committed di-replay ke consumer.
+      Replay aman diulang karena consumer idempotent.
+    - Batch yang gagal disimpan ditulis ke dead_letter.ndjson lalu di-commit,
+      agar offset committed tidak macet dan segment tetap bisa dihapus
+    - Checkpoint juga ditulis berkala oleh run(), jadi tetap maju saat ingest idle
+    """
+    
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024,
+                 sync_interval: float = 0.002, fsync: bool = True,
+                 checkpoint_interval: float = 1.0):
+        """
+        Args:
+            directory: Direktori penyimpanan segment
+            segment_bytes: Ukuran segment sebelum rotasi
+            sync_interval: Jeda (detik) untuk mengumpulkan append sebelum fsync
+            fsync: False untuk hanya flush ke OS tanpa fsync (lebih cepat, kurang durable)
+            checkpoint_interval: Jeda (detik) checkpoint berkala di run()
+        """
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.sync_interval = sync_interval
+        self.fsync = fsync
+        self.checkpoint_interval = checkpoint_interval
+        self._stopped = asyncio.Event()
+        
+        self._file = None
+        self._segments: List[int] = []
+        self._next_offset = 0
+        self._synced_offset = -1
+        self._sync_task: Optional[asyncio.Future] = None
+        
+        # Offset yang sudah di-append tapi belum committed (urut naik)
+        self._pending: deque = deque()
+        self._done: set = set()
+        self.committed_offset = -1
+        self._checkpointed_offset = -1
+        
+        self.stats = {
+            'appended': 0,
+            'syncs': 0,
+            'replayed': 0,
+            'dead_lettered': 0,
+        }
+    
+    def _segment_path(self, first_offset: int) -> Path:
+        return self.directory / f"{first_offset:020d}{_SEGMENT_SUFFIX}"
+    
+    def open(self) -> List[Tuple[int, Dict]]:
+        """
+        Buka log dan kumpulkan entri yang belum committed
+        
+        Returns:
+            List (offset, event) yang harus di-replay, urut berdasarkan offset
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        
+        checkpoint = self.directory / _CHECKPOINT_FILE
+        if checkpoint.exists():
+            text = checkpoint.read_text().strip()
+            self.committed_offset = int(text) if text else -1
+        self._checkpointed_offset = self.committed_offset
+        
+        self._segments = sorted(
+            int(p.stem) for p in self.directory.glob(f"*{_SEGMENT_SUFFIX}") if p.stem.isdigit()
+        )
+        
+        replay = []
+        last_offset = self.committed_offset
+        for first in self._segments:
+            with open(self._segment_path(first), "rb") as f:
+                for line in f:
+                    try:
+                        offset, event = json.loads(line)
+                    except ValueError:
+                        # Baris terakhir yang terpotong saat crash
+                        logger.warning(f"Truncated ingest log entry in segment {first}")
+                        break
+                    last_offset = max(last_offset, offset)
+                    if offset > self.committed_offset:
+                        replay.append((offset, event))
+        
+        self._next_offset = last_offset + 1
+        self._synced_offset = last_offset
+        self._pending.extend(offset for offset, _ in replay)
+        self.stats['replayed'] = len(replay)
+        
+        # Selalu mulai segment baru agar sisa baris terpotong tidak tersambung
+        # (belum ada file terbuka, tidak ada fsync di sini)
+        self._open_segment()
+        self._delete_committed_segments()
+        
+        logger.info(
+            f"IngestLog opened at {self.directory}: committed offset {self.committed_offset}, "
+            f"{len(replay)} entries to replay"
+        )
+        return replay
+    
+    def _open_segment(self):
+        """
+        Buka segment baru yang dimulai dari offset berikutnya
+        
+        Returns:
+            File segment sebelumnya (belum di-close), atau None
+        """
+        previous = self._file
+        first = self._next_offset
+        self._file = open(self._segment_path(first), "ab", buffering=1024 * 1024)
+        if first not in self._segments:
+            self._segments.append(first)
+        return previous
+    
+    def _close_file(self, f):
+        """Flush, fsync, dan close satu file segment (dijalankan di executor)"""
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        f.close()
+    
+    async def append(self, events: List[dict]) -> List[int]:
+        """
+        Tulis event ke log dan tunggu sampai durable (group fsync)
+        
+        Args:
+            events: List EventRecord (atau event dictionary)
+        
+        Returns:
+            List offset sejajar dengan input
+        """
+        offsets = []
+        for event in events:
+            offset = self._next_offset
+            self._next_offset += 1
+            if type(event) is EventRecord:
+                data = event.to_json()
+            else:
+                data = json.dumps(event).encode("utf-8")
+            self._file.write(b"[%d,%s]\n" % (offset, data))
+            self._pending.append(offset)
+            offsets.append(offset)
+        self.stats['appended'] += len(offsets)
+        
+        if offsets:
+            await self._wait_durable(offsets[-1])
+        return offsets
+    
+    async def _wait_durable(self, offset: int):
+        """Tunggu sampai offset ter-fsync; append yang bersamaan berbagi satu sync"""
+        while self._synced_offset < offset:
+            if self._sync_task is None:
+                self._sync_task = asyncio.ensure_future(self._group_sync())
+            await asyncio.shield(self._sync_task)
+    
+    async def _group_sync(self):
+        """Satu putaran group commit: flush, fsync, rotasi, checkpoint"""
+        try:
+            if self.sync_interval > 0:
+                await asyncio.sleep(self.sync_interval)
+            upto = self._next_offset - 1
+            self._file.flush()
+            if self.fsync:
+                await _run_blocking(os.fsync, self._file.fileno())
+            self._synced_offset = upto
+            self.stats['syncs'] += 1
+            
+            if self._file.tell() >= self.segment_bytes:
+                # Append yang masuk selama fsync terakhir masih ada di segment lama;
+                # sync-nya tetap di putaran ini sebelum _synced_offset berikutnya maju
+                previous = self._open_segment()
+                await _run_blocking(self._close_file, previous)
+            self.checkpoint()
+        finally:
+            self._sync_task = None
+    
+    def commit(self, offset: Optional[int]):
+        """
+        Tandai offset sudah diproses (tersimpan di DedupStore)
+        
+        Commit boleh datang tidak berurutan (beberapa worker); offset
+        committed hanya maju sampai offset pending terkecil.
+        """
+        if offset is None or offset <= self.committed_offset:
+            return
+        self._done.add(offset)
+        while self._pending and self._pending[0] in self._done:
+            self._done.discard(self._pending.popleft())
+        if self._pending:
+            self.committed_offset = self._pending[0] - 1
+        else:
+            self.committed_offset = self._next_offset - 1
+    
+    async def dead_letter(self, offsets: List[Optional[int]], events: List, error: Exception):
+        """
+        Simpan event yang gagal diproses ke dead_letter.ndjson lalu commit offset-nya
+        
+        Tanpa ini offset batch yang gagal tidak pernah committed: offset
+        committed berhenti maju dan segment tidak pernah dihapus.
+        """
+        lines = []
+        for offset, event in zip(offsets, events):
+            # Event yang sudah tersimpan (gagal setelah commit) tidak perlu di-dead-letter
+            if offset is None or offset <= self.committed_offset or offset in self._done:
+                continue
+            data = event.to_json() if type(event) is EventRecord else json.dumps(event).encode("utf-8")
+            lines.append(b'{"offset":%d,"error":%s,"event":%s}\n' % (
+                offset, json.dumps(str(error)).encode("utf-8"), data
+            ))
+        if not lines:
+            return
+        await _run_blocking(self._append_dead_letter, b"".join(lines))
+        for offset in offsets:
+            self.commit(offset)
+        self.stats['dead_lettered'] += len(lines)
+        logger.error(f"{len(lines)} ingest log entries dead-lettered: {error}")
+    
+    def _append_dead_letter(self, data: bytes):
+        with open(self.directory / _DEAD_LETTER_FILE, "ab") as f:
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+    
+    async def run(self):
+        """Checkpoint berkala sampai stop(), agar offset committed tersimpan saat ingest idle"""
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.checkpoint_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self.checkpoint()
+            except OSError as e:
+                logger.error(f"Ingest log checkpoint failed: {e}", exc_info=True)
+    
+    def stop(self):
+        self._stopped.set()
+    
+    def checkpoint(self):
+        """Persist offset committed dan hapus segment yang sudah tidak diperlukan"""
+        if self.committed_offset == self._checkpointed_offset:
+            return
+        path = self.directory / _CHECKPOINT_FILE
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(str(self.committed_offset))
+        os.replace(tmp, path)
+        self._checkpointed_offset = self.committed_offset
+        self._delete_committed_segments()
+    
+    def _delete_committed_segments(self):
+        """Hapus segment lama yang seluruh entrinya sudah committed"""
+        while len(self._segments) > 1 and self._segments[1] - 1 <= self.committed_offset:
+            first = self._segments.pop(0)
+            try:
+                self._segment_path(first).unlink()
+            except FileNotFoundError:
+                pass
+            logger.debug(f"Ingest log segment {first} deleted")
+    
+    def pending_count(self) -> int:
+        """Jumlah entri yang sudah di-append tapi belum committed"""
+        return len(self._pending)
+    
+    def get_stats(self) -> Dict:
+        """Statistik ingest log"""
+        return {
+            **self.stats,
+            'committed_offset': self.committed_offset,
+            'next_offset': self._next_offset,
+            'pending': self.pending_count(),
+            'segments': len(self._segments),
+        }
+    
+    def close(self):
+        """Flush, fsync, dan tulis checkpoint terakhir (blocking; lihat aclose)"""
+        if self._file is not None:
+            self._close_file(self._file)
+            self._file = None
+        self.checkpoint()
+        logger.info("IngestLog closed")
+    
+    async def aclose(self):
+        """Versi close untuk event loop: fsync terakhir berjalan di executor"""
+        await _run_blocking(self.close)
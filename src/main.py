@@ -2,17 +2,28 @@
 Main Application - Pub-Sub Log Aggregator
 FastAPI application dengan endpoint publish dan stats
 """
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, FastAPI, HTTPException, BackgroundTasks, Query, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import ValidationError
 from contextlib import asynccontextmanager
 import asyncio
+import json
 import logging
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Union
 
-from .models import Event, PublishResponse, StatsResponse, EventListResponse
-from .dedup_store import DedupStore
-from .consumer import EventConsumer
+from .models import (
+    Event, EventRecord, has_non_finite, PublishResponse, BatchPublishResponse, StatsResponse, EventListResponse
+)
+from .config import Settings
+from .consumer import EventConsumer, QueueFullError
+from .fast_ingest import is_json_content_type, loads, parse_event, validate_event
+from .ingest_channel import RemoteConsumer, RemoteRuntime
+from .runtime import Runtime
+from .subscriptions import SLOW_POLICIES
 
 # Setup logging
 logging.basicConfig(
@@ -22,46 +33,54 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Global instances
-dedup_store: Optional[DedupStore] = None
-consumer: Optional[EventConsumer] = None
-consumer_task: Optional[asyncio.Task] = None
+runtime: Optional[Union[Runtime, RemoteRuntime]] = None
+consumer: Optional[Union[EventConsumer, RemoteConsumer]] = None
+
+# Jalur validasi cepat untuk /publish dan /publish/batch (FAST_INGEST)
+fast_ingest: bool = True
+
+# Batas jumlah event dan ukuran body satu request POST /publish/batch
+MAX_BATCH_SIZE = 10000
+MAX_BATCH_BYTES = 32 * 1024 * 1024
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+INGEST_MODES = ("standalone", "frontend")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Lifespan context manager untuk startup dan shutdown
+    
+    Mode standalone menjalankan Runtime (store, consumer, compactor) di
+    proses ini. Mode frontend (worker uvicorn dari src.multiproc) hanya
+    terhubung ke proses writer lewat ingest channel.
     """
-    global dedup_store, consumer, consumer_task
+    global runtime, consumer, fast_ingest
     
     # Startup
     logger.info("Starting Pub-Sub Log Aggregator...")
     
-    # Inisialisasi dedup store
-    dedup_store = DedupStore("data/dedup_store.db")
-    
-    # Inisialisasi consumer
-    consumer = EventConsumer(dedup_store)
+    settings = Settings.from_env()
+    fast_ingest = settings.fast_ingest
     
-    # Start consumer dalam background task
-    consumer_task = asyncio.create_task(consumer.start())
-    logger.info("Consumer started in background")
+    if settings.ingest_mode not in INGEST_MODES:
+        raise ValueError(
+            f"INGEST_MODE tidak dikenal: {settings.ingest_mode} (pilihan: {INGEST_MODES})"
+        )
+    if settings.ingest_mode == "frontend":
+        runtime = RemoteRuntime(settings)
+    else:
+        runtime = Runtime(settings)
+    await runtime.start()
+    consumer = runtime.consumer
     
-    logger.info("Application started successfully")
+    logger.info(f"Application started successfully ({settings.ingest_mode})")
     
     yield
     
     # Shutdown
     logger.info("Shutting down...")
-    consumer.stop()
-    
-    # Tunggu consumer task selesai
-    if consumer_task:
-        try:
-            await asyncio.wait_for(consumer_task, timeout=5.0)
-        except asyncio.TimeoutError:
-            logger.warning("Consumer task did not finish in time")
-    
+    await runtime.stop()
     logger.info("Application shut down")
 
 
@@ -74,6 +93,31 @@ app = FastAPI(
 )
 
 
+@app.exception_handler(RequestValidationError)
+async def validation_error_handler(request: Request, exc: RequestValidationError):
+    """
+    422 standar FastAPI, tanpa meng-echo input berisi NaN/Infinity
+    
+    Input seperti itu tidak bisa di-serialize ke JSON response (error 500),
+    sehingga field "input" dibuang hanya untuk error tersebut.
+    """
+    errors = [
+        {k: v for k, v in err.items() if k != "input"} if has_non_finite(err.get("input")) else err
+        for err in exc.errors()
+    ]
+    return await request_validation_exception_handler(request, RequestValidationError(errors))
+
+
+def _queue_full_response(exc: QueueFullError) -> HTTPException:
+    """Ubah QueueFullError menjadi 429 Too Many Requests dengan Retry-After"""
+    logger.warning(f"Publish rejected (backpressure): {exc}")
+    return HTTPException(
+        status_code=429,
+        detail=str(exc),
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -83,75 +127,407 @@ async def root():
         "status": "running",
         "endpoints": {
             "publish": "POST /publish",
+            "publish_batch": "POST /publish/batch",
             "events": "GET /events?topic={topic}",
-            "stats": "GET /stats"
+            "events_stream": "GET /events/stream?topic={topic}",
+            "subscribe": "GET /subscribe?topic={topic} (SSE)",
+            "aggregates": "GET /aggregates?window={detik}&slide={detik}",
+            "archive_scan": "GET /archive/scan?topic={topic}&columns={kolom,...}",
+            "stats": "GET /stats",
+            "metrics": "GET /metrics"
         }
     }
 
 
-@app.post("/publish", response_model=PublishResponse)
+async def _accept_event(record: EventRecord) -> PublishResponse:
+    """Enqueue satu event yang sudah tervalidasi dan bangun response-nya"""
+    try:
+        # Enqueue event untuk diproses oleh consumer
+        await consumer.enqueue(record)
+        
+        logger.info(f"Event published: {record.topic}:{record.event_id}")
+        
+        return PublishResponse(
+            status="accepted",
+            message="Event diterima dan akan diproses",
+            event_id=record.event_id,
+            received_at=datetime.utcnow().isoformat()
+        )
+    
+    except QueueFullError as e:
+        raise _queue_full_response(e)
+    except Exception as e:
+        logger.error(f"Error publishing event: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class FastIngestRoute(APIRoute):
+    """
+    Route dengan jalur validasi cepat di depan handler FastAPI
+    
+    Body JSON yang lolos fast_ingest.parse_event langsung dienqueue tanpa
+    membuat model pydantic. Request lain diteruskan ke handler FastAPI biasa
+    (body sudah di-cache di Request), sehingga status dan detail error 422
+    persis sama dengan jalur standar.
+    """
+    
+    def get_route_handler(self):
+        standard_handler = super().get_route_handler()
+        
+        async def handler(request: Request) -> Response:
+            if fast_ingest and is_json_content_type(request.headers.get("content-type")):
+                record = parse_event(await request.body())
+                if record is not None:
+                    response = await _accept_event(record)
+                    return JSONResponse(response.model_dump())
+            return await standard_handler(request)
+        
+        return handler
+
+
+ingest_router = APIRouter(route_class=FastIngestRoute)
+
+
+@ingest_router.post("/publish", response_model=PublishResponse)
 async def publish_event(event: Event):
     """
     Endpoint untuk menerima event dari publisher
     
-    Event akan divalidasi, kemudian dikirim ke consumer untuk diproses
+    Event akan divalidasi, kemudian dikirim ke consumer untuk diproses.
+    Body JSON yang valid biasanya sudah ditangani FastIngestRoute sebelum
+    handler ini dipanggil.
     
     Args:
         event: Event object dengan schema yang telah ditentukan
-        
+    
     Returns:
         PublishResponse dengan status dan informasi event
     """
+    return await _accept_event(EventRecord.from_dict(event.model_dump()))
+
+
+app.include_router(ingest_router)
+
+
+def _batch_too_large(detail: str) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Batch terlalu besar: {detail}")
+
+
+async def _read_batch_body(request: Request) -> bytes:
+    """
+    Baca body batch dengan batas MAX_BATCH_BYTES
+    
+    Content-Length yang melewati batas langsung ditolak tanpa membaca body;
+    body tanpa Content-Length (chunked) dihentikan begitu melewati batas.
+    
+    Raises:
+        HTTPException: 413 jika body terlalu besar
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_BATCH_BYTES:
+        raise _batch_too_large(f"{length} byte (maksimal {MAX_BATCH_BYTES})")
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_BATCH_BYTES:
+            raise _batch_too_large(f"lebih dari {MAX_BATCH_BYTES} byte")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _parse_batch_body(body: bytes, content_type: str) -> list:
+    """
+    Parse body batch menjadi list item mentah
+    
+    Mendukung JSON array, object {"events": [...]}, atau NDJSON
+    (satu event per baris). Jumlah baris NDJSON dicek sebelum di-decode.
+    
+    Raises:
+        ValueError: Jika body tidak bisa di-parse
+        HTTPException: 413 jika jumlah baris NDJSON melewati MAX_BATCH_SIZE
+    """
+    decode = loads if fast_ingest else json.loads
+    if content_type.split(";")[0].strip().lower() in NDJSON_CONTENT_TYPES:
+        lines = [line for line in (raw.strip() for raw in body.splitlines()) if line]
+        if len(lines) > MAX_BATCH_SIZE:
+            raise _batch_too_large(f"{len(lines)} item (maksimal {MAX_BATCH_SIZE})")
+        items = []
+        for line in lines:
+            try:
+                items.append(decode(line))
+            except ValueError:
+                # Baris rusak tetap dihitung sebagai item invalid
+                items.append(None)
+        return items
+    
+    data = decode(body)
+    if isinstance(data, dict) and isinstance(data.get("events"), list):
+        return data["events"]
+    if isinstance(data, list):
+        return data
+    raise ValueError("Body harus berupa JSON array, {\"events\": [...]} atau NDJSON")
+
+
+def _format_errors(exc: ValidationError) -> list:
+    """Ringkas error pydantic menjadi bentuk yang aman di-serialize"""
+    return [
+        {"loc": list(err["loc"]), "msg": err["msg"], "type": err["type"]}
+        for err in exc.errors()
+    ]
+
+
+@app.post("/publish/batch", response_model=BatchPublishResponse)
+async def publish_batch(request: Request):
+    """
+    Endpoint untuk menerima banyak event dalam satu request
+    
+    Body berupa JSON array event, object {"events": [...]}, atau NDJSON
+    (Content-Type: application/x-ndjson). Setiap item divalidasi dengan
+    schema Event; item yang valid dienqueue sekaligus, item yang invalid
+    dilaporkan per index tanpa menggagalkan seluruh batch.
+    
+    Returns:
+        BatchPublishResponse dengan jumlah accepted/duplicate/invalid
+    """
+    body = await _read_batch_body(request)
     try:
-        # Convert event ke dictionary
-        event_dict = event.dict()
-        
-        # Enqueue event untuk diproses oleh consumer
-        await consumer.enqueue(event_dict)
-        
-        logger.info(f"Event published: {event.topic}:{event.event_id}")
-        
-        return PublishResponse(
-            status="accepted",
-            message="Event diterima dan akan diproses",
-            event_id=event.event_id,
-            received_at=datetime.utcnow().isoformat()
-        )
+        items = _parse_batch_body(body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Body batch tidak valid: {e}")
+    
+    if len(items) > MAX_BATCH_SIZE:
+        raise _batch_too_large(f"{len(items)} item (maksimal {MAX_BATCH_SIZE})")
+    
+    valid_events = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({
+                "index": index,
+                "errors": [{"loc": [], "msg": "Item harus berupa JSON object", "type": "type_error"}]
+            })
+            continue
+        if fast_ingest:
+            record = validate_event(item)
+            if record is not None:
+                valid_events.append(record)
+                continue
+        try:
+            valid_events.append(EventRecord.from_dict(Event(**item).model_dump()))
+        except ValidationError as e:
+            errors.append({"index": index, "errors": _format_errors(e)})
     
+    try:
+        accepted, duplicate = await consumer.enqueue_many(valid_events)
+    except QueueFullError as e:
+        raise _queue_full_response(e)
     except Exception as e:
-        logger.error(f"Error publishing event: {e}", exc_info=True)
+        logger.error(f"Error publishing batch: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+    
+    logger.info(
+        f"Batch published: {accepted} accepted, {duplicate} duplicate, {len(errors)} invalid"
+    )
+    
+    return BatchPublishResponse(
+        status="accepted" if accepted else "rejected",
+        accepted=accepted,
+        duplicate=duplicate,
+        invalid=len(errors),
+        errors=errors,
+        received_at=datetime.utcnow().isoformat()
+    )
 
 
 @app.get("/events", response_model=EventListResponse)
 async def get_events(
     topic: Optional[str] = Query(None, description="Filter berdasarkan topic"),
-    limit: int = Query(100, ge=1, le=1000, description="Maksimal jumlah event")
+    limit: int = Query(100, ge=1, le=1000, description="Maksimal jumlah event"),
+    cursor: Optional[str] = Query(None, description="next_cursor dari halaman sebelumnya"),
+    since: Optional[str] = Query(None, description="timestamp >= since (ISO8601)"),
+    until: Optional[str] = Query(None, description="timestamp < until (ISO8601)"),
+    processed_since: Optional[str] = Query(None, description="processed_at >= (ISO8601)"),
+    processed_until: Optional[str] = Query(None, description="processed_at < (ISO8601)")
 ):
     """
     Endpoint untuk mengambil daftar event yang telah diproses
     
+    Menggunakan keyset pagination: kirim kembali next_cursor untuk
+    mengambil halaman berikutnya.
+    
     Args:
         topic: Filter berdasarkan topic (optional)
         limit: Maksimal jumlah event yang dikembalikan (default: 100)
-        
+        cursor: Cursor halaman berikutnya (optional)
+        since/until: Filter rentang timestamp event (optional)
+        processed_since/processed_until: Filter rentang processed_at (optional)
+    
     Returns:
-        EventListResponse dengan daftar event
+        EventListResponse dengan daftar event dan next_cursor
     """
     try:
-        events = consumer.get_events(topic=topic, limit=limit)
+        events, next_cursor = await consumer.get_events_page(
+            topic=topic,
+            limit=limit,
+            cursor=cursor,
+            since=since,
+            until=until,
+            processed_since=processed_since,
+            processed_until=processed_until
+        )
         
         return EventListResponse(
             topic=topic,
             count=len(events),
-            events=events
+            events=events,
+            next_cursor=next_cursor
         )
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting events: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/events/stream")
+async def stream_events(
+    topic: Optional[str] = Query(None, description="Filter berdasarkan topic"),
+    batch_size: int = Query(1000, ge=1, le=10000, description="Baris per chunk")
+):
+    """
+    Endpoint ekspor seluruh event sebagai NDJSON (satu event per baris)
+    
+    Data di-stream langsung dari cursor SQLite; payload dikirim sebagai JSON
+    mentah yang tersimpan tanpa parse ulang, dan tidak ada batas jumlah baris.
+    Generator synchronous dijalankan Starlette di threadpool sehingga tidak
+    memblokir event loop; pada mode frontend chunk diteruskan dari writer.
+    
+    Args:
+        topic: Filter berdasarkan topic (optional)
+        batch_size: Jumlah baris per fetchmany
+    
+    Returns:
+        StreamingResponse dengan media type application/x-ndjson
+    """
+    return StreamingResponse(
+        runtime.iter_events_ndjson(topic=topic, batch_size=batch_size),
+        media_type="application/x-ndjson"
+    )
+
+
+@app.get("/subscribe")
+async def subscribe(
+    request: Request,
+    topic: Optional[str] = Query(None, description="Topic yang di-subscribe (kosong = semua)"),
+    last_event_id: Optional[str] = Query(
+        None, description="Resume setelah id SSE ini (alternatif header Last-Event-ID)"
+    ),
+    policy: Optional[str] = Query(
+        None, description="Subscriber lambat: drop atau disconnect (default SUBSCRIBE_SLOW_POLICY)"
+    )
+):
+    """
+    Endpoint subscription Server-Sent Events
+    
+    Setiap event unik yang baru tersimpan di topic tersebut dikirim sebagai
+    satu pesan SSE (id: <epoch>-<seq>, data: JSON event), menggantikan
+    polling GET /events. Klien yang reconnect dengan header Last-Event-ID
+    menerima event yang terlewat dari ring buffer; jika sudah tidak tersedia
+    dikirim event "reset" dan klien bisa backfill lewat /events.
+    
+    Args:
+        topic: Filter topic (optional)
+        last_event_id: Id SSE terakhir yang diterima (optional)
+        policy: Perlakuan saat buffer subscriber penuh (optional)
+    
+    Returns:
+        StreamingResponse dengan media type text/event-stream
+    """
+    if policy is not None and policy not in SLOW_POLICIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Policy tidak dikenal: {policy} (pilihan: {', '.join(SLOW_POLICIES)})"
+        )
+    return StreamingResponse(
+        runtime.subscribe(
+            topic=topic,
+            last_event_id=last_event_id or request.headers.get("last-event-id"),
+            policy=policy
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/aggregates")
+async def get_aggregates(
+    window: int = Query(60, ge=1, description="Ukuran window (detik, kelipatan AGGREGATE_PANE_S)"),
+    slide: Optional[int] = Query(None, ge=1, description="Slide window sliding (default = window)"),
+    topic: Optional[str] = Query(None, description="Filter berdasarkan topic"),
+    source: Optional[str] = Query(None, description="Filter berdasarkan source"),
+    since: Optional[str] = Query(None, description="Akhir window >= since (ISO8601)"),
+    until: Optional[str] = Query(None, description="Akhir window <= until (ISO8601)"),
+    limit: int = Query(60, ge=1, le=1000, description="Maksimal window per series")
+):
+    """
+    Endpoint agregat window waktu per (topic, source)
+    
+    Window tumbling (slide = window) atau sliding (slide < window) dibentuk
+    dari pane ringkasan in-memory, sehingga biaya query sebanding jumlah
+    window, bukan jumlah event. Setiap window berisi count event unik dan
+    count/sum/avg untuk field payload numerik level atas.
+    
+    Returns:
+        Dictionary window dan series [{topic, source, windows}]
+    """
+    try:
+        result = await runtime.query_aggregates(
+            size=window, slide=slide, topic=topic, source=source,
+            since=since, until=until, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Agregasi nonaktif (set AGGREGATES_ENABLED=true)")
+    return result
+
+
+@app.get("/archive/scan")
+async def scan_archive(
+    topic: Optional[str] = Query(None, description="Filter berdasarkan topic"),
+    since: Optional[str] = Query(None, description="Timestamp event >= since (ISO8601)"),
+    until: Optional[str] = Query(None, description="Timestamp event < until (ISO8601)"),
+    columns: Optional[str] = Query(
+        None, description="Kolom dipisah koma, mis. event_id,timestamp,payload.latency_ms"
+    ),
+    limit: int = Query(1000, ge=1, le=100000, description="Maksimal baris")
+):
+    """
+    Endpoint scan arsip kolumnar (RETENTION_ARCHIVE_FORMAT=columnar)
+    
+    Segment yang di luar topic / rentang timestamp dibuang hanya dari index
+    footer-nya; dari segment sisanya hanya kolom yang diminta yang dibaca.
+    
+    Returns:
+        Dictionary segments (total/scanned/pruned), rows, truncated, dan
+        columns {nama: list nilai}
+    """
+    names = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+    try:
+        result = await runtime.scan_archive(
+            columns=names, topic=topic, since=since, until=until, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(
+            status_code=404, detail="Arsip kolumnar nonaktif (RETENTION_ARCHIVE_FORMAT=columnar)"
+        )
+    return result
+
+
 @app.get("/stats", response_model=StatsResponse)
 async def get_stats():
     """
@@ -166,15 +542,27 @@ async def get_stats():
         - uptime: waktu sistem berjalan (detik)
     """
     try:
-        stats = consumer.get_stats()
-        
-        return StatsResponse(**stats)
+        return StatsResponse(**await runtime.collect_stats())
     
     except Exception as e:
         logger.error(f"Error getting stats: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Endpoint metrics dalam Prometheus text format
+    
+    Histogram latency (queue wait, dedup lookup, store, processing,
+    end-to-end) plus counter dan gauge (queue depth, ukuran database).
+    Pada mode frontend metric diambil dari proses writer.
+    """
+    return PlainTextResponse(
+        await runtime.render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/health")
 async def health_check():
     """
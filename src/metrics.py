@@ -0,0 +1,162 @@
+"""
+Metrics
+Instrumentasi ringan untuk endpoint /metrics (Prometheus text format 0.0.4)
+
+Histogram memakai bucket tetap yang dialokasikan sekali di awal; observe()
+hanya bisect + increment list, tanpa label, dict, atau objek baru per event.
+Gauge dan counter dibaca lewat callback saat scrape sehingga tidak ada
+biaya sama sekali di hot path.
+"""
+from bisect import bisect_left
+from typing import Callable, List, Sequence, Tuple
+
+# Bucket default latency (detik): 0.5 ms sampai 10 s
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_value(value: float) -> str:
+    """Format angka sesuai Prometheus (integer tanpa desimal, inf sebagai +Inf)"""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """
+    Histogram kumulatif dengan bucket tetap
+    
+    Counter disimpan per bucket (non-kumulatif) dan baru dijumlahkan saat
+    render, sehingga observe() cukup satu increment.
+    """
+    
+    __slots__ = ("name", "help", "_bounds", "_counts", "_sum")
+    
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Args:
+            name: Nama metric (snake_case, diakhiri satuan, mis. _seconds)
+            help: Deskripsi untuk baris # HELP
+            buckets: Batas atas bucket (urut naik, tanpa +Inf)
+        """
+        self.name = name
+        self.help = help
+        self._bounds = tuple(sorted(buckets))
+        # Slot terakhir untuk observasi di atas bucket terbesar (+Inf)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._sum = 0.0
+    
+    def observe(self, value: float):
+        """Catat satu observasi"""
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self._sum += value
+    
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+    
+    @property
+    def sum(self) -> float:
+        return self._sum
+    
+    def snapshot(self) -> List[Tuple[float, int]]:
+        """Pasangan (batas atas, jumlah kumulatif) termasuk +Inf"""
+        cumulative = 0
+        result = []
+        for bound, count in zip(self._bounds + (float("inf"),), self._counts):
+            cumulative += count
+            result.append((bound, cumulative))
+        return result
+    
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        buckets = self.snapshot()
+        for bound, cumulative in buckets:
+            lines.append(f'{self.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_format_value(self._sum)}")
+        lines.append(f"{self.name}_count {buckets[-1][1]}")
+        return "\n".join(lines)
+
+
+class CallbackMetric:
+    """Gauge atau counter yang nilainya diambil dari callback saat scrape"""
+    
+    __slots__ = ("name", "help", "type", "callback")
+    
+    def __init__(self, name: str, help: str, type: str, callback: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.callback = callback
+    
+    def render(self) -> str:
+        return (
+            f"# HELP {self.name} {self.help}\n"
+            f"# TYPE {self.name} {self.type}\n"
+            f"{self.name} {_format_value(self.callback())}"
+        )
+
+
+class MetricsRegistry:
+    """Kumpulan metric yang dirender bersama untuk /metrics"""
+    
+    def __init__(self):
+        self._metrics = []
+    
+    def register(self, metric):
+        """Daftarkan Histogram / CallbackMetric yang sudah ada"""
+        self._metrics.append(metric)
+        return metric
+    
+    def histogram(self, name: str, help: str,
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, buckets))
+    
+    def gauge(self, name: str, help: str, callback: Callable[[], float]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, "gauge", callback))
+    
+    def counter(self, name: str, help: str, callback: Callable[[], float]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, "counter", callback))
+    
+    def render(self) -> str:
+        """Seluruh metric dalam Prometheus text format"""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+class ConsumerMetrics:
+    """
+    Histogram hot path EventConsumer
+    
+    - queue_wait: enqueue sampai diambil worker
+    - dedup_lookup: query precheck (hanya jika precheck aktif; selain itu
+      lookup terjadi di dalam check_and_mark dan masuk ke store)
+    - store: check-and-insert + commit (check_and_mark / _many per panggilan)
+    - processing: _simulate_processing
+    - end_to_end: enqueue sampai event selesai diproses
+    """
+    
+    def __init__(self, prefix: str = "aggregator"):
+        self.queue_wait = Histogram(
+            f"{prefix}_queue_wait_seconds", "Waktu event menunggu di queue"
+        )
+        self.dedup_lookup = Histogram(
+            f"{prefix}_dedup_lookup_seconds", "Latency precheck duplikat (query)"
+        )
+        self.store = Histogram(
+            f"{prefix}_store_seconds", "Latency check-and-insert + commit ke dedup store per panggilan"
+        )
+        self.processing = Histogram(
+            f"{prefix}_processing_seconds", "Latency pemrosesan event unik"
+        )
+        self.end_to_end = Histogram(
+            f"{prefix}_end_to_end_seconds", "Waktu dari enqueue sampai event selesai diproses"
+        )
+    
+    def histograms(self) -> List[Histogram]:
+        return [self.queue_wait, self.dedup_lookup, self.store, self.processing, self.end_to_end]
@@ -1,9 +1,68 @@
 """
 Data models untuk event dan response
 """
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
+import math
+
+from .codec import dumps, loads
+
+
+def is_iso8601(value: str) -> bool:
+    """Cek format timestamp ISO8601 (akhiran Z diterima)"""
+    try:
+        datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return False
+    return True
+
+
+def has_non_finite(value: Any) -> bool:
+    """
+    Cek apakah payload (dict/list bersarang) berisi float NaN/Infinity
+    
+    json.loads menerima NaN/Infinity, tapi tidak ada representasi JSON
+    standarnya: orjson menuliskannya sebagai null dan json.dumps sebagai
+    token NaN yang tidak valid, sehingga nilai seperti itu ditolak saat ingest.
+    """
+    if type(value) is float:
+        return not math.isfinite(value)
+    if type(value) is dict:
+        return any(has_non_finite(v) for v in value.values())
+    if type(value) is list:
+        return any(has_non_finite(v) for v in value)
+    return False
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Timestamp ISO8601 ke datetime UTC (tanpa zona waktu dianggap UTC)
+    
+    Raises:
+        ValueError: Jika format tidak valid
+    """
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def parse_epoch(value: str) -> float:
+    """Timestamp ISO8601 ke detik epoch (lihat parse_timestamp)"""
+    return parse_timestamp(value).timestamp()
+
+
+def utc_iso(value: str) -> str:
+    """
+    Timestamp ISO8601 ke bentuk kanonik UTC dengan mikrodetik (akhiran Z)
+    
+    Bentuk ini yang dipakai sebagai batas filter rentang: offset campuran
+    (Z vs +07:00) dan pecahan detik tidak bisa dibandingkan sebagai string.
+    """
+    return parse_timestamp(value).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
 
 class Event(BaseModel):
@@ -17,25 +76,94 @@ class Event(BaseModel):
     source: str = Field(..., min_length=1, description="Sumber event")
     payload: dict = Field(default_factory=dict, description="Data payload event")
     
-    @validator('timestamp')
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "topic": "user.login",
+            "event_id": "evt-12345",
+            "timestamp": "2025-10-22T10:30:00Z",
+            "source": "auth-service",
+            "payload": {"user_id": 123, "ip": "192.168.1.1"}
+        }
+    })
+    
+    @field_validator('timestamp')
+    @classmethod
     def validate_timestamp(cls, v):
         """Validasi format timestamp ISO8601"""
-        try:
-            datetime.fromisoformat(v.replace('Z', '+00:00'))
-        except ValueError:
+        if not is_iso8601(v):
             raise ValueError("Timestamp harus dalam format ISO8601")
         return v
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "topic": "user.login",
-                "event_id": "evt-12345",
-                "timestamp": "2025-10-22T10:30:00Z",
-                "source": "auth-service",
-                "payload": {"user_id": 123, "ip": "192.168.1.1"}
-            }
+    @field_validator('payload')
+    @classmethod
+    def validate_payload(cls, v):
+        """Tolak NaN/Infinity di payload (lihat has_non_finite)"""
+        if has_non_finite(v):
+            raise ValueError("Payload tidak boleh berisi NaN atau Infinity")
+        return v
+
+
+class EventRecord:
+    """
+    Event yang sudah tervalidasi dalam bentuk ringan (__slots__)
+    
+    Dipakai dari enqueue sampai insert di DedupStore. Payload disimpan
+    sebagai JSON bytes (payload_json) sehingga event yang antre di queue
+    tidak membawa dict bersarang; payload hanya di-parse ulang jika
+    benar-benar dibutuhkan (atribut payload). Field juga bisa diakses
+    sebagai record['topic'] agar kompatibel dengan kode berbasis dict.
+    """
+    __slots__ = ('topic', 'event_id', 'timestamp', 'source', 'payload_json')
+    
+    def __init__(self, topic: str, event_id: str, timestamp: str, source: str,
+                 payload_json: bytes = b"{}"):
+        self.topic = topic
+        self.event_id = event_id
+        self.timestamp = timestamp
+        self.source = source
+        self.payload_json = payload_json
+    
+    @classmethod
+    def from_dict(cls, event: dict) -> "EventRecord":
+        """Buat record dari event dictionary (mis. hasil Event.model_dump() atau replay log)"""
+        return cls(
+            event['topic'],
+            event['event_id'],
+            event['timestamp'],
+            event['source'],
+            dumps(event.get('payload', {}))
+        )
+    
+    @property
+    def payload(self) -> dict:
+        """Payload hasil parse (dibuat setiap kali diakses)"""
+        return loads(self.payload_json)
+    
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+    
+    def to_dict(self) -> dict:
+        """Bentuk dictionary, sama dengan Event.model_dump()"""
+        return {
+            'topic': self.topic,
+            'event_id': self.event_id,
+            'timestamp': self.timestamp,
+            'source': self.source,
+            'payload': self.payload,
         }
+    
+    def to_json(self) -> bytes:
+        """Serialisasi JSON event; payload_json disisipkan apa adanya"""
+        return b'{"topic":%s,"event_id":%s,"timestamp":%s,"source":%s,"payload":%s}' % (
+            dumps(self.topic), dumps(self.event_id), dumps(self.timestamp),
+            dumps(self.source), self.payload_json
+        )
+    
+    def __repr__(self) -> str:
+        return f"EventRecord(topic={self.topic!r}, event_id={self.event_id!r})"
 
 
 class PublishResponse(BaseModel):
@@ -46,6 +174,16 @@ class PublishResponse(BaseModel):
     received_at: str
 
 
+class BatchPublishResponse(BaseModel):
+    """Response dari endpoint publish batch"""
+    status: str
+    accepted: int = Field(..., description="Event valid yang masuk ke queue")
+    duplicate: int = Field(..., description="Event duplikat di dalam batch yang sama")
+    invalid: int = Field(..., description="Event yang gagal validasi")
+    errors: list[dict] = Field(default_factory=list, description="Detail error per item (index)")
+    received_at: str
+
+
 class StatsResponse(BaseModel):
     """Response dari endpoint stats"""
     received: int = Field(..., description="Total event yang diterima")
@@ -53,17 +191,37 @@ class StatsResponse(BaseModel):
     duplicate_dropped: int = Field(..., description="Event duplikat yang dibuang")
     topics: list[str] = Field(..., description="Daftar topic yang ada")
     uptime: float = Field(..., description="Uptime sistem dalam detik")
+    topic_stats: list[dict] = Field(
+        default_factory=list,
+        description="Per topic: total, duplicates, first_seen, last_seen"
+    )
+    dedup_cache: Optional[dict] = Field(None, description="Statistik hit/miss Bloom filter + LRU")
+    dedup_backend: Optional[dict] = Field(None, description="Nama backend dedup dan statistiknya")
+    queue_depth: int = Field(0, description="Total event yang menunggu di queue")
+    max_queue_size: int = Field(0, description="Batas kedalaman queue (0 = tidak dibatasi)")
+    backpressure_active: bool = Field(False, description="True jika publish sedang ditolak (429)")
+    backpressure_seconds: float = Field(0.0, description="Lama backpressure aktif (detik)")
+    rejected: int = Field(0, description="Event yang ditolak karena queue penuh")
+    replayed: int = Field(0, description="Event yang di-replay dari ingest log saat startup")
+    ingest_log: Optional[dict] = Field(None, description="Statistik write-ahead ingest log")
+    workers: list[dict] = Field(default_factory=list, description="Throughput dan queue depth per worker")
+    retention: Optional[dict] = Field(None, description="Statistik compaction retensi")
+    subscriptions: Optional[dict] = Field(None, description="Statistik subscriber /subscribe (SSE)")
+    aggregates: Optional[dict] = Field(None, description="Statistik agregasi window (pane, flush)")
+    processes: list[dict] = Field(
+        default_factory=list,
+        description="Mode multi-proses: proses writer dan tiap frontend (koneksi, request, event)"
+    )
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "received": 1000,
-                "unique_processed": 850,
-                "duplicate_dropped": 150,
-                "topics": ["user.login", "user.logout", "payment.success"],
-                "uptime": 3600.5
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "received": 1000,
+            "unique_processed": 850,
+            "duplicate_dropped": 150,
+            "topics": ["user.login", "user.logout", "payment.success"],
+            "uptime": 3600.5
         }
+    })
 
 
 class EventListResponse(BaseModel):
@@ -71,3 +229,4 @@ class EventListResponse(BaseModel):
     topic: Optional[str]
     count: int
     events: list[dict]
+    next_cursor: Optional[str] = Field(None, description="Cursor untuk halaman berikutnya")
@@ -0,0 +1,81 @@
+"""
+Launcher mode multi-proses
+
+    python -m src.multiproc --workers 4 --host 0.0.0.0 --port 8080
+
+Menjalankan satu proses writer (src.writer_service) sebagai pemilik dedup
+store, menunggu socket ingest-nya siap, lalu menjalankan uvicorn dengan N
+worker dalam mode frontend. Parsing HTTP dan validasi event tersebar ke N
+proses (N core), sedangkan dedup dan penulisan SQLite tetap di satu proses.
+Writer dihentikan setelah uvicorn berhenti.
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+from .config import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def wait_for_socket(path: str, writer: subprocess.Popen, timeout: float):
+    """
+    Tunggu sampai writer membuat file socket
+    
+    Raises:
+        RuntimeError: Jika writer keluar lebih dulu atau timeout terlewati
+    """
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if writer.poll() is not None:
+            raise RuntimeError(f"Writer berhenti saat startup (exit code {writer.returncode})")
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"Socket writer {path} tidak muncul dalam {timeout} detik")
+        time.sleep(0.05)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description="Aggregator multi-proses (writer + N worker HTTP)")
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1),
+                        help="Jumlah worker uvicorn (default: WEB_CONCURRENCY atau jumlah CPU)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--startup-timeout", type=float, default=30.0,
+                        help="Batas tunggu writer siap (detik)")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    path = Settings.from_env().resolved_ingest_socket()
+    # Socket sisa run sebelumnya jangan sampai dianggap writer yang sudah siap
+    if os.path.exists(path):
+        os.unlink(path)
+    os.environ["INGEST_SOCKET"] = path
+    
+    writer = subprocess.Popen([sys.executable, "-m", "src.writer_service"])
+    try:
+        wait_for_socket(path, writer, args.startup_timeout)
+        logger.info(f"Writer ready (pid {writer.pid}), starting {args.workers} HTTP workers")
+        os.environ["INGEST_MODE"] = "frontend"
+        uvicorn.run("src.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        writer.terminate()
+        try:
+            writer.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            writer.kill()
+    return writer.returncode or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+Kompresi payload event di processed_events
+Payload disimpan terkompresi (zlib, opsional dengan dictionary per topic)
+
+Format kolom payload:
+- TEXT: JSON apa adanya (baris lama, payload kecil, atau kompresi nonaktif)
+- BLOB 0x01 + deflate: raw deflate tanpa dictionary
+- BLOB 0x02 + dict_id (4 byte big-endian) + deflate: raw deflate dengan
+  preset dictionary dari tabel payload_dicts
+
+Karena format ditandai per baris, baris lama dan baru bisa hidup
+berdampingan dan mode kompresi bisa diganti kapan saja tanpa migrasi.
+Dictionary dilatih dari payload pertama tiap topic: payload log/telemetri
+kecil hampir tidak terkompresi sendirian, tetapi sangat mirip satu sama
+lain sehingga dictionary berisi contoh payload memotong ukurannya berlipat.
+"""
+import logging
+import sqlite3
+import struct
+import threading
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_MODES = ("off", "zlib", "zlib-dict")
+
+FORMAT_ZLIB = 0x01
+FORMAT_ZLIB_DICT = 0x02
+
+_DICT_ID = struct.Struct(">I")
+# Raw deflate (tanpa header/checksum zlib); marker format sudah cukup.
+# Decode selalu memakai window maksimal sehingga window encode boleh lebih kecil
+_WBITS = -15
+# State deflate kecil: payload event hanya ratusan byte, sedangkan biaya copy()
+# compressobj sebanding dengan ukuran hash table dan window (lihat bench.compression)
+_MEM_LEVEL = 4
+# Jarak referensi maksimal deflate = window - 262 byte
+_MIN_LOOKAHEAD = 262
+
+
+def _window_bits(dict_size: int) -> int:
+    """Window deflate terkecil yang masih menjangkau seluruh dictionary"""
+    bits = 9
+    while bits < 15 and (1 << bits) - _MIN_LOOKAHEAD < dict_size:
+        bits += 1
+    return bits
+
+
+class PayloadCodec:
+    """
+    Encode/decode payload untuk satu DedupStore
+    
+    encode dipanggil di transaksi writer (satu thread); decode bisa dipanggil
+    dari thread reader mana pun dan hanya membaca map dictionary.
+    """
+    
+    def __init__(self, mode: str = "off", level: int = 1, min_bytes: int = 128,
+                 dict_samples: int = 100, dict_size: int = 4096):
+        """
+        Args:
+            mode: off, zlib, atau zlib-dict
+            level: Level kompresi zlib (1 = tercepat)
+            min_bytes: Payload lebih kecil dari ini disimpan apa adanya
+            dict_samples: Jumlah payload contoh per topic sebelum dictionary dilatih
+            dict_size: Ukuran maksimal dictionary (byte); menentukan window deflate
+        
+        Raises:
+            ValueError: Jika mode tidak dikenal
+        """
+        if mode not in COMPRESSION_MODES:
+            raise ValueError(f"Mode kompresi tidak dikenal: {mode} (pilihan: {COMPRESSION_MODES})")
+        self.mode = mode
+        self.level = level
+        self.min_bytes = max(1, min_bytes)
+        self.dict_samples = max(1, dict_samples)
+        self.dict_size = max(256, min(dict_size, (1 << 15) - _MIN_LOOKAHEAD))
+        self._dict_wbits = -_window_bits(self.dict_size)
+        
+        # dict_id -> dictionary (semua yang pernah dibuat, untuk decode)
+        self._dicts: Dict[int, bytes] = {}
+        # topic -> (dict_id, compressobj dasar); copy() lebih murah daripada
+        # init baru yang harus memuat ulang dictionary
+        self._compressors: Dict[str, Tuple[int, "zlib._Compress"]] = {}
+        # topic -> contoh payload yang belum cukup untuk dilatih
+        self._samples: Dict[str, List[bytes]] = {}
+        self._sample_bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'rows_compressed': 0,
+            'rows_plain': 0,
+            'bytes_in': 0,
+            'bytes_out': 0,
+            'rows_decompressed': 0,
+            'dicts_trained': 0
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+    
+    def load_dicts(self, conn: sqlite3.Connection):
+        """Muat dictionary tersimpan; yang terbaru per topic dipakai untuk encode"""
+        for dict_id, topic, data in conn.execute(
+            "SELECT id, topic, dict FROM payload_dicts ORDER BY id"
+        ):
+            data = bytes(data)
+            self._dicts[dict_id] = data
+            if self.mode == "zlib-dict":
+                self._activate(topic, dict_id, data)
+        if self._dicts:
+            logger.info(f"Loaded {len(self._dicts)} payload dictionaries")
+    
+    def _activate(self, topic: str, dict_id: int, data: bytes):
+        base = zlib.compressobj(
+            self.level, zlib.DEFLATED, self._dict_wbits, _MEM_LEVEL, zdict=data
+        )
+        self._compressors[topic] = (dict_id, base)
+        self._samples.pop(topic, None)
+        self._sample_bytes.pop(topic, None)
+    
+    def encode(self, topic: str, payload: str) -> Union[str, bytes]:
+        """
+        Payload JSON menjadi nilai kolom payload
+        
+        Returns:
+            BLOB terkompresi, atau payload asli jika terlalu kecil atau
+            kompresi tidak memperkecil ukurannya
+        """
+        raw = payload.encode("utf-8")
+        if self.mode == "off" or len(raw) < self.min_bytes:
+            self.stats['rows_plain'] += 1
+            return payload
+        
+        compressor = self._compressors.get(topic)
+        if compressor is not None:
+            dict_id, base = compressor
+            c = base.copy()
+            value = bytes((FORMAT_ZLIB_DICT,)) + _DICT_ID.pack(dict_id) + c.compress(raw) + c.flush()
+        else:
+            if self.mode == "zlib-dict":
+                self._add_sample(topic, raw)
+            value = bytes((FORMAT_ZLIB,)) + zlib.compress(raw, self.level, _WBITS)
+        
+        if len(value) >= len(raw):
+            self.stats['rows_plain'] += 1
+            return payload
+        self.stats['rows_compressed'] += 1
+        self.stats['bytes_in'] += len(raw)
+        self.stats['bytes_out'] += len(value)
+        return value
+    
+    def _add_sample(self, topic: str, raw: bytes):
+        samples = self._samples.setdefault(topic, [])
+        if self._ready(topic):
+            return
+        samples.append(raw)
+        self._sample_bytes[topic] = self._sample_bytes.get(topic, 0) + len(raw)
+    
+    def _ready(self, topic: str) -> bool:
+        return (len(self._samples.get(topic, ())) >= self.dict_samples or
+                self._sample_bytes.get(topic, 0) >= self.dict_size)
+    
+    def pending_dicts(self) -> List[Tuple[str, bytes]]:
+        """
+        Latih dictionary untuk topic yang contohnya sudah cukup
+        
+        Dictionary adalah gabungan contoh payload dipotong ke dict_size dari
+        belakang (deflate paling murah mereferensikan byte terakhir dictionary).
+        Hasilnya disimpan pemanggil lewat activate setelah commit.
+        """
+        return [
+            (topic, b"".join(samples)[-self.dict_size:])
+            for topic, samples in self._samples.items()
+            if self._ready(topic)
+        ]
+    
+    def activate(self, topic: str, dict_id: int, data: bytes):
+        """Pakai dictionary yang sudah tersimpan di payload_dicts untuk encode topic"""
+        with self._lock:
+            self._dicts[dict_id] = data
+        self._activate(topic, dict_id, data)
+        self.stats['dicts_trained'] += 1
+        logger.info(f"Payload dictionary {dict_id} trained for topic {topic} ({len(data)} bytes)")
+    
+    def decode(self, value: Union[str, bytes], conn: Optional[sqlite3.Connection] = None) -> str:
+        """
+        Nilai kolom payload menjadi JSON (text)
+        
+        Args:
+            value: Isi kolom payload
+            conn: Koneksi untuk memuat dictionary yang belum ada di memori
+        
+        Raises:
+            ValueError: Jika format atau dictionary tidak dikenal
+        """
+        if type(value) is str:
+            return value
+        value = bytes(value)
+        marker = value[0] if value else None
+        if marker == FORMAT_ZLIB:
+            raw = zlib.decompress(value[1:], _WBITS)
+        elif marker == FORMAT_ZLIB_DICT:
+            dict_id = _DICT_ID.unpack_from(value, 1)[0]
+            d = zlib.decompressobj(_WBITS, zdict=self._dictionary(dict_id, conn))
+            raw = d.decompress(value[5:]) + d.flush()
+        else:
+            raise ValueError(f"Format payload tidak dikenal: {marker}")
+        # decode dipanggil dari banyak thread reader (encode hanya dari writer)
+        with self._lock:
+            self.stats['rows_decompressed'] += 1
+        return raw.decode("utf-8")
+    
+    def _dictionary(self, dict_id: int, conn: Optional[sqlite3.Connection]) -> bytes:
+        data = self._dicts.get(dict_id)
+        if data is not None:
+            return data
+        row = conn.execute(
+            "SELECT dict FROM payload_dicts WHERE id = ?", (dict_id,)
+        ).fetchone() if conn is not None else None
+        if row is None:
+            raise ValueError(f"Dictionary payload tidak dikenal: {dict_id}")
+        with self._lock:
+            self._dicts[dict_id] = bytes(row[0])
+        return self._dicts[dict_id]
+    
+    def get_stats(self) -> Dict:
+        return {
+            'mode': self.mode,
+            'level': self.level,
+            'dicts': len(self._dicts),
+            'ratio': (
+                self.stats['bytes_out'] / self.stats['bytes_in']
+                if self.stats['bytes_in'] else None
+            ),
+            **self.stats
+        }
+
+
+def merge_stats(stats: List[Dict]) -> Dict:
+    """Gabungkan get_stats beberapa codec (ShardedDedupStore)"""
+    merged = dict(stats[0])
+    for key in ('dicts', 'rows_compressed', 'rows_plain', 'bytes_in', 'bytes_out',
+                'rows_decompressed', 'dicts_trained'):
+        merged[key] = sum(s[key] for s in stats)
+    merged['ratio'] = merged['bytes_out'] / merged['bytes_in'] if merged['bytes_in'] else None
+    return merged
+
+
+def store_dict(conn: sqlite3.Connection, topic: str, data: bytes) -> int:
+    """Simpan dictionary baru ke payload_dicts (di transaksi writer)"""
+    return conn.execute(
+        "INSERT INTO payload_dicts (topic, dict, created_at) VALUES (?, ?, ?)",
+        (topic, data, datetime.utcnow().isoformat())
+    ).lastrowid
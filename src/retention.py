@@ -0,0 +1,221 @@
+"""
+Retention & Compaction
+Membatasi pertumbuhan processed_events: payload lama dibuang (atau diarsipkan)
+setelah X detik, key dedup dihapus setelah Y detik
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = ("ndjson", "columnar")
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """
+    Kebijakan retensi untuk satu topic (atau default global)
+    
+    Attributes:
+        payload_seconds: Umur maksimal payload penuh (0 = simpan selamanya)
+        key_seconds: Umur maksimal key dedup / baris (0 = simpan selamanya)
+    """
+    payload_seconds: float = 0
+    key_seconds: float = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.payload_seconds > 0 or self.key_seconds > 0
+
+
+def parse_topic_policies(spec: str) -> Dict[str, RetentionPolicy]:
+    """
+    Parse kebijakan per topic dari string environment
+    
+    Format: ``topic=payload_detik[:key_detik],topic2=...``; nilai kosong
+    atau 0 berarti disimpan selamanya. Contoh: ``audit=86400:2592000,debug=3600``
+    
+    Raises:
+        ValueError: Jika format tidak valid
+    """
+    policies = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        topic, sep, value = item.partition("=")
+        if not sep or not topic.strip():
+            raise ValueError(f"Kebijakan retensi tidak valid: {item}")
+        payload, _, key = value.partition(":")
+        try:
+            policies[topic.strip()] = RetentionPolicy(
+                payload_seconds=float(payload or 0),
+                key_seconds=float(key or 0)
+            )
+        except ValueError as e:
+            raise ValueError(f"Kebijakan retensi tidak valid: {item}") from e
+    return policies
+
+
+class NdjsonArchive:
+    """Arsip payload yang di-compact sebagai file NDJSON harian"""
+    
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+    
+    def __call__(self, rows: List[tuple]):
+        """
+        Append baris (topic, event_id, timestamp, source, payload, processed_at)
+        
+        Payload ditulis apa adanya (JSON mentah dari database).
+        """
+        if not rows:
+            return
+        dumps = json.dumps
+        data = "".join(
+            '{"topic":%s,"event_id":%s,"timestamp":%s,"source":%s,'
+            '"payload":%s,"processed_at":%s}\n' % (
+                dumps(r[0]), dumps(r[1]), dumps(r[2]), dumps(r[3]), r[4], dumps(r[5])
+            )
+            for r in rows
+        )
+        path = self.directory / f"archive-{datetime.utcnow():%Y%m%d}.ndjson"
+        with self._lock, open(path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+
+class Compactor:
+    """
+    Background task retensi
+    
+    - Setiap putaran memproses topic satu per satu dalam chunk kecil
+      (satu transaksi pendek per chunk) dan jeda di antara chunk, sehingga
+      writer lock tidak pernah ditahan lama dan consumer tetap jalan
+    - Key yang kedaluwarsa dihapus lebih dulu, baru payload lama di-compact
+    - Setelah putaran yang mengubah data, incremental vacuum opsional
+      mengembalikan page kosong ke filesystem
+    """
+    
+    def __init__(self, store, default_policy: RetentionPolicy,
+                 topic_policies: Optional[Dict[str, RetentionPolicy]] = None,
+                 chunk_size: int = 1000, chunk_pause: float = 0.05,
+                 interval: float = 60.0, vacuum_pages: int = 0,
+                 archive: Optional[Callable[[List[tuple]], None]] = None):
+        """
+        Args:
+            store: DedupStore atau ShardedDedupStore (synchronous)
+            default_policy: Kebijakan untuk topic tanpa aturan khusus
+            topic_policies: Kebijakan per topic
+            chunk_size: Maksimal baris per transaksi compaction
+            chunk_pause: Jeda (detik) antar chunk (rate limit)
+            interval: Jeda (detik) antar putaran
+            vacuum_pages: Page per incremental vacuum setelah putaran (0 = nonaktif)
+            archive: Tujuan arsip payload sebelum dibuang, mis. NdjsonArchive
+                atau archive.ColumnarArchive (None = dibuang)
+        """
+        self.store = store
+        self.default_policy = default_policy
+        self.topic_policies = topic_policies or {}
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause
+        self.interval = interval
+        self.vacuum_pages = vacuum_pages
+        self.archive = archive
+        
+        self._stopped = asyncio.Event()
+        self.stats = {
+            'runs': 0,
+            'payloads_compacted': 0,
+            'keys_expired': 0,
+            'vacuumed_pages': 0,
+            'last_run_at': None,
+            'last_run_seconds': 0.0,
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        return self.default_policy.enabled or any(p.enabled for p in self.topic_policies.values())
+    
+    def policy_for(self, topic: str) -> RetentionPolicy:
+        return self.topic_policies.get(topic, self.default_policy)
+    
+    async def _run_chunks(self, func, *args) -> int:
+        """Panggil func per chunk di thread sampai tidak ada lagi yang diproses"""
+        loop = asyncio.get_running_loop()
+        total = 0
+        while not self._stopped.is_set():
+            count = await loop.run_in_executor(None, func, *args)
+            if count == 0:
+                break
+            total += count
+            await asyncio.sleep(self.chunk_pause)
+        return total
+    
+    async def run_once(self) -> Dict:
+        """
+        Satu putaran compaction untuk semua topic
+        
+        Returns:
+            Jumlah key yang dihapus dan payload yang di-compact di putaran ini
+        """
+        started = time.monotonic()
+        now = datetime.utcnow()
+        expired = compacted = 0
+        
+        for topic in self.store.get_topics():
+            policy = self.policy_for(topic)
+            if policy.key_seconds > 0:
+                cutoff = (now - timedelta(seconds=policy.key_seconds)).isoformat()
+                expired += await self._run_chunks(
+                    self.store.expire_keys, topic, cutoff, self.chunk_size
+                )
+            if policy.payload_seconds > 0:
+                cutoff = (now - timedelta(seconds=policy.payload_seconds)).isoformat()
+                compacted += await self._run_chunks(
+                    self.store.compact_payloads, topic, cutoff, self.chunk_size, self.archive
+                )
+        
+        if self.vacuum_pages > 0 and (expired or compacted):
+            loop = asyncio.get_running_loop()
+            self.stats['vacuumed_pages'] += await loop.run_in_executor(
+                None, self.store.incremental_vacuum, self.vacuum_pages
+            )
+        
+        self.stats['runs'] += 1
+        self.stats['keys_expired'] += expired
+        self.stats['payloads_compacted'] += compacted
+        self.stats['last_run_at'] = now.isoformat()
+        self.stats['last_run_seconds'] = time.monotonic() - started
+        if expired or compacted:
+            logger.info(f"Compaction: {expired} keys expired, {compacted} payloads compacted")
+        return {'keys_expired': expired, 'payloads_compacted': compacted}
+    
+    async def run(self):
+        """Loop background sampai stop() dipanggil"""
+        logger.info(f"Compactor started (interval {self.interval}s, chunk {self.chunk_size})")
+        while not self._stopped.is_set():
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Compaction failed: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Compactor stopped")
+    
+    def stop(self):
+        """Hentikan loop (chunk yang sedang berjalan diselesaikan)"""
+        self._stopped.set()
+    
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        if hasattr(self.archive, 'get_stats'):
+            stats['archive'] = self.archive.get_stats()
+        return stats
@@ -0,0 +1,290 @@
+"""
+Runtime
+Komponen milik proses yang memegang dedup store: store, ingest log,
+consumer, compactor, dan registry metrics
+
+Dipakai oleh app FastAPI pada mode standalone dan oleh proses writer
+(src.writer_service) pada mode multi-proses, sehingga urutan startup dan
+shutdown-nya identik.
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from .aggregates import AggregateStore, WindowAggregator
+from .archive import ArchiveReader, ColumnarArchive
+from .config import Settings
+from .consumer import EventConsumer
+from .dedup_backend import BACKENDS, DedupBackend, MemoryDedupBackend, MmapDedupBackend
+from .dedup_store import DedupStore
+from .ingest_log import IngestLog
+from .metrics import MetricsRegistry
+from .retention import (
+    ARCHIVE_FORMATS, Compactor, NdjsonArchive, RetentionPolicy, parse_topic_policies
+)
+from .sharded_store import ShardedDedupStore
+from .subscriptions import SubscriptionHub
+
+logger = logging.getLogger(__name__)
+
+
+def build_store(settings: Settings) -> DedupBackend:
+    """
+    Buat dedup backend sesuai DEDUP_BACKEND / DEDUP_SHARDS
+    
+    Raises:
+        ValueError: Jika DEDUP_BACKEND atau PAYLOAD_COMPRESSION tidak dikenal
+    """
+    if settings.dedup_backend not in BACKENDS:
+        raise ValueError(
+            f"DEDUP_BACKEND tidak dikenal: {settings.dedup_backend} (pilihan: {BACKENDS})"
+        )
+    if settings.dedup_backend == "memory":
+        return MemoryDedupBackend()
+    if settings.dedup_backend == "mmap":
+        return MmapDedupBackend(
+            settings.resolved_mmap_path(), initial_capacity=settings.dedup_mmap_capacity
+        )
+    
+    store_kwargs = dict(
+        synchronous=settings.sqlite_synchronous,
+        mmap_size=settings.sqlite_mmap_size,
+        cache_size=settings.sqlite_cache_size,
+        reader_pool_size=settings.sqlite_reader_pool,
+        dedup_cache_size=settings.dedup_cache_size,
+        payload_compression=settings.payload_compression,
+        compression_level=settings.payload_compression_level,
+        compression_min_bytes=settings.payload_compression_min_bytes,
+        dict_samples=settings.payload_dict_samples,
+        dict_size=settings.payload_dict_size
+    )
+    if settings.dedup_shards > 1:
+        return ShardedDedupStore(
+            settings.resolved_shard_dir(), settings.dedup_shards, **store_kwargs
+        )
+    return DedupStore(settings.db_path, **store_kwargs)
+
+
+def build_archive(settings: Settings):
+    """
+    Tujuan arsip compaction sesuai RETENTION_ARCHIVE_DIR / RETENTION_ARCHIVE_FORMAT
+    
+    Raises:
+        ValueError: Jika RETENTION_ARCHIVE_FORMAT tidak dikenal
+    """
+    if settings.retention_archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(
+            f"RETENTION_ARCHIVE_FORMAT tidak dikenal: {settings.retention_archive_format} "
+            f"(pilihan: {ARCHIVE_FORMATS})"
+        )
+    if not settings.retention_archive_dir:
+        return None
+    if settings.retention_archive_format == "columnar":
+        return ColumnarArchive(
+            settings.retention_archive_dir, max_fields=settings.archive_max_fields
+        )
+    return NdjsonArchive(settings.retention_archive_dir)
+
+
+def build_archive_reader(settings: Settings) -> Optional[ArchiveReader]:
+    """Reader segment kolumnar; None jika arsip bukan format columnar"""
+    if settings.retention_archive_format == "columnar" and settings.retention_archive_dir:
+        return ArchiveReader(settings.retention_archive_dir)
+    return None
+
+
+def build_metrics(consumer: EventConsumer) -> MetricsRegistry:
+    """
+    Registry /metrics: histogram hot path consumer plus counter/gauge
+    yang dibaca dari consumer dan dedup store saat scrape
+    """
+    registry = MetricsRegistry()
+    for histogram in consumer.metrics.histograms():
+        registry.register(histogram)
+    stats = consumer.stats
+    registry.counter("aggregator_received_total", "Total event yang diterima",
+                     lambda: stats['received'])
+    registry.counter("aggregator_unique_processed_total", "Event unik yang diproses",
+                     lambda: stats['unique_processed'])
+    registry.counter("aggregator_duplicate_dropped_total", "Event duplikat yang dibuang",
+                     lambda: stats['duplicate_dropped'])
+    registry.counter("aggregator_rejected_total", "Event yang ditolak karena queue penuh",
+                     lambda: stats['rejected'])
+    registry.gauge("aggregator_queue_depth", "Event yang menunggu di queue",
+                   consumer.queue_depth)
+    registry.gauge("aggregator_backpressure_active", "1 jika publish sedang ditolak (429)",
+                   lambda: consumer.backpressure_active)
+    registry.gauge("aggregator_db_size_bytes", "Ukuran database dedup di disk (termasuk WAL)",
+                   consumer.dedup_store.get_db_size)
+    if consumer.hub is not None:
+        hub = consumer.hub
+        registry.gauge("aggregator_subscribers", "Subscriber /subscribe yang terhubung",
+                       lambda: hub.subscriber_count)
+        registry.counter("aggregator_subscriber_dropped_total",
+                         "Event yang dibuang karena buffer subscriber penuh",
+                         lambda: hub.stats['dropped'])
+    return registry
+
+
+class Runtime:
+    """Startup/shutdown store, ingest log, consumer, dan compactor"""
+    
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.dedup_store: Optional[DedupBackend] = None
+        self.ingest_log: Optional[IngestLog] = None
+        self.consumer: Optional[EventConsumer] = None
+        self.consumer_task: Optional[asyncio.Task] = None
+        self.compactor: Optional[Compactor] = None
+        self.compactor_task: Optional[asyncio.Task] = None
+        self.metrics: Optional[MetricsRegistry] = None
+        self.hub: Optional[SubscriptionHub] = None
+        self.aggregator: Optional[WindowAggregator] = None
+        self.aggregator_task: Optional[asyncio.Task] = None
+        self.ingest_log_task: Optional[asyncio.Task] = None
+        self.archive_reader: Optional[ArchiveReader] = build_archive_reader(settings)
+    
+    async def start(self):
+        """Buka store, replay ingest log, lalu jalankan consumer dan compactor"""
+        settings = self.settings
+        self.dedup_store = build_store(settings)
+        
+        # Buka write-ahead ingest log dan kumpulkan event yang belum committed
+        replay = []
+        if settings.ingest_log_enabled:
+            self.ingest_log = IngestLog(
+                settings.resolved_ingest_log_dir(),
+                segment_bytes=settings.ingest_log_segment_bytes,
+                sync_interval=settings.ingest_log_sync_ms / 1000.0
+            )
+            replay = self.ingest_log.open()
+        
+        # Hub subscriber /subscribe (push event unik yang baru tersimpan)
+        self.hub = SubscriptionHub(
+            buffer_size=settings.subscribe_buffer_size,
+            policy=settings.subscribe_slow_policy,
+            replay_size=settings.subscribe_replay_size,
+            heartbeat=settings.subscribe_heartbeat_s
+        )
+        
+        # Agregasi window per (topic, source) untuk GET /aggregates
+        if settings.aggregates_enabled:
+            self.aggregator = WindowAggregator(
+                AggregateStore(settings.resolved_aggregate_db_path()),
+                pane_seconds=settings.aggregate_pane_s,
+                retention_seconds=settings.aggregate_retention_s,
+                flush_interval=settings.aggregate_flush_s,
+                max_fields=settings.aggregate_max_fields,
+                max_skew_seconds=settings.aggregate_max_skew_s
+            )
+        
+        # Inisialisasi consumer (group commit bila batch_size > 1)
+        self.consumer = EventConsumer(
+            self.dedup_store,
+            batch_size=settings.batch_size,
+            batch_timeout=settings.batch_timeout_ms / 1000.0,
+            num_workers=settings.consumer_workers,
+            max_queue_size=settings.queue_max_size,
+            high_watermark=settings.queue_high_watermark or None,
+            low_watermark=(
+                settings.queue_low_watermark if settings.queue_low_watermark >= 0 else None
+            ),
+            enqueue_timeout=settings.enqueue_timeout_ms / 1000.0,
+            retry_after=settings.retry_after_seconds,
+            ingest_log=self.ingest_log,
+            precheck=settings.dedup_precheck,
+            hub=self.hub,
+            aggregator=self.aggregator
+        )
+        await self.consumer.replay(replay)
+        self.metrics = build_metrics(self.consumer)
+        
+        # Start consumer dalam background task
+        self.consumer_task = asyncio.create_task(self.consumer.start())
+        if self.aggregator is not None:
+            self.aggregator_task = asyncio.create_task(self.aggregator.run())
+        if self.ingest_log is not None:
+            self.ingest_log_task = asyncio.create_task(self.ingest_log.run())
+        logger.info("Consumer started in background")
+        
+        # Compaction retensi (hanya jika ada kebijakan yang aktif)
+        archive = build_archive(settings)
+        compactor = Compactor(
+            self.dedup_store,
+            RetentionPolicy(settings.retention_payload_seconds, settings.retention_key_seconds),
+            parse_topic_policies(settings.retention_topics),
+            chunk_size=settings.compaction_chunk_size,
+            chunk_pause=settings.compaction_chunk_pause_ms / 1000.0,
+            interval=settings.compaction_interval_s,
+            vacuum_pages=settings.compaction_vacuum_pages,
+            archive=archive
+        )
+        if compactor.enabled and settings.dedup_backend != "sqlite":
+            logger.warning(
+                f"Retensi diabaikan: backend {settings.dedup_backend} tidak menyimpan payload"
+            )
+        elif compactor.enabled:
+            self.compactor = compactor
+            self.compactor_task = asyncio.create_task(compactor.run())
+    
+    async def collect_stats(self) -> Dict:
+        """Statistik consumer ditambah statistik retensi (jika aktif)"""
+        stats = await self.consumer.collect_stats()
+        if self.compactor is not None:
+            stats['retention'] = self.compactor.get_stats()
+        return stats
+    
+    async def render_metrics(self) -> str:
+        """Seluruh metric dalam Prometheus text format"""
+        return self.metrics.render()
+    
+    def iter_events_ndjson(self, topic: Optional[str] = None,
+                           batch_size: int = 1000) -> Iterator[bytes]:
+        """Ekspor NDJSON langsung dari dedup store (generator blocking)"""
+        return self.dedup_store.iter_events_ndjson(topic=topic, batch_size=batch_size)
+    
+    async def query_aggregates(self, **kwargs) -> Optional[Dict]:
+        """WindowAggregator.query; None jika agregasi nonaktif"""
+        if self.aggregator is None:
+            return None
+        return self.aggregator.query(**kwargs)
+    
+    async def scan_archive(self, **kwargs) -> Optional[Dict]:
+        """ArchiveReader.scan_columns di thread; None jika arsip bukan columnar"""
+        if self.archive_reader is None:
+            return None
+        return await asyncio.to_thread(self.archive_reader.scan_columns, **kwargs)
+    
+    def subscribe(self, topic: Optional[str] = None, last_event_id: Optional[str] = None,
+                  policy: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Body text/event-stream untuk satu subscriber (lihat SubscriptionHub.stream)"""
+        return self.hub.stream(topic=topic, last_event_id=last_event_id, policy=policy)
+    
+    async def stop(self):
+        """Hentikan compactor dan consumer, lalu tutup ingest log dan store"""
+        self.hub.close_all()
+        if self.compactor is not None:
+            self.compactor.stop()
+            await self.compactor_task
+        self.consumer.stop()
+        
+        # Tunggu consumer task selesai
+        if self.consumer_task:
+            try:
+                await asyncio.wait_for(self.consumer_task, timeout=5.0)
+            except asyncio.TimeoutError:
+                logger.warning("Consumer task did not finish in time")
+        
+        # Flush terakhir pane agregasi setelah consumer berhenti
+        if self.aggregator is not None:
+            self.aggregator.stop()
+            await self.aggregator_task
+            self.aggregator.close()
+        
+        # Event yang belum diproses tetap ada di ingest log dan di-replay saat start berikutnya
+        if self.ingest_log is not None:
+            if self.ingest_log_task is not None:
+                self.ingest_log.stop()
+                await self.ingest_log_task
+            await self.ingest_log.aclose()
+        self.consumer.store.close()
@@ -0,0 +1,409 @@
+"""
+Sharded Dedup Store
+Membagi (topic, event_id) ke beberapa file SQLite dengan consistent hashing
+sehingga tiap shard punya writer lock sendiri
+"""
+import argparse
+import base64
+import bisect
+import hashlib
+import heapq
+import json
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .dedup_store import DedupStore, encode_cursor
+from .payload_codec import PayloadCodec, merge_stats
+
+logger = logging.getLogger(__name__)
+
+
+def _hash64(data: bytes) -> int:
+    """Hash 64-bit stabil (tidak bergantung PYTHONHASHSEED)"""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring dengan virtual node
+    
+    Menambah/mengurangi shard hanya memindahkan sekitar 1/N key.
+    """
+    
+    def __init__(self, num_shards: int, vnodes: int = 64):
+        """
+        Args:
+            num_shards: Jumlah shard
+            vnodes: Jumlah virtual node per shard
+        """
+        points = []
+        for shard in range(num_shards):
+            for v in range(vnodes):
+                points.append((_hash64(f"shard-{shard}#{v}".encode("utf-8")), shard))
+        points.sort()
+        self._hashes = [h for h, _ in points]
+        self._shards = [s for _, s in points]
+    
+    def shard_for(self, topic: str, event_id: str) -> int:
+        """Shard pemilik key (topic, event_id)"""
+        h = _hash64(topic.encode("utf-8") + b"\x00" + event_id.encode("utf-8"))
+        index = bisect.bisect(self._hashes, h) % len(self._hashes)
+        return self._shards[index]
+
+
+def _encode_shard_cursor(last_ids: List[Optional[int]]) -> str:
+    """Cursor opaque berisi id terakhir per shard"""
+    raw = json.dumps({"s": last_ids}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_shard_cursor(cursor: str, num_shards: int) -> List[Optional[int]]:
+    """
+    Decode cursor sharded
+    
+    Raises:
+        ValueError: Jika cursor tidak valid
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_ids = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["s"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Cursor tidak valid: {cursor}") from e
+    if (not isinstance(last_ids, list) or len(last_ids) != num_shards or
+            not all(i is None or isinstance(i, int) for i in last_ids)):
+        raise ValueError(f"Cursor tidak valid: {cursor}")
+    return last_ids
+
+
+class ShardedDedupStore:
+    """
+    Interface sama dengan DedupStore, data dibagi ke N file SQLite
+    
+    - Write dirutekan ke shard pemilik key lewat HashRing; batch dipecah per
+      shard dan ditulis paralel (satu writer per shard)
+    - Read (get_events, get_topics, stats) di-fan-out ke semua shard lalu digabung
+    """
+    
+    def __init__(self, directory: str, num_shards: int, **store_kwargs):
+        """
+        Args:
+            directory: Direktori berisi file shard-<i>.db
+            num_shards: Jumlah shard
+            **store_kwargs: Diteruskan ke setiap DedupStore (pragma, cache, dll)
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards minimal 1")
+        self.directory = Path(directory)
+        self.num_shards = num_shards
+        self.ring = HashRing(num_shards)
+        self.shards = [
+            DedupStore(str(self.directory / f"shard-{i}.db"), **store_kwargs)
+            for i in range(num_shards)
+        ]
+        self.db_path = str(self.directory)
+        self.reader_pool_size = self.shards[0].reader_pool_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_shards, thread_name_prefix="dedup-shard"
+        )
+        logger.info(f"ShardedDedupStore initialized: {num_shards} shards in {directory}")
+    
+    @property
+    def db_paths(self) -> List[str]:
+        """Path file database semua shard"""
+        return [shard.db_path for shard in self.shards]
+    
+    def shard_for(self, topic: str, event_id: str) -> DedupStore:
+        """Shard pemilik key"""
+        return self.shards[self.ring.shard_for(topic, event_id)]
+    
+    def _fan_out(self, func, *args):
+        """Jalankan func(shard, *args) di semua shard secara paralel"""
+        return list(self._executor.map(lambda shard: func(shard, *args), self.shards))
+    
+    def close(self):
+        """Tutup semua shard"""
+        self._executor.shutdown(wait=True)
+        for shard in self.shards:
+            shard.close()
+    
+    # --- Dedup / write ---
+    
+    def is_duplicate(self, topic: str, event_id: str) -> bool:
+        return self.shard_for(topic, event_id).is_duplicate(topic, event_id)
+    
+    def is_duplicate_cached(self, topic: str, event_id: str) -> Optional[bool]:
+        return self.shard_for(topic, event_id).is_duplicate_cached(topic, event_id)
+    
+    def is_duplicate_db(self, topic: str, event_id: str) -> bool:
+        return self.shard_for(topic, event_id).is_duplicate_db(topic, event_id)
+    
+    def store_event(self, event: dict) -> bool:
+        return self.check_and_store(event)
+    
+    def store_events(self, events: List[dict]) -> List[bool]:
+        """
+        Group commit per shard; shard yang berbeda ditulis paralel
+        
+        Returns:
+            List boolean sejajar dengan input (True = baru disimpan)
+        """
+        groups: Dict[int, List[int]] = {}
+        for index, event in enumerate(events):
+            shard = self.ring.shard_for(event['topic'], event['event_id'])
+            groups.setdefault(shard, []).append(index)
+        
+        futures = {
+            shard: self._executor.submit(
+                self.shards[shard].check_and_store_many, [events[i] for i in indexes]
+            )
+            for shard, indexes in groups.items()
+        }
+        
+        results = [False] * len(events)
+        for shard, future in futures.items():
+            for index, stored in zip(groups[shard], future.result()):
+                results[index] = stored
+        return results
+    
+    def check_and_store(self, event) -> bool:
+        return self.shard_for(event['topic'], event['event_id']).check_and_store(event)
+    
+    def check_and_store_many(self, events: List) -> List[bool]:
+        return self.store_events(events)
+    
+    def check_and_mark(self, event) -> bool:
+        return self.check_and_store(event)
+    
+    def check_and_mark_many(self, events: List) -> List[bool]:
+        return self.store_events(events)
+    
+    def query(self, topic: str, event_id: str) -> bool:
+        return self.is_duplicate(topic, event_id)
+    
+    def stats(self) -> Dict:
+        return {
+            'backend': 'sqlite',
+            **self.get_stats(),
+            'payload_compression': merge_stats([shard.codec.get_stats() for shard in self.shards])
+        }
+    
+    def note_duplicates(self, counts: Dict[str, int]):
+        # Duplikat per topic tidak terikat key tertentu; cukup dicatat di shard 0
+        self.shards[0].note_duplicates(counts)
+    
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+    
+    # --- Retention ---
+    
+    def compact_payloads(self, topic: str, cutoff: str, limit: int = 1000,
+                         archive=None) -> int:
+        """Compact satu chunk per shard (berurutan, agar callback archive tidak paralel)"""
+        return sum(shard.compact_payloads(topic, cutoff, limit, archive) for shard in self.shards)
+    
+    def expire_keys(self, topic: str, cutoff: str, limit: int = 1000) -> int:
+        return sum(shard.expire_keys(topic, cutoff, limit) for shard in self.shards)
+    
+    def incremental_vacuum(self, pages: int) -> int:
+        return sum(shard.incremental_vacuum(pages) for shard in self.shards)
+    
+    # --- Read / query ---
+    
+    def get_events(self, topic: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        events, _ = self.get_events_page(topic, limit)
+        return events
+    
+    def get_events_page(self, topic: Optional[str] = None, limit: int = 100,
+                        cursor: Optional[str] = None,
+                        include_id: bool = False,
+                        **filters) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Keyset pagination lintas shard
+        
+        Setiap shard mengembalikan halamannya sendiri (id turun), lalu hasil
+        digabung berdasarkan processed_at. Cursor menyimpan id terakhir yang
+        sudah dikonsumsi dari masing-masing shard.
+        
+        Raises:
+            ValueError: Jika cursor tidak valid
+        """
+        last_ids = (
+            _decode_shard_cursor(cursor, self.num_shards) if cursor
+            else [None] * self.num_shards
+        )
+        
+        def query(i: int):
+            # id 0 menandai shard yang sudah habis (tidak ada id < 0)
+            shard_cursor = encode_cursor(last_ids[i]) if last_ids[i] is not None else None
+            return self.shards[i].get_events_page(
+                topic, limit, cursor=shard_cursor, include_id=True, **filters
+            )
+        
+        pages = list(self._executor.map(query, range(self.num_shards)))
+        
+        merged = heapq.merge(
+            *[[(i, e) for e in events] for i, (events, _) in enumerate(pages)],
+            key=lambda item: (item[1]['processed_at'], item[1]['id']),
+            reverse=True
+        )
+        
+        result = []
+        consumed = list(last_ids)
+        for shard, event in merged:
+            if len(result) >= limit:
+                break
+            consumed[shard] = event['id']
+            if not include_id:
+                event = {k: v for k, v in event.items() if k != 'id'}
+            result.append(event)
+        
+        has_more = False
+        for i, (events, shard_next) in enumerate(pages):
+            leftover = any(consumed[i] is None or e['id'] < consumed[i] for e in events)
+            if leftover or shard_next is not None:
+                has_more = True
+            else:
+                consumed[i] = 0
+        
+        next_cursor = _encode_shard_cursor(consumed) if has_more else None
+        return result, next_cursor
+    
+    def iter_events_ndjson(self, topic: Optional[str] = None,
+                           batch_size: int = 1000) -> Iterator[bytes]:
+        """Ekspor NDJSON shard demi shard (urutan global tidak dijamin)"""
+        return chain.from_iterable(
+            shard.iter_events_ndjson(topic=topic, batch_size=batch_size)
+            for shard in self.shards
+        )
+    
+    def get_topics(self) -> List[str]:
+        return sorted(set(chain.from_iterable(shard.get_topics() for shard in self.shards)))
+    
+    def get_topic_stats(self) -> List[Dict]:
+        """Gabungkan ringkasan per topic dari semua shard"""
+        merged: Dict[str, Dict] = {}
+        for shard in self.shards:
+            for entry in shard.get_topic_stats():
+                current = merged.get(entry['topic'])
+                if current is None:
+                    merged[entry['topic']] = dict(entry)
+                    continue
+                current['total'] += entry['total']
+                current['duplicates'] += entry['duplicates']
+                current['first_seen'] = min(
+                    filter(None, [current['first_seen'], entry['first_seen']]), default=None
+                )
+                current['last_seen'] = max(
+                    filter(None, [current['last_seen'], entry['last_seen']]), default=None
+                )
+        return [merged[topic] for topic in sorted(merged)]
+    
+    def get_stats(self) -> Dict:
+        stats = [shard.get_stats() for shard in self.shards]
+        return {
+            'total_processed': sum(s['total_processed'] for s in stats),
+            'topic_count': len(self.get_topics()),
+            'shards': self.num_shards,
+        }
+    
+    def get_db_size(self) -> int:
+        return sum(shard.get_db_size() for shard in self.shards)
+    
+    def get_cache_stats(self) -> Optional[Dict]:
+        """Jumlahkan statistik front cache semua shard"""
+        per_shard = [shard.get_cache_stats() for shard in self.shards]
+        if any(s is None for s in per_shard):
+            return None
+        total = {
+            key: sum(s[key] for s in per_shard)
+            for key in ('lru_hits', 'bloom_negatives', 'db_lookups', 'bloom_false_positives',
+                        'lookups', 'bloom_keys', 'bloom_capacity', 'bloom_layers', 'lru_size')
+        }
+        served = total['lru_hits'] + total['bloom_negatives']
+        total['hit_rate'] = served / total['lookups'] if total['lookups'] else 0.0
+        return total
+
+
+def reshard(source_db: str, dest_dir: str, num_shards: int, batch_size: int = 10000) -> Dict:
+    """
+    Pindahkan database single-file ke layout sharded (offline)
+    
+    Service harus dalam keadaan berhenti. Baris disalin apa adanya
+    (payload dan processed_at asli; payload terkompresi di-decode ke JSON
+    karena dictionary-nya milik database sumber), lalu topic_stats tiap shard
+    dibangun ulang. Counter duplikat historis dipindahkan ke shard 0.
+    
+    Args:
+        source_db: Path database sumber
+        dest_dir: Direktori tujuan file shard-<i>.db
+        num_shards: Jumlah shard tujuan
+        batch_size: Jumlah baris per transaksi
+    
+    Returns:
+        Ringkasan jumlah baris per shard
+    """
+    target = ShardedDedupStore(dest_dir, num_shards, dedup_cache_size=0)
+    copied = [0] * num_shards
+    
+    source = sqlite3.connect(f"{Path(source_db).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        codec = PayloadCodec()
+        if source.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'payload_dicts'"
+        ).fetchone():
+            codec.load_dicts(source)
+        
+        cursor = source.execute("""
+            SELECT topic, event_id, timestamp, source, payload, processed_at
+            FROM processed_events
+            ORDER BY id
+        """)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            groups: Dict[int, List[tuple]] = {}
+            for row in rows:
+                row = row[:4] + (codec.decode(row[4]),) + row[5:]
+                groups.setdefault(target.ring.shard_for(row[0], row[1]), []).append(row)
+            for shard, shard_rows in groups.items():
+                copied[shard] += target.shards[shard].import_rows(shard_rows)
+        
+        duplicates = {}
+        has_stats = source.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'topic_stats'"
+        ).fetchone()
+        if has_stats:
+            duplicates = dict(source.execute(
+                "SELECT topic, duplicates FROM topic_stats WHERE duplicates > 0"
+            ).fetchall())
+    finally:
+        source.close()
+    
+    for shard in target.shards:
+        shard.refresh_topic_stats()
+    target.note_duplicates(duplicates)
+    target.close()
+    
+    summary = {'source': source_db, 'dest': dest_dir, 'shards': copied, 'total': sum(copied)}
+    logger.info(f"Reshard finished: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Reshard database DedupStore single-file ke N shard (jalankan saat service mati)"
+    )
+    parser.add_argument("--source", default="data/dedup_store.db", help="Database sumber")
+    parser.add_argument("--dest", default="data/shards", help="Direktori shard tujuan")
+    parser.add_argument("--shards", type=int, required=True, help="Jumlah shard")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Baris per transaksi")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    print(json.dumps(reshard(args.source, args.dest, args.shards, args.batch_size), indent=2))
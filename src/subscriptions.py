@@ -0,0 +1,286 @@
+"""
+Subscriptions
+Push event unik yang baru tersimpan ke subscriber (Server-Sent Events)
+
+EventConsumer memanggil SubscriptionHub.publish_many setelah check-and-insert;
+hub memberi nomor urut, menyimpan ring buffer untuk resume, dan menyalin
+event ke buffer berbatas milik tiap subscriber topic tersebut. Pengiriman
+ke socket terjadi di task response masing-masing subscriber, sehingga
+subscriber yang lambat tidak pernah menahan consumer:
+
+- policy "drop": event terlama di buffer dibuang, subscriber menerima
+  event "dropped" berisi jumlah event yang terlewat
+- policy "disconnect": subscription ditutup dengan event "disconnect"
+
+ID SSE berbentuk "<epoch>-<seq>"; epoch berganti setiap proses start
+sehingga Last-Event-ID dari run sebelumnya tidak salah ditafsirkan.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple, Union
+
+from .models import EventRecord
+
+logger = logging.getLogger(__name__)
+
+SLOW_POLICIES = ("drop", "disconnect")
+
+# Item buffer: (seq, topic, data JSON event)
+_Item = Tuple[int, str, bytes]
+# Item ring buffer: data masih EventRecord jika belum pernah diserialisasi
+_ReplayItem = Tuple[int, str, Union[bytes, EventRecord]]
+
+
+def _control(event: str, data: dict) -> bytes:
+    """Frame SSE kontrol (dropped / reset / disconnect)"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+class Subscription:
+    """Buffer berbatas satu subscriber; diisi hub, dikuras oleh stream()"""
+    
+    def __init__(self, topic: Optional[str], buffer_size: int, policy: str,
+                 backlog: List[_Item]):
+        self.topic = topic
+        self.buffer_size = buffer_size
+        self.policy = policy
+        self.buffer: Deque[_Item] = deque()
+        self.backlog = backlog
+        self.dropped = 0
+        self.delivered = 0
+        self.closed_reason: Optional[str] = None
+        self._wakeup = asyncio.Event()
+    
+    def push(self, item: _Item) -> bool:
+        """
+        Tambahkan satu event (dipanggil hub, tanpa await)
+        
+        Returns:
+            False jika subscriber diputus karena buffer penuh
+        """
+        if len(self.buffer) >= self.buffer_size:
+            if self.policy == "disconnect":
+                self.close("slow_consumer")
+                return False
+            self.buffer.popleft()
+            self.dropped += 1
+        self.buffer.append(item)
+        self._wakeup.set()
+        return True
+    
+    def close(self, reason: str):
+        if self.closed_reason is None:
+            self.closed_reason = reason
+        self._wakeup.set()
+    
+    async def wait(self, timeout: float) -> bool:
+        """Tunggu event baru atau penutupan; False jika timeout (kirim heartbeat)"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._wakeup.clear()
+        return True
+
+
+class SubscriptionHub:
+    """
+    Fan-out event ke subscriber per topic
+    
+    publish_many berjalan di event loop consumer tanpa I/O: biayanya satu
+    serialisasi JSON per event (hanya jika ada subscriber topic tersebut)
+    dan satu append per subscriber. Ring buffer replay menyimpan
+    EventRecord apa adanya; serialisasi ditunda sampai ada resume.
+    """
+    
+    def __init__(self, buffer_size: int = 1000, policy: str = "drop",
+                 replay_size: int = 10000, heartbeat: float = 15.0):
+        """
+        Args:
+            buffer_size: Maksimal event tertunda per subscriber
+            policy: Perlakuan subscriber lambat: drop atau disconnect
+            replay_size: Event terakhir yang disimpan untuk resume (0 = nonaktif)
+            heartbeat: Jeda komentar keep-alive SSE saat tidak ada event (detik)
+        
+        Raises:
+            ValueError: Jika policy tidak dikenal
+        """
+        if policy not in SLOW_POLICIES:
+            raise ValueError(f"Policy subscriber tidak dikenal: {policy} (pilihan: {SLOW_POLICIES})")
+        self.buffer_size = max(1, buffer_size)
+        self.policy = policy
+        self.heartbeat = heartbeat
+        self.epoch = format(int(time.time() * 1000), "x")
+        self._seq = 0
+        self._replay: Deque[_ReplayItem] = deque(maxlen=replay_size) if replay_size > 0 else None
+        self._by_topic: Dict[str, Set[Subscription]] = {}
+        self._all: Set[Subscription] = set()
+        self.stats = {
+            'published': 0,
+            'delivered': 0,
+            'dropped': 0,
+            'disconnected_slow': 0,
+            'resumed': 0,
+            'reset': 0
+        }
+    
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._all) + sum(len(subs) for subs in self._by_topic.values())
+    
+    def publish_many(self, events: List):
+        """Beri nomor urut lalu salin event ke ring buffer dan subscriber topic-nya"""
+        if self._replay is None and not self.subscriber_count:
+            return
+        for event in events:
+            if type(event) is not EventRecord:
+                event = EventRecord.from_dict(event)
+            self._seq += 1
+            targets = self._targets(event.topic)
+            if not targets:
+                if self._replay is not None:
+                    self._replay.append((self._seq, event.topic, event))
+                continue
+            item = (self._seq, event.topic, event.to_json())
+            if self._replay is not None:
+                self._replay.append(item)
+            for subscription in targets:
+                if not subscription.push(item):
+                    self.stats['disconnected_slow'] += 1
+                    self._remove(subscription)
+        self.stats['published'] += len(events)
+    
+    def _targets(self, topic: str) -> List[Subscription]:
+        targets = self._by_topic.get(topic)
+        if not targets:
+            return list(self._all) if self._all else []
+        return list(targets) + list(self._all)
+    
+    def _backlog(self, topic: Optional[str], last_event_id: Optional[str]
+                 ) -> Tuple[List[_Item], Optional[str]]:
+        """
+        Event setelah last_event_id dari ring buffer
+        
+        Returns:
+            Tuple (backlog, alasan reset atau None jika resume utuh)
+        """
+        if not last_event_id:
+            return [], None
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return [], "unknown_epoch"
+        after = int(seq)
+        if self._replay is None:
+            return [], "replay_disabled"
+        oldest = self._replay[0][0] if self._replay else self._seq + 1
+        if after + 1 < oldest:
+            return [], "replay_expired"
+        start = max(0, after + 1 - oldest)
+        return [
+            (seq, item_topic, data if type(data) is bytes else data.to_json())
+            for seq, item_topic, data in islice(self._replay, start, None)
+            if not topic or item_topic == topic
+        ], None
+    
+    def subscribe(self, topic: Optional[str] = None, last_event_id: Optional[str] = None,
+                  policy: Optional[str] = None) -> Tuple[Subscription, Optional[str]]:
+        """
+        Daftarkan subscriber baru
+        
+        Backlog resume diambil pada saat yang sama dengan pendaftaran (tanpa
+        await) sehingga tidak ada event yang terlewat atau terkirim dua kali.
+        
+        Returns:
+            Tuple (subscription, alasan reset atau None)
+        """
+        policy = policy or self.policy
+        if policy not in SLOW_POLICIES:
+            raise ValueError(f"Policy subscriber tidak dikenal: {policy} (pilihan: {SLOW_POLICIES})")
+        backlog, reset = self._backlog(topic, last_event_id)
+        subscription = Subscription(topic or None, self.buffer_size, policy, backlog)
+        if topic:
+            self._by_topic.setdefault(topic, set()).add(subscription)
+        else:
+            self._all.add(subscription)
+        if reset:
+            self.stats['reset'] += 1
+        elif last_event_id:
+            self.stats['resumed'] += 1
+        return subscription, reset
+    
+    def _remove(self, subscription: Subscription):
+        if subscription.topic is None:
+            self._all.discard(subscription)
+            return
+        subs = self._by_topic.get(subscription.topic)
+        if subs is not None:
+            subs.discard(subscription)
+            if not subs:
+                del self._by_topic[subscription.topic]
+    
+    def _frame(self, item: _Item) -> bytes:
+        return b"id: %s-%d\ndata: %s\n\n" % (self.epoch.encode(), item[0], item[2])
+    
+    async def stream(self, topic: Optional[str] = None, last_event_id: Optional[str] = None,
+                     policy: Optional[str] = None) -> AsyncIterator[bytes]:
+        """
+        Generator body text/event-stream untuk satu subscriber
+        
+        Semua event yang tertunda dikirim sebagai satu chunk. Subscription
+        dilepas saat generator ditutup (klien disconnect).
+        
+        Raises:
+            ValueError: Jika policy tidak dikenal
+        """
+        subscription, reset = self.subscribe(topic, last_event_id, policy)
+        try:
+            # Komentar awal agar header response langsung terkirim ke klien
+            yield b": subscribed\n\n"
+            if reset:
+                yield _control("reset", {"reason": reset, "last_event_id": last_event_id})
+            if subscription.backlog:
+                backlog, subscription.backlog = subscription.backlog, []
+                subscription.delivered += len(backlog)
+                self.stats['delivered'] += len(backlog)
+                yield b"".join(self._frame(item) for item in backlog)
+            
+            while True:
+                if subscription.dropped:
+                    yield _control("dropped", {"count": subscription.dropped})
+                    self.stats['dropped'] += subscription.dropped
+                    subscription.dropped = 0
+                if subscription.buffer:
+                    pending = subscription.buffer
+                    subscription.buffer = deque()
+                    subscription.delivered += len(pending)
+                    self.stats['delivered'] += len(pending)
+                    yield b"".join(self._frame(item) for item in pending)
+                if subscription.closed_reason is not None:
+                    yield _control("disconnect", {"reason": subscription.closed_reason})
+                    return
+                if not await subscription.wait(self.heartbeat):
+                    yield b": keepalive\n\n"
+        finally:
+            self._remove(subscription)
+    
+    def close_all(self, reason: str = "shutdown"):
+        """Tutup semua subscriber (saat shutdown)"""
+        for subscription in list(self._all) + [
+            s for subs in self._by_topic.values() for s in subs
+        ]:
+            subscription.close(reason)
+    
+    def get_stats(self) -> Dict:
+        return {
+            'subscribers': self.subscriber_count,
+            'topics': len(self._by_topic),
+            'last_event_id': f"{self.epoch}-{self._seq}",
+            'replay_buffered': len(self._replay) if self._replay is not None else 0,
+            'buffer_size': self.buffer_size,
+            'policy': self.policy,
+            **self.stats
+        }
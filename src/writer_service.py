@@ -0,0 +1,51 @@
+"""
+Writer Service
+Proses tunggal pemilik dedup store pada mode multi-proses
+
+Menjalankan Runtime (dedup store, ingest log, consumer, compactor) dan
+IngestServer di Unix socket INGEST_SOCKET. Worker HTTP (INGEST_MODE=frontend)
+meneruskan event ke sini. Biasanya dijalankan oleh src.multiproc, tetapi
+bisa juga berdiri sendiri: python -m src.writer_service
+"""
+import asyncio
+import logging
+import signal
+
+from .config import Settings
+from .ingest_channel import IngestServer
+from .runtime import Runtime
+
+logger = logging.getLogger(__name__)
+
+
+async def serve(settings: Settings):
+    """Jalankan writer sampai menerima SIGTERM / SIGINT"""
+    runtime = Runtime(settings)
+    await runtime.start()
+    server = IngestServer(runtime, settings.resolved_ingest_socket())
+    await server.start()
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    logger.info("Writer service started")
+    
+    await stop.wait()
+    
+    logger.info("Writer service shutting down...")
+    await server.stop()
+    await runtime.stop()
+    logger.info("Writer service shut down")
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(serve(Settings.from_env()))
+
+
+if __name__ == "__main__":
+    main()
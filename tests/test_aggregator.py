@@ -5,7 +5,9 @@ Mencakup: deduplication, persistence, schema validation, consumer processing
 """
 import pytest
 import asyncio
+import json
 import os
+import sqlite3
 import tempfile
 from datetime import datetime
 from pathlib import Path
@@ -15,8 +17,23 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.dedup_store import DedupStore
-from src.consumer import EventConsumer
-from src.models import Event
+from src.async_store import AsyncDedupStore
+from src.dedup_cache import DedupCache
+from src.dedup_backend import DedupBackend, MemoryDedupBackend, MmapDedupBackend
+from src.sharded_store import ShardedDedupStore, HashRing, reshard
+from src.ingest_log import IngestLog
+from src.retention import Compactor, NdjsonArchive, RetentionPolicy, parse_topic_policies
+from src.consumer import EventConsumer, QueueFullError
+from src.models import Event, EventRecord
+from src.fast_ingest import validate_event
+from src.config import Settings
+from src.runtime import Runtime
+from src.ingest_channel import (
+    IngestClient, IngestServer, RemoteRuntime, decode_records, encode_records
+)
+from src.subscriptions import SubscriptionHub
+from src.aggregates import AggregateStore, WindowAggregator
+from src.archive import ArchiveReader, ColumnarArchive
 
 
 @pytest.fixture
@@ -130,6 +147,242 @@ class TestDedupStore:
         topic_b_events = dedup_store.get_events(topic='topic.b')
         assert len(topic_b_events) == 1
     
+    def test_store_events_batch(self, dedup_store, sample_event):
+        """Test: Group commit melaporkan event baru dan duplikat per item"""
+        dedup_store.store_event(sample_event)
+        
+        batch = [
+            sample_event,
+            dict(sample_event, event_id='evt-new'),
+            dict(sample_event, event_id='evt-new'),
+        ]
+        assert dedup_store.store_events(batch) == [False, True, False]
+        assert dedup_store.get_stats()['total_processed'] == 2
+    
+    def test_keyset_pagination(self, dedup_store):
+        """Test: Cursor pagination menelusuri semua event tanpa overlap"""
+        for i in range(7):
+            dedup_store.store_event({
+                'topic': 'page' if i % 2 == 0 else 'other',
+                'event_id': f'evt-{i}',
+                'timestamp': f'2025-10-22T10:30:0{i}Z',
+                'source': 'test',
+                'payload': {'i': i}
+            })
+        
+        seen = []
+        cursor = None
+        while True:
+            events, cursor = dedup_store.get_events_page(limit=3, cursor=cursor)
+            seen.extend(e['event_id'] for e in events)
+            if cursor is None:
+                break
+        assert seen == [f'evt-{i}' for i in reversed(range(7))]
+        
+        events, cursor = dedup_store.get_events_page(topic='page', limit=10)
+        assert [e['event_id'] for e in events] == ['evt-6', 'evt-4', 'evt-2', 'evt-0']
+        assert cursor is None
+        
+        events, _ = dedup_store.get_events_page(
+            since='2025-10-22T10:30:02Z', until='2025-10-22T10:30:05Z'
+        )
+        assert sorted(e['event_id'] for e in events) == ['evt-2', 'evt-3', 'evt-4']
+        
+        with pytest.raises(ValueError):
+            dedup_store.get_events_page(cursor='bukan-cursor')
+    
+    def test_time_range_mixed_offsets(self, dedup_store, sample_event):
+        """Test: Filter since/until membandingkan waktu UTC, bukan string ISO8601"""
+        timestamps = {
+            'utc': '2025-10-22T10:00:00Z',
+            'offset': '2025-10-22T17:00:00.500+07:00',
+            'fraction': '2025-10-22T10:00:00.999Z',
+            'later': '2025-10-22T10:00:01Z',
+        }
+        dedup_store.store_events([
+            dict(sample_event, event_id=name, timestamp=ts) for name, ts in timestamps.items()
+        ])
+        events, _ = dedup_store.get_events_page(
+            since='2025-10-22T10:00:00.5Z', until='2025-10-22T11:00:01+01:00'
+        )
+        assert sorted(e['event_id'] for e in events) == ['fraction', 'offset']
+        assert events[0]['timestamp'] in timestamps.values()
+        with pytest.raises(ValueError):
+            dedup_store.get_events_page(since='kemarin')
+    
+    def test_ndjson_export(self, dedup_store, sample_event):
+        """Test: Ekspor NDJSON berisi semua event dengan payload mentah"""
+        import json
+        for i in range(5):
+            dedup_store.store_event(dict(sample_event, event_id=f'evt-{i}'))
+        
+        chunks = list(dedup_store.iter_events_ndjson(batch_size=2))
+        assert len(chunks) == 3
+        
+        lines = b"".join(chunks).decode().splitlines()
+        events = [json.loads(line) for line in lines]
+        assert [e['event_id'] for e in events] == [f'evt-{i}' for i in range(5)]
+        assert events[0]['payload'] == sample_event['payload']
+    
+    def test_topic_stats_counters(self, temp_db, sample_event):
+        """Test: Counter per topic terjaga di transaksi write dan bertahan restart"""
+        store = DedupStore(temp_db)
+        store.store_events([sample_event, dict(sample_event, event_id='evt-2'), sample_event])
+        store.store_event(sample_event)
+        store.note_duplicates({sample_event['topic']: 1})
+        
+        entry = store.get_topic_stats()[0]
+        assert entry['topic'] == sample_event['topic']
+        assert entry['total'] == 2
+        assert entry['duplicates'] == 3
+        assert entry['first_seen'] is not None
+        assert store.get_stats() == {'total_processed': 2, 'topic_count': 1}
+        store.close()
+        
+        # Duplikat yang tertunda di-flush saat close, counter dimuat ulang saat startup
+        store = DedupStore(temp_db)
+        assert store.get_topic_stats()[0]['duplicates'] == 3
+        assert store.get_topics() == [sample_event['topic']]
+        store.close()
+    
+    def test_topic_stats_rebuilt_for_old_database(self, temp_db, sample_event):
+        """Test: Database lama tanpa topic_stats dibangun ulang saat startup"""
+        store = DedupStore(temp_db)
+        store.store_event(sample_event)
+        with store._writer() as conn:
+            conn.execute("DELETE FROM topic_stats")
+        store.close()
+        
+        store = DedupStore(temp_db)
+        assert store.get_stats()['total_processed'] == 1
+        store.close()
+    
+    def test_hashed_dedup_key_collision(self, temp_db, sample_event, monkeypatch):
+        """Test: Hash key yang bertabrakan diverifikasi ke arsip, bukan dianggap duplikat"""
+        monkeypatch.setattr('src.dedup_store.dedup_key', lambda topic, event_id: b'\x00' * 16)
+        store = DedupStore(temp_db, dedup_cache_size=0)
+        other = dict(sample_event, event_id='evt-other')
+        
+        assert store.store_events([sample_event, other, sample_event]) == [True, True, False]
+        assert store.store_event(other) is False
+        assert store.is_duplicate(sample_event['topic'], sample_event['event_id'])
+        assert store.is_duplicate(other['topic'], other['event_id'])
+        assert not store.is_duplicate(sample_event['topic'], 'evt-never-seen')
+        with store._reader() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM dedup_keys").fetchone()[0] == 1
+            assert conn.execute("SELECT COUNT(*) FROM dedup_collisions").fetchone()[0] == 1
+        store.close()
+    
+    def test_check_and_store_single_round_trip(self, temp_db, sample_event):
+        """Test: check_and_store mengklaim key dengan id arsip yang tepat, duplikat tanpa write"""
+        store = DedupStore(temp_db, dedup_cache_size=0)
+        events = [dict(sample_event, event_id=f'evt-{i}') for i in range(5)]
+        assert store.check_and_store_many(events + events[:2]) == [True] * 5 + [False] * 2
+        
+        changes = store._get_connection().total_changes
+        assert store.check_and_store(events[3]) is False
+        assert store._get_connection().total_changes == changes
+        
+        with store._reader() as conn:
+            rows = conn.execute("""
+                SELECT e.event_id FROM dedup_keys k JOIN processed_events e ON e.id = k.archive_id
+            """).fetchall()
+        assert sorted(r[0] for r in rows) == sorted(e['event_id'] for e in events)
+        assert store.get_topic_stats()[0]['duplicates'] == 3
+        store.close()
+    
+    def test_migrates_legacy_unique_schema(self, temp_db, sample_event):
+        """Test: Database lama dengan UNIQUE(topic, event_id) dimigrasi ke dedup_keys"""
+        conn = sqlite3.connect(temp_db)
+        conn.execute("""
+            CREATE TABLE processed_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT NOT NULL,
+                event_id TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                source TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                processed_at TEXT NOT NULL,
+                UNIQUE(topic, event_id)
+            )
+        """)
+        conn.execute("CREATE INDEX idx_topic_event_id ON processed_events(topic, event_id)")
+        conn.executemany(
+            "INSERT INTO processed_events (topic, event_id, timestamp, source, payload, processed_at)"
+            " VALUES (?, ?, ?, ?, '{}', '2024-01-01T00:00:00')",
+            [('test.topic', f'evt-{i}', sample_event['timestamp'], 'legacy') for i in range(3)]
+        )
+        conn.commit()
+        conn.close()
+        
+        store = DedupStore(temp_db)
+        assert store.get_stats()['total_processed'] == 3
+        assert store.is_duplicate_db('test.topic', 'evt-1')
+        assert store.store_event(dict(sample_event, event_id='evt-2')) is False
+        assert store.store_event(sample_event) is True
+        with store._reader() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+            indexes = {row[1] for row in conn.execute("PRAGMA index_list(processed_events)")}
+            assert 'idx_topic_event_id' not in indexes
+            assert conn.execute("SELECT MAX(id) FROM processed_events").fetchone()[0] == 4
+        store.close()
+    
+    def test_wal_connection_layer(self, dedup_store, sample_event):
+        """Test: Writer persisten berjalan di WAL mode, reader melihat hasil commit"""
+        writer = dedup_store._get_connection()
+        assert writer.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert dedup_store._get_connection() is writer
+        
+        dedup_store.store_event(sample_event)
+        with dedup_store._reader() as reader:
+            with pytest.raises(Exception):
+                reader.execute("DELETE FROM processed_events")
+        assert dedup_store.is_duplicate(sample_event['topic'], sample_event['event_id'])
+    
+    def test_front_cache(self, temp_db, sample_event):
+        """Test: Bloom filter melewati DB untuk key baru, LRU menolak duplikat panas"""
+        store = DedupStore(temp_db)
+        store.store_event(sample_event)
+        store.close()
+        
+        # Restart: cache di-warm dari processed_events
+        store = DedupStore(temp_db)
+        assert store.is_duplicate(sample_event['topic'], sample_event['event_id']) is True
+        assert store.is_duplicate(sample_event['topic'], 'evt-never-seen') is False
+        
+        stats = store.get_cache_stats()
+        assert stats['lru_hits'] == 1
+        assert stats['bloom_negatives'] == 1
+        assert stats['db_lookups'] == 0
+        store.close()
+    
+    def test_front_cache_grows_without_rescan(self, temp_db, sample_event, monkeypatch):
+        """Test: Bloom filter penuh menambah layer, bukan membaca ulang processed_events"""
+        store = DedupStore(temp_db)
+        store.cache = DedupCache(lru_size=1, min_capacity=16)
+        monkeypatch.setattr(store, "_warm_cache", lambda: pytest.fail("rescan on write path"))
+        events = [dict(sample_event, event_id=f'evt-{i}') for i in range(100)]
+        store.store_events(events)
+        
+        stats = store.get_cache_stats()
+        assert stats['bloom_layers'] > 1
+        assert stats['bloom_keys'] == 100
+        assert all(store.is_duplicate(e['topic'], e['event_id']) for e in events)
+        assert store.is_duplicate(sample_event['topic'], 'evt-never-seen') is False
+        store.close()
+    
+    def test_batch_counts_bloom_false_positives(self, dedup_store, sample_event):
+        """Test: Key UNKNOWN yang ternyata baru tercatat sebagai false positive di jalur batch"""
+        from src.dedup_cache import _key_bytes
+        dedup_store.cache.bloom.add(_key_bytes(sample_event['topic'], 'evt-fp'))
+        dedup_store.store_events([dict(sample_event, event_id='evt-fp'), sample_event])
+        dedup_store.store_events([sample_event])
+        
+        stats = dedup_store.get_cache_stats()
+        assert stats['db_lookups'] == 1
+        assert stats['bloom_false_positives'] == 1
+        assert stats['lru_hits'] == 1
+    
     def test_persistence(self, temp_db, sample_event):
         """Test: Data persisten setelah restart"""
         store1 = DedupStore(temp_db)
@@ -143,6 +396,780 @@ class TestDedupStore:
         store2.close()
 
 
+class TestAsyncDedupStore:
+    """Test suite untuk AsyncDedupStore (I/O di luar event loop)"""
+    
+    @pytest.mark.asyncio
+    async def test_async_api(self, dedup_store, sample_event):
+        """Test: API async menyimpan dan mendeteksi duplikat"""
+        store = AsyncDedupStore(dedup_store)
+        assert await store.store_events([sample_event, sample_event]) == [True, False]
+        assert await store.is_duplicate(sample_event['topic'], sample_event['event_id'])
+        assert len(await store.get_events()) == 1
+        assert await store.get_topics() == [sample_event['topic']]
+    
+    @pytest.mark.asyncio
+    async def test_mmap_lock_does_not_block_loop(self, tmp_path, sample_event):
+        """Test: Probe, stats, dan note_duplicates mmap tidak menunggu _lock di event loop"""
+        backend = MmapDedupBackend(str(tmp_path / "keys.mmap"))
+        store = AsyncDedupStore(backend)
+        backend._lock.acquire()  # seolah-olah writer sedang _grow
+        try:
+            store.note_duplicates({sample_event['topic']: 1})
+            pending = asyncio.gather(
+                store.query(sample_event['topic'], sample_event['event_id']),
+                store.collect_stats()
+            )
+            started = asyncio.get_running_loop().time()
+            await asyncio.sleep(0.05)
+            assert asyncio.get_running_loop().time() - started < 0.5
+            assert not pending.done()
+        finally:
+            backend._lock.release()
+        duplicate, stats = await pending
+        assert duplicate is False
+        assert stats['dedup_backend']['backend'] == 'mmap'
+        store.close()
+    
+    @pytest.mark.asyncio
+    async def test_writes_run_on_writer_thread(self, dedup_store, sample_event):
+        """Test: Write dijalankan di thread writer, bukan di thread event loop"""
+        import threading
+        store = AsyncDedupStore(dedup_store)
+        seen = []
+        original = dedup_store.store_event
+        
+        def recording_store_event(event):
+            seen.append(threading.current_thread().name)
+            return original(event)
+        
+        dedup_store.store_event = recording_store_event
+        assert await store.store_event(sample_event) is True
+        assert seen[0].startswith('dedup-writer')
+        assert seen[0] != threading.current_thread().name
+
+
+class TestDedupBackend:
+    """Test suite untuk backend dedup pluggable (sqlite, memory, mmap)"""
+    
+    @pytest.fixture(params=["sqlite", "memory", "mmap"])
+    def backend(self, request, tmp_path):
+        if request.param == "sqlite":
+            store = DedupStore(str(tmp_path / "dedup.db"))
+        elif request.param == "memory":
+            store = MemoryDedupBackend()
+        else:
+            store = MmapDedupBackend(str(tmp_path / "keys.mmap"), initial_capacity=16)
+        yield store
+        store.close()
+    
+    def test_check_and_mark_contract(self, backend, sample_event):
+        """Test: Semua backend memenuhi kontrak DedupBackend yang sama"""
+        assert isinstance(backend, DedupBackend)
+        other = dict(sample_event, event_id='evt-other')
+        assert not backend.query(sample_event['topic'], sample_event['event_id'])
+        assert backend.check_and_mark(sample_event) is True
+        assert backend.check_and_mark(sample_event) is False
+        assert backend.check_and_mark_many([other, other, sample_event]) == [True, False, False]
+        assert backend.query(other['topic'], other['event_id'])
+        assert backend.stats()['total_processed'] == 2
+    
+    def test_mmap_grows_and_persists(self, tmp_path, sample_event):
+        """Test: Hash table mmap tumbuh melewati kapasitas awal dan tahan reopen"""
+        path = str(tmp_path / "keys.mmap")
+        backend = MmapDedupBackend(path, initial_capacity=16)
+        events = [dict(sample_event, event_id=f'evt-{i}') for i in range(500)]
+        assert all(backend.check_and_mark_many(events))
+        assert backend.stats()['capacity'] >= 1024
+        backend.close()
+        
+        reopened = MmapDedupBackend(path, initial_capacity=16)
+        assert len(reopened) == 500
+        assert not any(reopened.check_and_mark_many(events))
+        assert reopened.get_topic_stats()[0]['total'] == 500
+        reopened.close()
+    
+    def test_mmap_topic_stats_survive_crash(self, tmp_path, sample_event):
+        """Test: Counter topic mmap tersimpan berkala tanpa menunggu close"""
+        path = str(tmp_path / "keys.mmap")
+        backend = MmapDedupBackend(path, stats_interval=0)
+        assert backend.blocking_io is True
+        backend.check_and_mark_many([dict(sample_event, event_id=f'evt-{i}') for i in range(3)])
+        
+        # "Crash": backend lama tidak pernah di-close
+        recovered = MmapDedupBackend(path)
+        assert recovered.get_topic_stats()[0]['total'] == 3
+        recovered.close()
+    
+    @pytest.mark.asyncio
+    async def test_consumer_with_memory_backend(self, sample_event):
+        """Test: EventConsumer berjalan di atas backend non-SQLite"""
+        consumer = EventConsumer(MemoryDedupBackend(), batch_size=10, batch_timeout=0.01)
+        consumer_task = asyncio.create_task(consumer.start())
+        await consumer.enqueue(sample_event)
+        await consumer.enqueue(sample_event)
+        await asyncio.sleep(0.3)
+        consumer.stop()
+        await consumer_task
+        
+        stats = consumer.get_stats()
+        assert stats['unique_processed'] == 1
+        assert stats['duplicate_dropped'] == 1
+        assert stats['dedup_backend']['backend'] == 'memory'
+
+
+class TestIngestChannel:
+    """Test kanal ingest mode multi-proses (frontend -> writer)"""
+    
+    @pytest.mark.asyncio
+    async def test_export_cancel_waits_for_running_chunk(self, tmp_path):
+        """Test: Ekspor yang dibatalkan menunggu next() di thread sebelum generator ditutup"""
+        import threading
+        import time as time_module
+        closed = threading.Event()
+        
+        def rows():
+            try:
+                yield b'{"n":0}\n'
+                time_module.sleep(0.2)
+                yield b'{"n":1}\n'
+            finally:
+                closed.set()
+        
+        class FakeRuntime:
+            def iter_events_ndjson(self, topic=None, batch_size=1000):
+                return rows()
+        
+        server = IngestServer(FakeRuntime(), str(tmp_path / 'writer.sock'))
+        export = server._export()
+        assert await export.__anext__() == b'{"n":0}\n'
+        task = asyncio.ensure_future(export.__anext__())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert closed.is_set()
+    
+    @pytest.mark.asyncio
+    async def test_stale_read_loop_keeps_new_connection(self, tmp_path):
+        """Test: Reader koneksi lama yang selesai tidak menghapus writer/pending koneksi baru"""
+        loop = asyncio.get_running_loop()
+        client = IngestClient(str(tmp_path / 'writer.sock'))
+        old_reader = asyncio.StreamReader()
+        old_reader.feed_eof()
+        old_future, new_future = loop.create_future(), loop.create_future()
+        live_writer = object()
+        client._writer, client._pending = live_writer, {2: new_future}
+        
+        await client._read_loop(old_reader, object(), {1: old_future})
+        assert client._writer is live_writer
+        assert client._pending == {2: new_future} and not new_future.done()
+        with pytest.raises(ConnectionError):
+            old_future.result()
+    
+    def test_record_encoding_round_trip(self):
+        """Test: Encoding biner mempertahankan field dan payload_json apa adanya"""
+        records = [
+            EventRecord('topic.ü', 'evt-1', '2024-01-01T00:00:00Z', 'src', b'{"b":2, "a":1}'),
+            EventRecord('t', '', 'ts', 's', b'{}'),
+        ]
+        decoded = decode_records(encode_records(records))
+        assert [r.to_json() for r in decoded] == [r.to_json() for r in records]
+        with pytest.raises(ValueError):
+            decode_records(encode_records(records)[:-3])
+    
+    @pytest.mark.asyncio
+    async def test_frontends_share_one_writer(self, tmp_path, sample_event):
+        """Test: Dua frontend ke satu writer; dedup dan stats digabung di writer"""
+        settings = Settings(
+            db_path=str(tmp_path / "dedup.db"), batch_size=10, batch_timeout_ms=5,
+            ingest_socket=str(tmp_path / "ingest.sock")
+        )
+        runtime = Runtime(settings)
+        await runtime.start()
+        server = IngestServer(runtime, settings.resolved_ingest_socket())
+        await server.start()
+        frontends = [RemoteRuntime(settings), RemoteRuntime(settings)]
+        for frontend in frontends:
+            await frontend.start()
+        
+        try:
+            record = EventRecord.from_dict(sample_event)
+            other = EventRecord.from_dict(dict(sample_event, event_id='evt-other'))
+            await frontends[0].consumer.enqueue(record)
+            await frontends[1].consumer.enqueue(record)
+            assert await frontends[1].consumer.enqueue_many([other, other]) == (1, 1)
+            await asyncio.sleep(0.3)
+            
+            stats = await frontends[0].collect_stats()
+            assert stats['received'] == 4
+            assert stats['unique_processed'] == 2
+            assert stats['duplicate_dropped'] == 2
+            assert [p['role'] for p in stats['processes']] == ['writer', 'frontend']
+            assert stats['processes'][1]['events'] == 4
+            
+            events, _ = await frontends[1].consumer.get_events_page(topic=sample_event['topic'])
+            assert len(events) == 2
+            chunks = [chunk async for chunk in frontends[0].iter_events_ndjson()]
+            assert len(b"".join(chunks).splitlines()) == 2
+            assert "aggregator_store_seconds" in await frontends[1].render_metrics()
+        finally:
+            for frontend in frontends:
+                await frontend.stop()
+            await server.stop()
+            await runtime.stop()
+
+
+class TestSubscriptionHub:
+    """Test fan-out event ke subscriber /subscribe"""
+    
+    @staticmethod
+    async def _read(stream, count):
+        """Ambil count chunk berikutnya dari generator SSE"""
+        return [await stream.__anext__() for _ in range(count)]
+    
+    @pytest.mark.asyncio
+    async def test_consumer_pushes_unique_events_and_resume(self, dedup_store, sample_event):
+        """Test: Hanya event unik di topic yang di-subscribe yang dikirim; resume dari id"""
+        hub = SubscriptionHub(heartbeat=0.05)
+        consumer = EventConsumer(dedup_store, batch_size=10, batch_timeout=0.01, hub=hub)
+        stream = hub.stream(topic=sample_event['topic'])
+        assert await self._read(stream, 1) == [b": subscribed\n\n"]
+        
+        consumer_task = asyncio.create_task(consumer.start())
+        await consumer.enqueue(sample_event)
+        await consumer.enqueue(sample_event)
+        await consumer.enqueue(dict(sample_event, topic='other.topic'))
+        await consumer.enqueue(dict(sample_event, event_id='evt-2'))
+        await asyncio.sleep(0.3)
+        consumer.stop()
+        await consumer_task
+        
+        chunks = ""
+        while chunks.count("id: ") < 2:
+            chunks += (await stream.__anext__()).decode()
+        messages = [m for m in chunks.split("\n\n") if m.startswith("id:")]
+        assert len(messages) == 2
+        assert '"event_id":"evt-2"' in messages[-1]
+        await stream.aclose()
+        assert hub.subscriber_count == 0
+        
+        first_id = messages[0].split("\n")[0][len("id: "):]
+        resumed = hub.stream(topic=sample_event['topic'], last_event_id=first_id)
+        _, backlog = await self._read(resumed, 2)
+        assert backlog.count(b"id: ") == 1 and b'"event_id":"evt-2"' in backlog
+        await resumed.aclose()
+        
+        stale = hub.stream(last_event_id="0-1")
+        _, reset = await self._read(stale, 2)
+        assert reset.startswith(b"event: reset")
+        await stale.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_slow_consumer_policies(self, sample_event):
+        """Test: Buffer penuh membuang event terlama (drop) atau memutus subscriber"""
+        hub = SubscriptionHub(buffer_size=2, replay_size=0, heartbeat=0.05)
+        dropping = hub.stream(policy="drop")
+        closing = hub.stream(policy="disconnect")
+        await self._read(dropping, 1)
+        await self._read(closing, 1)
+        
+        hub.publish_many([dict(sample_event, event_id=f'evt-{i}') for i in range(5)])
+        assert hub.subscriber_count == 1
+        assert hub.stats['disconnected_slow'] == 1
+        
+        dropped, delivered = await self._read(dropping, 2)
+        assert dropped.startswith(b"event: dropped") and b'"count": 3' in dropped
+        assert delivered.count(b"id: ") == 2 and b'"evt-4"' in delivered
+        _, disconnect = await self._read(closing, 2)
+        assert disconnect.startswith(b"event: disconnect")
+        await dropping.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_replay_serializes_lazily(self, sample_event, monkeypatch):
+        """Test: Tanpa subscriber, ring buffer tidak men-serialisasi event sampai ada resume"""
+        hub = SubscriptionHub(heartbeat=0.05)
+        calls = []
+        to_json = EventRecord.to_json
+        monkeypatch.setattr(EventRecord, "to_json", lambda self: calls.append(1) or to_json(self))
+        
+        hub.publish_many([dict(sample_event, event_id=f'evt-{i}') for i in range(3)])
+        assert calls == []
+        
+        resumed = hub.stream(last_event_id=f"{hub.epoch}-1")
+        _, backlog = await self._read(resumed, 2)
+        assert backlog.count(b"id: ") == 2 and b'"evt-2"' in backlog
+        assert len(calls) == 2
+        await resumed.aclose()
+
+
+class TestWindowAggregator:
+    """Test agregasi window per (topic, source)"""
+    
+    @pytest.mark.asyncio
+    async def test_panes_persist_and_reload(self, tmp_path, sample_event):
+        """Test: Pane di-flush ke SQLite dan dimuat ulang; event terlalu lama dibuang"""
+        path = str(tmp_path / "aggregates.db")
+        aggregator = WindowAggregator(AggregateStore(path), pane_seconds=60, retention_seconds=600)
+        aggregator.add_many([
+            dict(sample_event, event_id=f'evt-{i}', timestamp=f'2025-10-22T10:{i:02d}:00Z',
+                 payload={'amount': 1.5, 'ok': True})
+            for i in range(10)
+        ])
+        aggregator.add_many([dict(sample_event, timestamp='2025-10-22T09:00:00Z')])
+        assert aggregator.get_stats()['late_dropped'] == 1
+        await aggregator.flush()
+        aggregator.close()
+        
+        reloaded = WindowAggregator(AggregateStore(path), pane_seconds=60, retention_seconds=600)
+        result = reloaded.query(600, topic=sample_event['topic'])
+        window = result['series'][0]['windows'][-1]
+        assert window['count'] == 10
+        assert window['fields'] == {'amount': {'count': 10, 'sum': 15.0, 'avg': 1.5}}
+        with pytest.raises(ValueError):
+            reloaded.query(600, slide=900)
+        reloaded.close()
+    
+    @pytest.mark.asyncio
+    async def test_future_timestamp_does_not_poison_horizon(self, tmp_path, sample_event):
+        """Test: Event tahun 2099 dibuang dan tidak membuat event normal late_dropped"""
+        path = str(tmp_path / "aggregates.db")
+        # Pane masa depan yang sempat tersimpan sebelum ada batas skew
+        AggregateStore(path).save(60, [('test.topic', 'svc', 4102444800, 1, '{}')])
+        aggregator = WindowAggregator(AggregateStore(path), pane_seconds=60, retention_seconds=600)
+        now = datetime.utcnow().isoformat() + 'Z'
+        aggregator.add_many([
+            dict(sample_event, event_id='evt-future', timestamp='2099-01-01T00:00:00Z'),
+            dict(sample_event, event_id='evt-now', timestamp=now),
+        ])
+        stats = aggregator.get_stats()
+        assert stats['future_dropped'] == 1
+        assert stats['late_dropped'] == 0
+        assert aggregator.query(60, topic=sample_event['topic'])['series'][0]['windows'][-1]['count'] == 1
+        aggregator.close()
+
+
+class TestShardedDedupStore:
+    """Test suite untuk dedup store yang dibagi ke beberapa file SQLite"""
+    
+    def test_routing_is_stable(self):
+        """Test: Key yang sama selalu dirutekan ke shard yang sama"""
+        ring = HashRing(4)
+        shards = {ring.shard_for('topic', f'evt-{i}') for i in range(200)}
+        assert shards == {0, 1, 2, 3}
+        assert ring.shard_for('topic', 'evt-7') == HashRing(4).shard_for('topic', 'evt-7')
+    
+    def test_dedup_and_merged_pagination(self, tmp_path, sample_event):
+        """Test: Dedup berlaku lintas shard dan pagination mencakup semua shard"""
+        store = ShardedDedupStore(str(tmp_path / 'shards'), 3)
+        events = [dict(sample_event, event_id=f'evt-{i}') for i in range(10)]
+        assert store.store_events(events) == [True] * 10
+        assert store.store_events(events[:2]) == [False, False]
+        assert store.is_duplicate('test.topic', 'evt-5')
+        assert store.get_stats()['total_processed'] == 10
+        
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = store.get_events_page(limit=4, cursor=cursor)
+            seen.extend(e['event_id'] for e in page)
+            if cursor is None:
+                break
+        assert sorted(seen) == sorted(e['event_id'] for e in events)
+        store.close()
+    
+    def test_reshard_preserves_events(self, tmp_path, dedup_store, sample_event):
+        """Test: Reshard memindahkan semua event dan ringkasan topic"""
+        for i in range(20):
+            dedup_store.store_event(dict(sample_event, event_id=f'evt-{i}'))
+        dedup_store.note_duplicates({'test.topic': 3})
+        dedup_store.close()
+        
+        summary = reshard(dedup_store.db_path, str(tmp_path / 'shards'), 4)
+        assert summary['total'] == 20
+        
+        store = ShardedDedupStore(str(tmp_path / 'shards'), 4)
+        assert store.is_duplicate('test.topic', 'evt-13')
+        topic_stats = store.get_topic_stats()
+        assert topic_stats[0]['total'] == 20
+        assert topic_stats[0]['duplicates'] == 3
+        store.close()
+
+
+class TestPayloadCompression:
+    """Test kompresi payload (zlib / zlib-dict) di DedupStore"""
+    
+    @staticmethod
+    def _log_event(i, topic='logs'):
+        return {
+            'topic': topic,
+            'event_id': f'log-{i}',
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'source': 'api',
+            'payload': {'level': 'INFO', 'service': 'checkout', 'user': i,
+                        'message': f'user {i} completed checkout in {i % 97} ms'}
+        }
+    
+    def test_compressed_and_legacy_rows_coexist(self, temp_db, sample_event):
+        """Test: Baris plain lama dan baris terkompresi dibaca lazily, dictionary bertahan restart"""
+        legacy = DedupStore(temp_db)
+        legacy.store_event(self._log_event(0))
+        legacy.close()
+        
+        store = DedupStore(temp_db, payload_compression='zlib-dict',
+                           compression_min_bytes=64, dict_samples=10)
+        store.store_events([self._log_event(i) for i in range(1, 40)])
+        store.store_event(sample_event)
+        stats = store.stats()['payload_compression']
+        assert stats['dicts'] == 1
+        assert stats['rows_compressed'] == 39
+        
+        with store._reader() as conn:
+            kinds = dict(conn.execute(
+                "SELECT event_id, typeof(payload) FROM processed_events"
+            ).fetchall())
+        assert kinds['log-0'] == 'text'
+        assert kinds['log-39'] == 'blob'
+        assert kinds[sample_event['event_id']] == 'text'
+        assert stats['rows_decompressed'] == 0
+        store.close()
+        
+        reopened = DedupStore(temp_db, payload_compression='off')
+        events = {e['event_id']: e for e in reopened.get_events(limit=100)}
+        assert events['log-0']['payload'] == self._log_event(0)['payload']
+        assert events['log-39']['payload'] == self._log_event(39)['payload']
+        exported = [json.loads(line) for line in b''.join(reopened.iter_events_ndjson()).splitlines()]
+        assert [e['payload'] for e in exported[:40]] == [
+            self._log_event(i)['payload'] for i in range(40)
+        ]
+        reopened.close()
+    
+    def test_reshard_decodes_payloads(self, tmp_path, temp_db):
+        """Test: Reshard menyalin payload terkompresi sebagai JSON"""
+        store = DedupStore(temp_db, payload_compression='zlib-dict',
+                           compression_min_bytes=64, dict_samples=5)
+        store.store_events([self._log_event(i) for i in range(20)])
+        store.close()
+        
+        reshard(temp_db, str(tmp_path / 'shards'), 2)
+        sharded = ShardedDedupStore(str(tmp_path / 'shards'), 2)
+        payloads = {e['event_id']: e['payload'] for e in sharded.get_events(limit=100)}
+        assert payloads['log-17'] == self._log_event(17)['payload']
+        sharded.close()
+    
+    def test_decode_counter_thread_safe(self):
+        """Test: rows_decompressed tepat saat decode dipanggil dari banyak thread reader"""
+        from concurrent.futures import ThreadPoolExecutor
+        from src.payload_codec import PayloadCodec
+        codec = PayloadCodec('zlib', min_bytes=16)
+        value = codec.encode('logs', json.dumps(self._log_event(1)['payload']))
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: [codec.decode(value) for _ in range(500)], range(8)))
+        assert codec.get_stats()['rows_decompressed'] == 4000
+
+
+class TestRetention:
+    """Test suite untuk retensi payload/key dan compaction"""
+    
+    @staticmethod
+    def _age_events(store, event_ids, processed_at='2000-01-01T00:00:00'):
+        """Mundurkan processed_at agar event dianggap lama"""
+        with store._writer() as conn:
+            conn.executemany(
+                "UPDATE processed_events SET processed_at = ? WHERE event_id = ?",
+                [(processed_at, event_id) for event_id in event_ids]
+            )
+    
+    def test_parse_topic_policies(self):
+        """Test: Format kebijakan per topic"""
+        policies = parse_topic_policies("audit=86400:604800, debug=60")
+        assert policies['audit'] == RetentionPolicy(86400, 604800)
+        assert policies['debug'] == RetentionPolicy(60, 0)
+        with pytest.raises(ValueError):
+            parse_topic_policies("audit")
+    
+    def test_compact_payloads_keeps_keys(self, dedup_store, sample_event):
+        """Test: Payload lama dibuang tetapi key dedup tetap ada"""
+        for i in range(5):
+            dedup_store.store_event(dict(sample_event, event_id=f'evt-{i}'))
+        self._age_events(dedup_store, ['evt-0', 'evt-1', 'evt-2'])
+        
+        archived = []
+        cutoff = datetime.utcnow().isoformat()[:10]
+        assert dedup_store.compact_payloads('test.topic', cutoff, 2, archived.extend) == 2
+        assert dedup_store.compact_payloads('test.topic', cutoff, 2, archived.extend) == 1
+        assert dedup_store.compact_payloads('test.topic', cutoff) == 0
+        assert [row[1] for row in archived] == ['evt-0', 'evt-1', 'evt-2']
+        
+        payloads = {e['event_id']: e['payload'] for e in dedup_store.get_events(limit=10)}
+        assert payloads['evt-0'] is None
+        assert payloads['evt-4'] == sample_event['payload']
+        assert dedup_store.is_duplicate('test.topic', 'evt-0')
+    
+    def test_archive_runs_outside_writer_lock(self, dedup_store, sample_event):
+        """Test: Callback archive dipanggil tanpa memegang lock writer"""
+        import threading
+        dedup_store.store_event(sample_event)
+        self._age_events(dedup_store, [sample_event['event_id']])
+        
+        writer_free = []
+        
+        def probe():
+            acquired = dedup_store._write_lock.acquire(timeout=1)
+            if acquired:
+                dedup_store._write_lock.release()
+            writer_free.append(acquired)
+        
+        def archive(rows):
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+        
+        cutoff = datetime.utcnow().isoformat()[:10]
+        assert dedup_store.compact_payloads('test.topic', cutoff, archive=archive) == 1
+        assert writer_free == [True]
+    
+    def test_skipped_chunk_discards_segment(self, tmp_path, dedup_store, sample_event):
+        """Test: Chunk yang dilewati karena mark berpindah tidak meninggalkan segment"""
+        from src.archive import ColumnarArchive
+        from src.dedup_store import _SQL_UPSERT_RETENTION_MARK
+        dedup_store.store_event(sample_event)
+        self._age_events(dedup_store, [sample_event['event_id']])
+        
+        columnar = ColumnarArchive(str(tmp_path / "archive"))
+        
+        class MovingMark:
+            discard = staticmethod(columnar.discard)
+            
+            def __call__(self, rows):
+                path = columnar(rows)
+                with dedup_store._writer() as conn:
+                    conn.execute(_SQL_UPSERT_RETENTION_MARK, ('test.topic', 99))
+                return path
+        
+        cutoff = datetime.utcnow().isoformat()[:10]
+        assert dedup_store.compact_payloads('test.topic', cutoff, archive=MovingMark()) == 0
+        assert list((tmp_path / "archive").iterdir()) == []
+        assert columnar.get_stats()['rows_archived'] == 0
+    
+    def test_expire_keys_allows_redelivery(self, dedup_store, sample_event):
+        """Test: Setelah key kedaluwarsa, event yang sama diterima lagi"""
+        dedup_store.store_event(sample_event)
+        dedup_store.store_event(dict(sample_event, event_id='evt-new'))
+        self._age_events(dedup_store, [sample_event['event_id']])
+        
+        assert dedup_store.expire_keys('test.topic', datetime.utcnow().isoformat()[:10]) == 1
+        assert not dedup_store.is_duplicate('test.topic', sample_event['event_id'])
+        assert dedup_store.is_duplicate('test.topic', 'evt-new')
+        assert dedup_store.store_event(sample_event)
+    
+    @pytest.mark.asyncio
+    async def test_compactor_run_once(self, tmp_path, dedup_store, sample_event):
+        """Test: Compactor menerapkan kebijakan per topic dan mengarsipkan payload"""
+        dedup_store.store_event(sample_event)
+        dedup_store.store_event(dict(sample_event, topic='audit', event_id='audit-1'))
+        self._age_events(dedup_store, [sample_event['event_id'], 'audit-1'])
+        
+        compactor = Compactor(
+            dedup_store,
+            RetentionPolicy(key_seconds=3600),
+            {'audit': RetentionPolicy(payload_seconds=3600)},
+            chunk_pause=0,
+            archive=NdjsonArchive(str(tmp_path / 'archive'))
+        )
+        result = await compactor.run_once()
+        
+        assert result == {'keys_expired': 1, 'payloads_compacted': 1}
+        assert dedup_store.is_duplicate('audit', 'audit-1')
+        assert not dedup_store.is_duplicate('test.topic', sample_event['event_id'])
+        archive_files = list((tmp_path / 'archive').glob('*.ndjson'))
+        assert len(archive_files) == 1
+        assert 'audit-1' in archive_files[0].read_text()
+
+
+class TestColumnarArchive:
+    """Test segment arsip kolumnar dan scan dengan pruning"""
+    
+    @staticmethod
+    def _row(topic, i, timestamp, payload):
+        return (topic, f'{topic}-{i}', timestamp, 'svc', json.dumps(payload), f'2025-01-01T00:00:0{i}')
+    
+    def test_typed_columns_roundtrip(self, tmp_path):
+        """Test: Field payload disimpan sebagai kolom bertipe dan payload utuh bisa disusun ulang"""
+        payloads = [
+            {'status': 200, 'latency': 12.0, 'ok': True, 'path': '/a'},
+            {'status': 500, 'latency': 7.5, 'ok': False, 'path': '/b', 'trace': {'id': 1}},
+            {'status': 404, 'path': '/c'},
+            [1, 2, 3],
+        ]
+        archive = ColumnarArchive(str(tmp_path / 'segments'), max_fields=4)
+        archive([self._row('web', i, f'2025-01-01T00:00:0{i}Z', p) for i, p in enumerate(payloads)])
+        
+        segment = ArchiveReader(str(tmp_path / 'segments')).segments()[0]
+        types = {c['name']: c['type'] for c in segment.meta['columns']}
+        assert types['payload.status'] == 'int'
+        assert types['payload.latency'] == 'float'
+        assert types['payload.ok'] == 'bool'
+        assert types['payload.path'] == 'str'
+        assert segment.meta['topics'] == {'web': 4}
+        
+        batch = next(ArchiveReader(str(tmp_path / 'segments')).scan(
+            ['event_id', 'payload', 'payload.latency', 'payload.trace']
+        ))
+        assert batch['payload'] == payloads
+        assert batch['payload.latency'] == [12.0, 7.5, None, None]
+        assert batch['payload.trace'] == [None, {'id': 1}, None, None]
+        assert archive.get_stats()['rows_archived'] == 4
+    
+    def test_mixed_int_float_column_exact(self, tmp_path):
+        """Test: Field campuran int/float terbaca ulang dengan tipe aslinya"""
+        payloads = [{'v': 5}, {'v': 2.5}, {'v': 1 << 60}]
+        archive = ColumnarArchive(str(tmp_path / 'segments'))
+        archive([self._row('web', i, f'2025-01-01T00:00:0{i}Z', p) for i, p in enumerate(payloads)])
+        
+        batch = next(ArchiveReader(str(tmp_path / 'segments')).scan(['payload', 'payload.v']))
+        assert batch['payload'] == payloads
+        assert [type(v) for v in batch['payload.v']] == [int, float, int]
+        assert batch['payload.v'] == [5, 2.5, 1 << 60]
+    
+    def test_scan_prunes_segments(self, tmp_path, dedup_store, sample_event):
+        """Test: Segment di luar topic/rentang waktu dilewati tanpa dibaca"""
+        archive = ColumnarArchive(str(tmp_path / 'segments'))
+        for i in range(4):
+            dedup_store.store_event(dict(
+                sample_event, event_id=f'evt-{i}', timestamp=f'2025-01-0{i + 1}T00:00:00Z',
+                payload={'n': i}
+            ))
+        TestRetention._age_events(dedup_store, [f'evt-{i}' for i in range(4)])
+        cutoff = datetime.utcnow().isoformat()[:10]
+        assert dedup_store.compact_payloads('test.topic', cutoff, 2, archive) == 2
+        assert dedup_store.compact_payloads('test.topic', cutoff, 2, archive) == 2
+        archive([self._row('other', 1, '2025-01-02T00:00:00Z', {'n': 9})])
+        
+        reader = ArchiveReader(str(tmp_path / 'segments'))
+        result = reader.scan_columns(['event_id', 'payload.n'], topic='test.topic',
+                                     since='2025-01-02', until='2025-01-04')
+        assert result['segments'] == {'total': 3, 'scanned': 2, 'pruned': 1}
+        assert result['columns'] == {'event_id': ['evt-1', 'evt-2'], 'payload.n': [1, 2]}
+        
+        result = reader.scan_columns(['event_id'], since='2025-01-03')
+        assert result['segments']['pruned'] == 2
+        assert result['columns']['event_id'] == ['evt-2', 'evt-3']
+        with pytest.raises(ValueError):
+            reader.scan_columns(['bukan_kolom'])
+        
+        # Offset dan pecahan detik: 07:00+07:00 = 00:00Z, jadi 2025-01-01 ikut
+        result = reader.scan_columns(['event_id'], topic='test.topic',
+                                     since='2025-01-01T07:00:00+07:00', until='2025-01-01T00:00:00.5Z')
+        assert result['columns']['event_id'] == ['evt-0']
+
+
+class TestIngestLog:
+    """Test suite untuk write-ahead ingest log"""
+    
+    @pytest.mark.asyncio
+    async def test_replay_uncommitted(self, tmp_path, sample_event):
+        """Test: Entri yang belum committed di-replay setelah restart"""
+        log = IngestLog(str(tmp_path / 'wal'))
+        assert log.open() == []
+        offsets = await log.append([dict(sample_event, event_id=f'evt-{i}') for i in range(3)])
+        assert offsets == [0, 1, 2]
+        
+        # Commit tidak berurutan: offset 0 dan 2 selesai, offset 1 belum
+        log.commit(2)
+        log.commit(0)
+        assert log.committed_offset == 0
+        log.close()
+        
+        log = IngestLog(str(tmp_path / 'wal'))
+        replay = log.open()
+        assert [offset for offset, _ in replay] == [1, 2]
+        assert replay[0][1]['event_id'] == 'evt-1'
+        assert (await log.append([sample_event])) == [3]
+        log.close()
+    
+    @pytest.mark.asyncio
+    async def test_segment_rotation_and_cleanup(self, tmp_path, sample_event):
+        """Test: Segment dirotasi dan segment yang sudah committed dihapus"""
+        log = IngestLog(str(tmp_path / 'wal'), segment_bytes=200, sync_interval=0)
+        log.open()
+        for i in range(5):
+            await log.append([dict(sample_event, event_id=f'evt-{i}')])
+        assert log.get_stats()['segments'] > 1
+        
+        for offset in range(5):
+            log.commit(offset)
+        log.checkpoint()
+        assert log.get_stats()['segments'] == 1
+        log.close()
+    
+    @pytest.mark.asyncio
+    async def test_consumer_replay_after_crash(self, tmp_path, dedup_store, sample_event):
+        """Test: Event yang sudah di-accept tapi belum diproses tidak hilang"""
+        log = IngestLog(str(tmp_path / 'wal'))
+        log.open()
+        consumer = EventConsumer(dedup_store, ingest_log=log)
+        await consumer.enqueue(sample_event)
+        await consumer.enqueue(dict(sample_event, event_id='evt-2'))
+        # "Crash": consumer tidak pernah jalan
+        log.close()
+        
+        log = IngestLog(str(tmp_path / 'wal'))
+        consumer = EventConsumer(dedup_store, ingest_log=log)
+        await consumer.replay(log.open())
+        consumer_task = asyncio.create_task(consumer.start())
+        await asyncio.sleep(0.3)
+        consumer.stop()
+        await consumer_task
+        log.close()
+        
+        assert consumer.stats['replayed'] == 2
+        assert consumer.stats['unique_processed'] == 2
+        assert IngestLog(str(tmp_path / 'wal')).open() == []
+    
+    @pytest.mark.asyncio
+    async def test_failed_batch_dead_lettered_and_checkpointed(self, tmp_path, sample_event):
+        """Test: Batch gagal di-dead-letter, offset tetap committed, checkpoint maju saat idle"""
+        class FailingStore(MemoryDedupBackend):
+            def check_and_mark_many(self, events):
+                raise RuntimeError("disk penuh")
+        
+        log = IngestLog(str(tmp_path / 'wal'), checkpoint_interval=0.05)
+        log.open()
+        consumer = EventConsumer(FailingStore(), batch_size=10, ingest_log=log)
+        checkpoint_task = asyncio.create_task(log.run())
+        consumer_task = asyncio.create_task(consumer.start())
+        await consumer.enqueue_many([dict(sample_event, event_id=f'evt-{i}') for i in range(3)])
+        await asyncio.sleep(0.3)
+        consumer.stop()
+        await consumer_task
+        
+        assert log.committed_offset == 2
+        assert log.get_stats()['dead_lettered'] == 3
+        assert (tmp_path / 'wal' / 'checkpoint').read_text() == '2'
+        lines = (tmp_path / 'wal' / 'dead_letter.ndjson').read_text().splitlines()
+        assert json.loads(lines[0])['error'] == 'disk penuh'
+        log.stop()
+        await checkpoint_task
+        await log.aclose()
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_enqueue_respects_queue_limit(self, tmp_path, dedup_store, sample_event):
+        """Test: Publish yang datang selama fsync IngestLog tidak melewati max_queue_size"""
+        log = IngestLog(str(tmp_path / 'wal'))
+        log.open()
+        consumer = EventConsumer(dedup_store, ingest_log=log, max_queue_size=2)
+        results = await asyncio.gather(
+            *(consumer.enqueue(dict(sample_event, event_id=f'evt-{i}')) for i in range(4)),
+            return_exceptions=True
+        )
+        log.close()
+        
+        assert sum(isinstance(r, QueueFullError) for r in results) == 2
+        assert consumer.queue_depth() == 2
+        assert consumer._reserved == 0
+
+
 class TestEventConsumer:
     """Test suite untuk EventConsumer (5 tests)"""
     
@@ -160,6 +1187,29 @@ class TestEventConsumer:
         assert consumer.stats['received'] == 1
         assert consumer.queue.qsize() == 1
     
+    @pytest.mark.asyncio
+    async def test_queue_holds_compact_records(self, consumer, dedup_store, sample_event):
+        """Test: Queue berisi EventRecord dengan payload JSON bytes sampai insert"""
+        await consumer.enqueue(sample_event)
+        _, record, _ = consumer.queue.get_nowait()
+        assert isinstance(record, EventRecord)
+        assert isinstance(record.payload_json, bytes)
+        assert record.payload == sample_event['payload']
+        
+        assert dedup_store.store_events([record]) == [True]
+        assert dedup_store.get_events()[0]['payload'] == sample_event['payload']
+    
+    @pytest.mark.asyncio
+    async def test_enqueue_many_drops_batch_duplicates(self, consumer, sample_event):
+        """Test: Batch enqueue membuang duplikat di dalam batch yang sama"""
+        other = dict(sample_event, event_id='evt-other')
+        accepted, duplicate = await consumer.enqueue_many([sample_event, other, sample_event])
+        
+        assert (accepted, duplicate) == (2, 1)
+        assert consumer.queue.qsize() == 2
+        assert consumer.stats['received'] == 3
+        assert consumer.stats['duplicate_dropped'] == 1
+    
     @pytest.mark.asyncio
     async def test_process_unique_event(self, consumer, sample_event):
         """Test: Event unik diproses dengan benar"""
@@ -190,6 +1240,86 @@ class TestEventConsumer:
         assert consumer.stats['duplicate_dropped'] == 1
         assert consumer.stats['received'] == 2
     
+    @pytest.mark.asyncio
+    async def test_batch_mode_processing(self, dedup_store, sample_event):
+        """Test: Mode batch (group commit) menjaga statistik tetap akurat"""
+        consumer = EventConsumer(dedup_store, batch_size=50, batch_timeout=0.05)
+        consumer_task = asyncio.create_task(consumer.start())
+        
+        for i in range(10):
+            await consumer.enqueue(dict(sample_event, event_id=f'evt-{i % 7}'))
+        await asyncio.sleep(0.5)
+        
+        consumer.stop()
+        await consumer_task
+        
+        assert consumer.stats['unique_processed'] == 7
+        assert consumer.stats['duplicate_dropped'] == 3
+    
+    @pytest.mark.asyncio
+    async def test_parallel_workers_partitioning(self, dedup_store, sample_event):
+        """Test: Worker paralel, satu key selalu ke partisi yang sama"""
+        consumer = EventConsumer(dedup_store, num_workers=4)
+        assert consumer._partition('t', 'k') == consumer._partition('t', 'k')
+        
+        consumer_task = asyncio.create_task(consumer.start())
+        for i in range(20):
+            event = dict(sample_event, event_id=f'evt-{i}')
+            await consumer.enqueue(event)
+            await consumer.enqueue(event)
+        await asyncio.sleep(0.5)
+        
+        consumer.stop()
+        await consumer_task
+        
+        stats = consumer.get_stats()
+        assert stats['unique_processed'] == 20
+        assert stats['duplicate_dropped'] == 20
+        assert len(stats['workers']) == 4
+        assert sum(w['processed'] for w in stats['workers']) == 20
+        assert stats['queue_depth'] == 0
+    
+    @pytest.mark.asyncio
+    async def test_backpressure_rejects_when_full(self, dedup_store, sample_event):
+        """Test: Queue berbatas menolak event saat penuh dan lepas setelah terkuras"""
+        consumer = EventConsumer(dedup_store, max_queue_size=3, low_watermark=1)
+        for i in range(3):
+            await consumer.enqueue(dict(sample_event, event_id=f'evt-{i}'))
+        
+        with pytest.raises(QueueFullError) as exc_info:
+            await consumer.enqueue(dict(sample_event, event_id='evt-overflow'))
+        assert exc_info.value.retry_after >= 1
+        assert consumer.backpressure_active
+        assert consumer.get_stats()['rejected'] == 1
+        
+        consumer_task = asyncio.create_task(consumer.start())
+        await asyncio.sleep(0.3)
+        consumer.stop()
+        await consumer_task
+        
+        assert not consumer.backpressure_active
+        await consumer.enqueue(dict(sample_event, event_id='evt-overflow'))
+    
+    @pytest.mark.asyncio
+    async def test_latency_histograms(self, consumer, sample_event):
+        """Test: Histogram hot path terisi per event dan bucket kumulatif"""
+        consumer_task = asyncio.create_task(consumer.start())
+        await consumer.enqueue(sample_event)
+        await consumer.enqueue(sample_event)
+        await asyncio.sleep(0.5)
+        consumer.stop()
+        await consumer_task
+        
+        metrics = consumer.metrics
+        assert metrics.queue_wait.count == 2
+        assert metrics.dedup_lookup.count == 0
+        assert metrics.store.count == 2
+        assert metrics.processing.count == 1
+        assert metrics.end_to_end.count == 2
+        buckets = metrics.end_to_end.snapshot()
+        assert [c for _, c in buckets] == sorted(c for _, c in buckets)
+        assert buckets[-1] == (float("inf"), 2)
+    
     @pytest.mark.asyncio
     async def test_get_stats(self, consumer, sample_event):
         """Test: Statistik dikembalikan dengan benar"""
@@ -211,7 +1341,7 @@ class TestEventConsumer:
 
 
 class TestEventModel:
-    """Test suite untuk Event model validation (3 tests)"""
+    """Test suite untuk Event model validation (5 tests)"""
     
     def test_valid_event(self):
         """Test: Event valid dapat dibuat"""
@@ -244,6 +1374,33 @@ class TestEventModel:
                 timestamp="2025-10-22T10:30:00Z",
                 source="test-service"
             )
+    
+    def test_fast_validation_matches_model(self):
+        """Test: Jalur validasi cepat hanya menerima input yang juga valid di model Event"""
+        valid = {
+            "topic": "test.topic",
+            "event_id": "evt-123",
+            "timestamp": "2025-10-22T10:30:00Z",
+            "source": "test-service"
+        }
+        record = validate_event(valid)
+        assert record.to_dict() == Event(**valid).model_dump()
+        assert record['topic'] == "test.topic"
+        
+        for override in ({"timestamp": "bukan-waktu"}, {"topic": ""}, {"payload": None},
+                         {"payload": [1]}, {"event_id": 123},
+                         {"payload": {"x": [1.0, float("nan")]}}, {"payload": {"x": float("inf")}}):
+            assert validate_event(dict(valid, **override)) is None
+            with pytest.raises(ValueError):
+                Event(**dict(valid, **override))
+
+
+    def test_event_record_json_roundtrip(self, sample_event):
+        """Test: EventRecord menyisipkan payload JSON apa adanya saat serialisasi"""
+        record = EventRecord.from_dict(sample_event)
+        assert json.loads(record.to_json()) == sample_event
+        assert record.to_dict() == sample_event
+        assert record['event_id'] == sample_event['event_id']
 
 
 # Run tests jika dijalankan langsung
@@ -2,6 +2,9 @@
 Integration Tests untuk FastAPI endpoints
 Menggunakan TestClient synchronous untuk menghindari masalah lifespan
 """
+import json
+import time
+import uuid
 import pytest
 from fastapi.testclient import TestClient
 from pathlib import Path
@@ -14,8 +17,9 @@ from src.main import app
 
 
 @pytest.fixture
-def client():
-    """Fixture untuk synchronous test client"""
+def client(tmp_path, monkeypatch):
+    """Fixture untuk synchronous test client dengan database sementara"""
+    monkeypatch.setenv("DEDUP_DB_PATH", str(tmp_path / "dedup_store.db"))
     with TestClient(app) as client:
         yield client
 
@@ -33,6 +37,249 @@ class TestHealthCheck:
         assert 'status' in data
 
 
+def _event(event_id: str, **overrides) -> dict:
+    """Helper untuk membuat event valid"""
+    event = {
+        "topic": "test.batch",
+        "event_id": event_id,
+        "timestamp": "2025-10-22T10:30:00Z",
+        "source": "test-service",
+        "payload": {"n": 1}
+    }
+    event.update(overrides)
+    return event
+
+
+class TestEvents:
+    """Test suite untuk endpoint GET /events"""
+    
+    def test_invalid_cursor_returns_400(self, client):
+        """Test: Cursor yang rusak ditolak dengan 400"""
+        response = client.get("/events", params={"cursor": "bukan-cursor"})
+        assert response.status_code == 400
+    
+    def test_stream_endpoint_is_ndjson(self, client):
+        """Test: /events/stream membalas NDJSON"""
+        response = client.get("/events/stream", params={"topic": "tidak-ada"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert response.content == b""
+    
+    def test_empty_page_has_no_cursor(self, client):
+        """Test: Halaman terakhir tidak punya next_cursor"""
+        response = client.get("/events", params={"topic": "tidak-ada"})
+        assert response.status_code == 200
+        assert response.json()['next_cursor'] is None
+
+
+class TestFastIngest:
+    """Test suite untuk jalur validasi cepat POST /publish"""
+    
+    INVALID_BODIES = [
+        b'',
+        b'{bad',
+        b'[]',
+        b'{"topic": "", "event_id": "e", "timestamp": "2025-10-22T10:30:00Z", "source": "s"}',
+        b'{"topic": 1, "event_id": "e", "timestamp": "2025-10-22T10:30:00Z", "source": "s"}',
+        b'{"topic": "t", "event_id": "e", "timestamp": "2025-13-01", "source": "s"}',
+        b'{"topic": "t", "event_id": "e", "timestamp": "2025-10-22T10:30:00Z", "source": "s",'
+        b' "payload": null}',
+        b'{"topic": "t", "event_id": "e", "timestamp": "2025-10-22T10:30:00Z", "source": "s",'
+        b' "payload": {"v": NaN}}',
+    ]
+    
+    def _errors(self, tmp_path, monkeypatch, fast: str) -> list:
+        monkeypatch.setenv("DEDUP_DB_PATH", str(tmp_path / f"fast-{fast}.db"))
+        monkeypatch.setenv("FAST_INGEST", fast)
+        with TestClient(app) as client:
+            return [
+                (response.status_code, response.json())
+                for response in (
+                    client.post("/publish", content=body,
+                                headers={"content-type": "application/json"})
+                    for body in self.INVALID_BODIES
+                )
+            ]
+    
+    def test_error_semantics_identical(self, tmp_path, monkeypatch):
+        """Test: Body invalid menghasilkan error 422 yang sama dengan jalur standar"""
+        fast = self._errors(tmp_path, monkeypatch, "1")
+        standard = self._errors(tmp_path, monkeypatch, "0")
+        assert fast == standard
+        assert all(status == 422 for status, _ in fast)
+    
+    def test_valid_event_accepted(self, client):
+        """Test: Event valid diterima lewat jalur cepat"""
+        event = _event(f"fast-{uuid.uuid4().hex}")
+        response = client.post("/publish", json=event)
+        assert response.status_code == 200
+        assert response.json()['event_id'] == event['event_id']
+        assert response.json()['status'] == "accepted"
+
+
+class TestPublishBatch:
+    """Test suite untuk endpoint POST /publish/batch"""
+    
+    def test_batch_json_array(self, client):
+        """Test: Batch JSON array dihitung accepted/duplicate/invalid per item"""
+        prefix = uuid.uuid4().hex
+        events = [
+            _event(f"{prefix}-1"),
+            _event(f"{prefix}-2"),
+            _event(f"{prefix}-1"),
+            _event(f"{prefix}-3", timestamp="bukan-timestamp"),
+        ]
+        response = client.post("/publish/batch", json=events)
+        assert response.status_code == 200
+        data = response.json()
+        assert data['accepted'] == 2
+        assert data['duplicate'] == 1
+        assert data['invalid'] == 1
+        assert data['errors'][0]['index'] == 3
+    
+    def test_batch_ndjson(self, client):
+        """Test: Batch NDJSON diterima, baris rusak dihitung invalid"""
+        prefix = uuid.uuid4().hex
+        body = "\n".join([
+            json.dumps(_event(f"{prefix}-1")),
+            json.dumps(_event(f"{prefix}-2")),
+            "{rusak",
+        ])
+        response = client.post(
+            "/publish/batch",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data['accepted'] == 2
+        assert data['invalid'] == 1
+    
+    def test_batch_malformed_body(self, client):
+        """Test: Body yang bukan array/NDJSON ditolak dengan 400"""
+        response = client.post(
+            "/publish/batch",
+            content="bukan json",
+            headers={"Content-Type": "application/json"}
+        )
+        assert response.status_code == 400
+    
+    def test_batch_too_large_rejected_before_parse(self, client, monkeypatch):
+        """Test: Body/jumlah baris NDJSON di atas batas ditolak 413 sebelum di-decode"""
+        import src.main as main_module
+        monkeypatch.setattr(main_module, "MAX_BATCH_SIZE", 2)
+        monkeypatch.setattr(main_module, "MAX_BATCH_BYTES", 64)
+        response = client.post(
+            "/publish/batch",
+            content="{rusak\n" * 3,
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 413
+        response = client.post("/publish/batch", content="[" + " " * 100 + "]")
+        assert response.status_code == 413
+
+
+class TestBackpressure:
+    """Test suite untuk respons 429 saat queue penuh"""
+    
+    def test_publish_returns_429_with_retry_after(self, tmp_path, monkeypatch):
+        """Test: Batch yang melebihi kapasitas queue ditolak 429 + Retry-After"""
+        monkeypatch.setenv("DEDUP_DB_PATH", str(tmp_path / "dedup_store.db"))
+        monkeypatch.setenv("QUEUE_MAX_SIZE", "2")
+        monkeypatch.setenv("RETRY_AFTER_SECONDS", "3")
+        with TestClient(app) as client:
+            prefix = uuid.uuid4().hex
+            response = client.post(
+                "/publish/batch", json=[_event(f"{prefix}-{i}") for i in range(5)]
+            )
+            assert response.status_code == 429
+            assert response.headers["Retry-After"] == "3"
+            assert client.get("/stats").json()['rejected'] == 5
+
+
+
+class TestMetrics:
+    """Test suite untuk endpoint GET /metrics"""
+    
+    def test_metrics_prometheus_format(self, client):
+        """Test: /metrics berisi histogram, counter, dan gauge dalam text format"""
+        client.post("/publish", json=_event(uuid.uuid4().hex))
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        body = response.text
+        assert "# TYPE aggregator_queue_wait_seconds histogram" in body
+        assert 'aggregator_end_to_end_seconds_bucket{le="+Inf"}' in body
+        assert "aggregator_received_total 1" in body
+        assert "# TYPE aggregator_queue_depth gauge" in body
+        size = [l for l in body.splitlines() if l.startswith("aggregator_db_size_bytes ")]
+        assert int(size[0].split()[1]) > 0
+
+
+class TestAggregates:
+    """Test suite untuk endpoint GET /aggregates"""
+    
+    def test_disabled_by_default(self, client):
+        """Test: Agregasi opt-in, endpoint 404 tanpa AGGREGATES_ENABLED"""
+        assert client.get("/aggregates").status_code == 404
+    
+    def test_tumbling_and_sliding_windows(self, tmp_path, monkeypatch):
+        """Test: Event unik dijumlahkan per window; duplikat tidak dihitung"""
+        monkeypatch.setenv("DEDUP_DB_PATH", str(tmp_path / "dedup_store.db"))
+        monkeypatch.setenv("AGGREGATES_ENABLED", "true")
+        with TestClient(app) as client:
+            events = [
+                _event(f"agg-{i}", timestamp=f"2025-10-22T10:0{i}:30Z", payload={"amount": i})
+                for i in range(4)
+            ]
+            client.post("/publish/batch", json=events + events[:1])
+            for _ in range(50):
+                if client.get("/stats").json()["unique_processed"] >= 4:
+                    break
+                time.sleep(0.05)
+            
+            data = client.get("/aggregates", params={"window": 120, "topic": "test.batch"}).json()
+            windows = data["series"][0]["windows"]
+            assert data["window"]["type"] == "tumbling"
+            assert [(w["start"], w["count"]) for w in windows] == [
+                ("2025-10-22T10:00:00Z", 2), ("2025-10-22T10:02:00Z", 2)
+            ]
+            assert windows[1]["fields"]["amount"] == {"count": 2, "sum": 5, "avg": 2.5}
+            
+            sliding = client.get("/aggregates", params={"window": 120, "slide": 60}).json()
+            assert [w["count"] for w in sliding["series"][0]["windows"]] == [1, 2, 2, 2]
+            assert client.get("/aggregates", params={"window": 90}).status_code == 400
+
+
+class TestArchiveScan:
+    """Test suite untuk endpoint GET /archive/scan"""
+    
+    def test_scan_columnar_archive(self, tmp_path, monkeypatch):
+        """Test: Scan arsip kolumnar mengembalikan kolom yang diminta"""
+        from src.archive import ColumnarArchive
+        
+        archive_dir = tmp_path / "archive"
+        ColumnarArchive(str(archive_dir))([
+            ("logs", f"log-{i}", f"2025-10-22T10:0{i}:00Z", "api",
+             json.dumps({"status": 200 + i}), "2025-10-22T10:10:00")
+            for i in range(3)
+        ])
+        monkeypatch.setenv("DEDUP_DB_PATH", str(tmp_path / "dedup_store.db"))
+        monkeypatch.setenv("RETENTION_ARCHIVE_DIR", str(archive_dir))
+        monkeypatch.setenv("RETENTION_ARCHIVE_FORMAT", "columnar")
+        with TestClient(app) as client:
+            data = client.get("/archive/scan", params={
+                "topic": "logs", "since": "2025-10-22T10:01", "columns": "event_id,payload.status"
+            }).json()
+            assert data["rows"] == 2
+            assert data["columns"] == {"event_id": ["log-1", "log-2"], "payload.status": [201, 202]}
+            assert client.get("/archive/scan", params={"topic": "lain"}).json()["segments"]["pruned"] == 1
+            assert client.get("/archive/scan", params={"columns": "x"}).status_code == 400
+    
+    def test_scan_disabled_returns_404(self, client):
+        """Test: Tanpa arsip kolumnar endpoint membalas 404"""
+        assert client.get("/archive/scan").status_code == 404
+
 # Run tests jika dijalankan langsung
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])